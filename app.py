@@ -15,6 +15,8 @@ from datetime import datetime, timedelta, date
 import sqlite3
 import os
 
+from config import Config
+
 # Initialize the Dash app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 app.title = "Lab Capacity Model"
@@ -565,10 +567,18 @@ def update_schedule_gantt(selected_date):
     Input("interval-component", "n_intervals")
 )
 def update_utilization_trend(n):
-    # Generate sample trend data
-    dates = pd.date_range(start=datetime.now() - timedelta(days=30), periods=30, freq='D')
-    personnel_util = np.random.randint(70, 95, 30)
-    instrument_util = np.random.randint(60, 90, 30)
+    if Config.STORE_BACKEND == 'database':
+        # Pre-aggregated lab-wide daily rollups; a few dozen rows per poll
+        from utilization import get_utilization_trend
+        trend = get_utilization_trend('day', 30).fillna(0)
+        dates = trend.index
+        personnel_util = trend['Personnel']
+        instrument_util = trend['Instrument']
+    else:
+        # Generate sample trend data
+        dates = pd.date_range(start=datetime.now() - timedelta(days=30), periods=30, freq='D')
+        personnel_util = np.random.randint(70, 95, 30)
+        instrument_util = np.random.randint(60, 90, 30)
     
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     
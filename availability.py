@@ -0,0 +1,269 @@
+"""
+Lab Capacity Model - Availability Index
+Per-resource booking intervals answering "is resource X free in [a, b)" for
+conflict detection, earliest-slot search and availability checks
+"""
+
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from heapq import merge
+
+# Bookings that ended more than this long ago are not loaded from the database
+LOOKBACK_DAYS = 30
+
+# Bookings longer than this are kept apart from the bisect-searched ones
+LONG_BOOKING = timedelta(days=1)
+
+
+class ResourceIntervals:
+    """Bookings of one resource as lists of (start, end, key) sorted by start
+
+    Intervals may overlap (double bookings are what conflict detection is
+    looking for), so a plain sorted list cannot say which bookings cover an
+    instant. longest bounds the length of every booking in entries: anything
+    there overlapping [a, b) must start in (a - longest, b), a range two
+    bisects find, and only that short run is scanned. Bookings longer than
+    LONG_BOOKING, such as a vacation, go to long_entries and are checked one
+    by one instead, so a single one cannot widen every search. Deletes leave
+    longest as an upper bound, which keeps the search correct.
+    """
+
+    def __init__(self, name=None, category=None):
+        self.name = name
+        self.category = category
+        self.entries = []
+        self.long_entries = []
+        self.longest = None
+
+    def __len__(self):
+        return len(self.entries) + len(self.long_entries)
+
+    def _list_for(self, start, end):
+        return self.long_entries if end - start > LONG_BOOKING else self.entries
+
+    def _stretch(self, length):
+        if length <= LONG_BOOKING and (self.longest is None or length > self.longest):
+            self.longest = length
+
+    def insert(self, start, end, key):
+        insort(self._list_for(start, end), (start, end, key))
+        self._stretch(end - start)
+
+    def extend(self, bookings):
+        """Bulk load (start, end, key) tuples with one sort per list"""
+        for booking in bookings:
+            self._list_for(booking[0], booking[1]).append(booking)
+            self._stretch(booking[1] - booking[0])
+        self.entries.sort()
+        self.long_entries.sort()
+
+    def delete(self, start, end, key):
+        entries = self._list_for(start, end)
+        index = bisect_left(entries, (start, end, key))
+        if index < len(entries) and entries[index] == (start, end, key):
+            del entries[index]
+            return True
+        return False
+
+    def overlapping(self, start, end):
+        """Bookings intersecting the half-open window [start, end), in start order"""
+        if end <= start:
+            return []
+        found = []
+        if self.entries:
+            first = bisect_left(self.entries, (start - self.longest,))
+            last = bisect_left(self.entries, (end,))
+            found = [entry for entry in self.entries[first:last] if entry[1] > start]
+        long_found = [entry for entry in self.long_entries if entry[0] < end and entry[1] > start]
+        return sorted(found + long_found) if long_found else found
+
+    def is_free(self, start, end):
+        return not self.overlapping(start, end)
+
+    def earliest_slot(self, duration, after, before=None):
+        """First start >= after with duration clear of bookings, or None if it would end after before"""
+        start = after
+        while before is None or start + duration <= before:
+            blocking = self.overlapping(start, start + duration)
+            if not blocking:
+                return start
+            start = max(entry[1] for entry in blocking)
+        return None
+
+    def conflicts(self):
+        """Pairs of overlapping bookings, found in one sweep over the sorted list"""
+        pairs = []
+        active = []
+        for entry in merge(self.entries, self.long_entries):
+            active = [other for other in active if other[1] > entry[0]]
+            pairs.extend((other, entry) for other in active)
+            active.append(entry)
+        return pairs
+
+
+class AvailabilityIndex:
+    """ResourceIntervals for every resource, grouped by category
+
+    Resources are keyed (resource_type, id), e.g. ('Instrument', 4). Each
+    booking key maps back to its resource so deletes only need the key.
+    Category queries visit each resource of the category once.
+    """
+
+    def __init__(self):
+        self.resources = {}
+        self.categories = {}
+        self.bookings = {}
+
+    def add_resource(self, resource, category=None, name=None):
+        intervals = self.resources.get(resource)
+        if intervals is None:
+            intervals = self.resources[resource] = ResourceIntervals(name, category)
+            self.categories.setdefault((resource[0], category), []).append(resource)
+        return intervals
+
+    def insert(self, resource, start, end, key):
+        if key in self.bookings:
+            self.delete(key)
+        self.add_resource(resource).insert(start, end, key)
+        self.bookings[key] = (resource, start, end)
+
+    def load(self, resource, bookings):
+        """Bulk insert (start, end, key) tuples for one resource"""
+        bookings = [booking for booking in bookings if booking[1] > booking[0]]
+        self.add_resource(resource).extend(bookings)
+        for start, end, key in bookings:
+            self.bookings[key] = (resource, start, end)
+
+    def delete(self, key):
+        booking = self.bookings.pop(key, None)
+        if booking is None:
+            return False
+        resource, start, end = booking
+        return self.resources[resource].delete(start, end, key)
+
+    def in_category(self, resource_type, category=None):
+        if category is None:
+            return [resource for resource in self.resources if resource[0] == resource_type]
+        return self.categories.get((resource_type, category), [])
+
+    def is_free(self, resource, start, end):
+        intervals = self.resources.get(resource)
+        return intervals is None or intervals.is_free(start, end)
+
+    def free_resources(self, resource_type, start, end, category=None):
+        """Split a category into (free, {busy resource: overlapping bookings}) for [start, end)"""
+        free, busy = [], {}
+        for resource in self.in_category(resource_type, category):
+            blocking = self.resources[resource].overlapping(start, end)
+            if blocking:
+                busy[resource] = blocking
+            else:
+                free.append(resource)
+        return free, busy
+
+    def earliest_slot(self, resource_type, duration, after, category=None, before=None):
+        """(start, resource) of the first window of duration free on any resource in the category"""
+        best = None
+        for resource in self.in_category(resource_type, category):
+            # Nothing later than the best so far can win, so bound the search by it
+            limit = before if best is None else best[0] + duration
+            start = self.resources[resource].earliest_slot(duration, after, limit)
+            if start is not None and (best is None or start < best[0]):
+                best = (start, resource)
+        return best
+
+    def conflicts(self, resource_type=None):
+        """Double bookings as (resource, booking, booking) triples"""
+        return [(resource, first, second)
+                for resource, intervals in self.resources.items()
+                if resource_type is None or resource[0] == resource_type
+                for first, second in intervals.conflicts()]
+
+
+def load_availability_index(since=None):
+    """Build an index from tasks, instrument bookings and personnel absences in the database"""
+    import pandas as pd
+    from sqlalchemy import select
+
+    from database import engine, Personnel, Instrument, Task, InstrumentSchedule, PersonnelAvailability
+    from utilization import UNAVAILABLE_TYPES
+
+    since = since or datetime.now() - timedelta(days=LOOKBACK_DAYS)
+    index = AvailabilityIndex()
+    with engine.connect() as connection:
+        people = pd.read_sql(select(Personnel.id, Personnel.name, Personnel.role), connection)
+        instruments = pd.read_sql(select(Instrument.id, Instrument.name, Instrument.instrument_type), connection)
+        tasks = pd.read_sql(
+            select(Task.id, Task.assigned_personnel_id, Task.scheduled_start, Task.scheduled_end, Task.estimated_duration)
+            .where(Task.assigned_personnel_id.is_not(None), Task.scheduled_start.is_not(None)), connection)
+        absences = pd.read_sql(
+            select(PersonnelAvailability.id, PersonnelAvailability.personnel_id,
+                   PersonnelAvailability.start_date, PersonnelAvailability.end_date)
+            .where(PersonnelAvailability.availability_type.in_(UNAVAILABLE_TYPES))
+            .where(PersonnelAvailability.end_date > since), connection)
+        bookings = pd.read_sql(
+            select(InstrumentSchedule.id, InstrumentSchedule.instrument_id, InstrumentSchedule.start_time,
+                   InstrumentSchedule.end_time, InstrumentSchedule.setup_time, InstrumentSchedule.cleanup_time)
+            .where(InstrumentSchedule.status != 'Cancelled', InstrumentSchedule.end_time > since), connection)
+
+    for person_id, name, role in people.itertuples(index=False):
+        index.add_resource(('Personnel', int(person_id)), role, name)
+    for instrument_id, name, instrument_type in instruments.itertuples(index=False):
+        index.add_resource(('Instrument', int(instrument_id)), instrument_type, name)
+
+    # Open-ended tasks hold the person for their estimate
+    task_start = pd.to_datetime(tasks['scheduled_start'])
+    task_end = pd.to_datetime(tasks['scheduled_end']).fillna(
+        task_start + pd.to_timedelta(tasks['estimated_duration'].fillna(0), unit='m'))
+    tasks = tasks.assign(start=task_start, end=task_end)
+    tasks = tasks[tasks['end'] > since]
+    absences = absences.assign(start=pd.to_datetime(absences['start_date']), end=pd.to_datetime(absences['end_date']))
+    # Instruments are occupied through setup and cleanup
+    bookings = bookings.assign(
+        start=pd.to_datetime(bookings['start_time']) - pd.to_timedelta(bookings['setup_time'].fillna(0), unit='m'),
+        end=pd.to_datetime(bookings['end_time']) + pd.to_timedelta(bookings['cleanup_time'].fillna(0), unit='m'))
+
+    for frame, resource_type, resource_column, kind in (
+            (tasks, 'Personnel', 'assigned_personnel_id', 'task'),
+            (absences, 'Personnel', 'personnel_id', 'absence'),
+            (bookings, 'Instrument', 'instrument_id', 'booking')):
+        for resource_id, group in frame.groupby(resource_column):
+            index.load((resource_type, int(resource_id)), [
+                (start.to_pydatetime(), end.to_pydatetime(), (kind, int(row_id)))
+                for row_id, start, end in zip(group['id'], group['start'], group['end'])
+            ])
+    return index
+
+
+def availability_version():
+    """Cheap fingerprint of the tables the index is built from"""
+    from sqlalchemy import select, func
+
+    from database import engine, Personnel, Instrument, Task, InstrumentSchedule, PersonnelAvailability
+
+    with engine.connect() as connection:
+        return tuple(connection.execute(select(
+            select(func.count()).select_from(Personnel).scalar_subquery(),
+            select(func.count()).select_from(Instrument).scalar_subquery(),
+            select(func.count()).select_from(Task).scalar_subquery(),
+            select(func.max(Task.updated_at)).scalar_subquery(),
+            select(func.count()).select_from(InstrumentSchedule).scalar_subquery(),
+            select(func.max(InstrumentSchedule.updated_at)).scalar_subquery(),
+            select(func.count()).select_from(PersonnelAvailability).scalar_subquery(),
+            select(func.max(PersonnelAvailability.updated_at)).scalar_subquery()
+        )).one())
+
+
+def schedule_availability_index(scheduler):
+    """Build an index from the batches of a solved BatchScheduler"""
+    index = AvailabilityIndex()
+    for instrument_id, instrument in scheduler.instruments.items():
+        index.add_resource(('Instrument', instrument_id), instrument.category, instrument.name)
+    for batch_id, batch in scheduler.batches.items():
+        start = scheduler._to_datetime(batch['start'])
+        index.insert(('Instrument', batch['instrument']), start, scheduler._to_datetime(batch['end']), ('batch', batch_id))
+        # Operators are held only while loading the batch
+        index.add_resource(('Personnel', batch['operator']), 'Operator', batch['operator'])
+        index.insert(('Personnel', batch['operator']), start,
+                     start + timedelta(hours=batch['operator_hours']), ('setup', batch_id))
+    return index
@@ -0,0 +1,138 @@
+"""
+Lab Capacity Model - Capacity Gap
+Demand hours against instrument capacity hours per group and period, computed as whole matrices
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from domain import DemandItem, Instrument, Method, to_frame
+from realtime import BLOCKED_STATUSES
+
+# Period length in days for each interval; 'total' is one bucket spanning the horizon
+INTERVALS = {'day': 1, 'week': 7, 'total': None}
+GROUP_BY = ('category', 'method')
+
+# Demand in these statuses no longer needs instrument time
+CLOSED_DEMAND_STATUSES = ('completed', 'cancelled', 'rejected')
+
+# Most hours an instrument can run in a day; autosamplers run overnight
+MAX_INSTRUMENT_HOURS_PER_DAY = 24.0
+
+
+def method_costs(methods, instruments):
+    """Per-method cost model: instrument category, run hours per sample, batch size and per-batch overhead
+
+    Methods and instruments are domain records. Methods carry no setup or cleanup of their own, so each batch
+    is charged the mean setup + cleanup of the in-service instruments of
+    the method's category (all of the category if none are in service).
+    """
+    frame = to_frame(Method, methods, ['id', 'instrument_category', 'run_time_per_sample', 'batch_size'])
+    frame.columns = ['method', 'category', 'run_time', 'batch_size']
+    frame = frame.drop_duplicates('method').set_index('method')
+    overhead = instrument_frame(instruments)
+    overhead = overhead.assign(overhead=overhead['setup'] + overhead['cleanup'])
+    in_service = overhead[overhead['in_service']].groupby('category')['overhead'].mean()
+    fallback = overhead.groupby('category')['overhead'].mean()
+    frame['run_hours'] = frame['run_time'] / 60.0
+    frame['batch_overhead'] = frame['category'].map(in_service).fillna(frame['category'].map(fallback)).fillna(0.0)
+    return frame
+
+
+# Instrument record field -> instrument_frame column
+INSTRUMENT_COLUMNS = {
+    'id': 'id',
+    'category': 'category',
+    'status': 'status',
+    'throughput_samples_per_day': 'throughput',
+    'efficiency_factor': 'efficiency',
+    'failure_rate_percent': 'failure_rate',
+    'setup_time_hours': 'setup',
+    'cleanup_time_hours': 'cleanup',
+    'avg_batch_size': 'avg_batch_size',
+    'run_time_per_sample_min': 'run_time'
+}
+
+
+def instrument_frame(instruments):
+    frame = to_frame(Instrument, instruments, list(INSTRUMENT_COLUMNS)).rename(columns=INSTRUMENT_COLUMNS)
+    frame['in_service'] = ~frame['status'].str.lower().isin(BLOCKED_STATUSES)
+    # A zero efficiency means unmeasured rather than idle
+    frame['efficiency'] = frame['efficiency'].replace(0, 1.0)
+    return frame
+
+
+def daily_capacity_hours(instruments, max_hours=MAX_INSTRUMENT_HOURS_PER_DAY):
+    """Instrument hours each category can deliver per working day
+
+    Rated throughput is priced with the instrument's own run time per
+    sample and its setup + cleanup spread over an average batch, so
+    capacity is in the same hours as demand, and capped at max_hours as
+    the instrument cannot run longer. Those hours are then scaled by
+    efficiency and by the share of runs that do not fail. Instruments out
+    of service contribute 0.
+    """
+    frame = instrument_frame(instruments)
+    hours_per_sample = frame['run_time'] / 60.0 + (frame['setup'] + frame['cleanup']) / frame['avg_batch_size'].clip(lower=1)
+    rated = (frame['throughput'] * hours_per_sample).clip(upper=max_hours)
+    hours = (rated * frame['efficiency'] * (1 - frame['failure_rate'] / 100.0)).where(frame['in_service'], 0.0)
+    return hours.groupby(frame['category'], sort=False).sum()
+
+
+def demand_frame(items, costs):
+    """Open demand items (DemandItem records) priced in instrument hours, one row per item"""
+    frame = to_frame(DemandItem, items, ['method', 'date', 'sample_count', 'status'])
+    frame.columns = ['method', 'date', 'samples', 'status']
+    frame = frame[~frame['status'].str.lower().isin(CLOSED_DEMAND_STATUSES) & frame['method'].isin(costs.index)]
+    cost = costs.loc[frame['method']]
+    batches = np.ceil(frame['samples'].to_numpy() / cost['batch_size'].clip(lower=1).to_numpy())
+    return pd.DataFrame({
+        'method': frame['method'].to_numpy(),
+        'category': cost['category'].to_numpy(),
+        'date': pd.to_datetime(frame['date'], errors='coerce').to_numpy(),
+        'samples': frame['samples'].to_numpy(),
+        'hours': frame['samples'].to_numpy() * cost['run_hours'].to_numpy() + batches * cost['batch_overhead'].to_numpy()
+    })
+
+
+def period_bounds(days, interval):
+    """Day offsets [0, ..., days] splitting the horizon into periods of interval days"""
+    step = INTERVALS[interval] or days
+    return np.minimum(np.arange(0, days + step, step), days)
+
+
+def capacity_gap(items, methods, instruments, calendar, days, interval='total', group_by='category'):
+    """Demand and capacity hours as (groups, period starts, demand matrix, capacity matrix)
+
+    Rows are groups and columns periods of the horizon starting at
+    calendar.start. Demand is binned by item date with one scatter-add;
+    capacity is the outer product of each group's daily hours and the
+    working days per period from the calendar's prefix sums. With
+    group_by='method' each method is offered the whole capacity of its
+    instrument category, which the methods on it share.
+    """
+    costs = method_costs(methods, instruments)
+    demand = demand_frame(items, costs)
+    daily = daily_capacity_hours(instruments)
+
+    if group_by == 'method':
+        groups = list(costs.index)
+        group_daily = costs['category'].map(daily).fillna(0.0).to_numpy()
+    else:
+        groups = list(dict.fromkeys(list(daily.index) + list(costs['category'])))
+        group_daily = daily.reindex(groups).fillna(0.0).to_numpy()
+
+    bounds = period_bounds(days, interval)
+    offsets = ((demand['date'] - pd.Timestamp(calendar.start)).dt.days).to_numpy()
+    rows = pd.Categorical(demand[group_by], categories=groups).codes
+    keep = (offsets >= 0) & (offsets < days) & (rows >= 0)
+    columns = np.searchsorted(bounds, offsets[keep], side='right') - 1
+    demand_matrix = np.zeros((len(groups), len(bounds) - 1))
+    np.add.at(demand_matrix, (rows[keep], columns), demand['hours'].to_numpy()[keep])
+
+    working_days = np.diff(calendar.cumulative[bounds])
+    capacity_matrix = np.outer(group_daily, working_days)
+    periods = [calendar.start + timedelta(days=int(offset)) for offset in bounds[:-1]]
+    return groups, periods, demand_matrix, capacity_matrix
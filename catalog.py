@@ -0,0 +1,534 @@
+"""
+Lab Capacity Model - Catalog Store
+Indexed in-memory store for methods, instruments, compatibility, skills and demand
+"""
+
+from collections.abc import MutableMapping
+import uuid
+
+import pandas as pd
+
+from domain import Compatibility, DemandItem, Instrument, Method, Skill, instrument_category_for, load
+
+# Primary stores whose change counters views can key cached output on
+STORES = ('methods', 'instruments', 'matrix', 'skills', 'demand')
+
+# Domain record type of each primary store
+STORE_RECORDS = {
+    'methods': Method,
+    'instruments': Instrument,
+    'matrix': Compatibility,
+    'skills': Skill,
+    'demand': DemandItem
+}
+
+# Columns of the columnar demand view used for aggregation
+DEMAND_COLUMNS = ['id', 'date', 'method', 'method_name', 'sample_count', 'priority', 'status', 'client', 'project']
+
+# Defaults for methods added through the admin console
+DEFAULT_METHOD_PROFILE = {
+    'batch_size': 24,
+    'time_per_batch': 4,
+    'run_time_per_sample': 10
+}
+
+
+# Stores and indexes a forked catalog reads through to its parent
+OVERLAY_ATTRIBUTES = (
+    'methods', 'method_profiles', 'instruments', 'matrix', 'skills', 'demand',
+    'methods_by_category', 'instruments_by_category', 'matrix_by_method', 'matrix_by_instrument',
+    'skills_by_method', 'skills_by_operator', 'demand_by_method'
+)
+
+
+class Overlay(MutableMapping):
+    """Mapping that reads through to a base mapping and keeps its own writes
+
+    Writes land in changes and deletes of base keys in deleted, so the
+    base is never modified and later base changes show through wherever
+    the overlay has not written.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.changes = {}
+        self.deleted = set()
+
+    def __getitem__(self, key):
+        if key in self.changes:
+            return self.changes[key]
+        if key in self.deleted:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __setitem__(self, key, value):
+        self.changes[key] = value
+        self.deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.changes.pop(key, None)
+        if key in self.base:
+            self.deleted.add(key)
+
+    def __contains__(self, key):
+        return key in self.changes or (key not in self.deleted and key in self.base)
+
+    def __iter__(self):
+        for key in self.base:
+            if key not in self.deleted:
+                yield key
+        for key in self.changes:
+            if key not in self.base:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def writable(self, key):
+        """The dict at key owned by this overlay, copied from the base on first write"""
+        if key not in self.changes:
+            self[key] = dict(self[key]) if key in self else {}
+        return self.changes[key]
+
+
+def _bucket_for_write(index, key):
+    if isinstance(index, Overlay):
+        return index.writable(key)
+    return index.setdefault(key, {})
+
+
+def _index_add(index, key, value):
+    # Dicts double as insertion-ordered sets
+    _bucket_for_write(index, key)[value] = None
+
+
+def _index_remove(index, key, value):
+    if value in index.get(key, ()):
+        bucket = _bucket_for_write(index, key)
+        del bucket[value]
+        if not bucket:
+            del index[key]
+
+
+class Catalog:
+    """Catalog records keyed by id with secondary indexes
+
+    Primary stores are dicts keyed by method_id, instrument_id,
+    (method_id, instrument_id) and (operator_id, method_id). Secondary
+    indexes map category, method, instrument and operator onto the keys of
+    those stores so every lookup the endpoints need is a dict access rather
+    than a scan. All mutation goes through the methods below so the indexes
+    never drift from the primary stores.
+
+    Each primary store also has a change counter that every mutation bumps,
+    so cached views built from a store stay valid until it next changes.
+    The generation identifies this instance; a reloaded catalog starts a new
+    one, so counters from different instances never collide.
+
+    fork() returns a child catalog whose stores and indexes are Overlays of
+    this one: it shares every record and index bucket until it writes to
+    one. Records are replaced rather than edited in place so that sharing
+    is safe. A fork used as a draft folds back into a new catalog with
+    merged(), which is how the live catalog is changed without ever
+    mutating a snapshot that readers may hold.
+    """
+
+    def __init__(self):
+        self.generation = uuid.uuid4().hex
+        self.versions = dict.fromkeys(STORES, 0)
+        self.parent = None
+
+        # Primary stores
+        self.methods = {}
+        self.method_profiles = {}
+        self.base_method_ids = set()
+        self.instruments = {}
+        self.matrix = {}
+        self.skills = {}
+        self.demand = {}
+
+        # Secondary indexes
+        self.methods_by_category = {}
+        self.instruments_by_category = {}
+        self.matrix_by_method = {}
+        self.matrix_by_instrument = {}
+        self.skills_by_method = {}
+        self.skills_by_operator = {}
+        self.demand_by_method = {}
+
+        # Columnar demand view and the demand version it was built at
+        self._demand_frame = None
+        self._demand_frame_version = None
+        # Domain records per store, with the store version they were built at
+        self._store_records = {}
+
+    def _touch(self, *stores):
+        for store in stores:
+            self.versions[store] += 1
+
+    def store_versions(self, stores):
+        """Change counters for the given stores, prefixed with the catalog generation
+
+        A fork's counters follow its parent's, since parent changes show through.
+        """
+        versions = (self.generation,) + tuple(self.versions[store] for store in stores)
+        if self.parent is not None:
+            return self.parent.store_versions(stores) + versions
+        return versions
+
+    def fork(self):
+        """Copy-on-write child of this catalog"""
+        child = Catalog()
+        child.parent = self
+        for name in OVERLAY_ATTRIBUTES:
+            setattr(child, name, Overlay(getattr(self, name)))
+        child.base_method_ids = set(self.base_method_ids)
+        return child
+
+    def merged(self):
+        """This fork's writes folded into a standalone copy of its parent
+
+        Stores and indexes the fork never wrote are shared with the parent
+        as they are, and the rest are copied once with the writes applied.
+        The parent is left as it was. The copy keeps the parent's
+        generation with counters past the parent's, so views cached from
+        stores the fork did not change stay valid. A fork with no writes
+        merges to its parent.
+        """
+        parent = self.parent
+        if not any(self.versions.values()):
+            return parent
+        merged = Catalog()
+        merged.generation = parent.generation
+        merged.versions = {store: parent.versions[store] + self.versions[store] for store in STORES}
+        for name in OVERLAY_ATTRIBUTES:
+            overlay = getattr(self, name)
+            values = overlay.base
+            if overlay.changes or overlay.deleted:
+                values = dict(values)
+                values.update(overlay.changes)
+                for key in overlay.deleted:
+                    del values[key]
+            setattr(merged, name, values)
+        merged.base_method_ids = self.base_method_ids
+        merged._store_records = dict(parent._store_records)
+        merged._demand_frame = parent._demand_frame
+        merged._demand_frame_version = parent._demand_frame_version
+        return merged
+
+    def records(self, store):
+        """A store as a tuple of its domain records, rebuilt only after the store changes
+
+        Planners read these rather than the dicts the endpoints serve, so
+        a request costs no record copies and every field has one name.
+        """
+        version = self.store_versions((store,))
+        cached = self._store_records.get(store)
+        if cached is None or cached[0] != version:
+            cached = (version, tuple(self._load_records(store)))
+            self._store_records[store] = cached
+        return cached[1]
+
+    def _load_records(self, store):
+        record_type = STORE_RECORDS[store]
+        if store == 'methods':
+            # Profile fields where published, admin defaults otherwise
+            return [load(Method, self.method_profiles.get(method_id) or dict(method, **DEFAULT_METHOD_PROFILE))
+                    for method_id, method in self.methods.items()]
+        if store == 'matrix':
+            return [Compatibility(method_id, instrument_id, is_compatible)
+                    for (method_id, instrument_id), is_compatible in self.matrix.items()]
+        return [load(record_type, record) for record in getattr(self, store).values()]
+
+    # Loading
+
+    def load(self, methods=(), method_profiles=(), instruments=(), matrix=(), skills=(), demand=(), base=False):
+        """Bulk load records; base methods are flagged so deletes can report them separately"""
+        profiles = {profile['id']: profile for profile in method_profiles}
+        for method in methods:
+            self._put_method(dict(method), profiles.get(method['id']))
+            if base:
+                self.base_method_ids.add(method['id'])
+        for instrument in instruments:
+            self._put_instrument(dict(instrument))
+        for method_id, instrument_id, is_compatible in matrix:
+            self._put_compatibility(method_id, instrument_id, is_compatible)
+        for skill in skills:
+            self._put_skill(dict(skill))
+        for item in demand:
+            self._put_demand(dict(item))
+
+    # Methods
+
+    def has_method(self, method_id):
+        return method_id in self.methods
+
+    def is_base_method(self, method_id):
+        return method_id in self.base_method_ids
+
+    def get_method(self, method_id):
+        return self.methods.get(method_id)
+
+    def _put_method(self, method, profile=None):
+        previous = self.methods.get(method['id'])
+        if previous is not None:
+            _index_remove(self.methods_by_category, previous['category'], method['id'])
+        self.methods[method['id']] = method
+        _index_add(self.methods_by_category, method['category'], method['id'])
+        self._touch('methods')
+        if profile is not None:
+            self.method_profiles[method['id']] = dict(profile)
+
+    def add_method(self, method):
+        self._put_method(dict(method))
+        return self.methods[method['id']]
+
+    def update_method(self, method_id, changes):
+        """Apply field changes to a method and to its published profile"""
+        method = dict(self.methods[method_id])
+        method.update(changes)
+        self._put_method(method)
+        profile = self.method_profiles.get(method_id)
+        if profile is not None:
+            self.method_profiles[method_id] = dict(profile, **changes)
+        return method
+
+    def remove_method(self, method_id):
+        """Remove a method with its matrix entries, skills and demand; returns the impact counts"""
+        impact = {
+            'demand_items_removed': 0,
+            'matrix_entries_removed': 0,
+            'custom_methods_removed': 0,
+            'operator_skill_entries_removed': 0
+        }
+        for demand_id in list(self.demand_by_method.get(method_id, ())):
+            self._drop_demand(demand_id)
+            impact['demand_items_removed'] += 1
+        for instrument_id in list(self.matrix_by_method.get(method_id, ())):
+            self._drop_compatibility(method_id, instrument_id)
+            impact['matrix_entries_removed'] += 1
+        for key in list(self.skills_by_method.get(method_id, ())):
+            self._drop_skill(key)
+            impact['operator_skill_entries_removed'] += 1
+
+        method = self.methods.pop(method_id, None)
+        if method is not None:
+            _index_remove(self.methods_by_category, method['category'], method_id)
+            if method_id not in self.base_method_ids:
+                impact['custom_methods_removed'] = 1
+        self.method_profiles.pop(method_id, None)
+        self.base_method_ids.discard(method_id)
+        self._touch('methods')
+        return impact
+
+    def methods_in_category(self, category):
+        return [self.methods[method_id] for method_id in self.methods_by_category.get(category, ())]
+
+    def method_records(self):
+        return [dict(method) for method in self.methods.values()]
+
+    def method_profile(self, method_id):
+        """Published method view with batch and run-time requirements"""
+        method = self.methods[method_id]
+        profile = self.method_profiles.get(method_id)
+        if profile is not None:
+            return dict(profile)
+        return {
+            'id': method_id,
+            'name': method['name'],
+            'type': 'method',
+            'category': method['category'],
+            'lead_time_days': method['lead_time_days'],
+            'description': method['description'],
+            'instrument_category': method['category'],
+            'instrument_types': self.compatible_instrument_ids(method_id),
+            'batch_size': DEFAULT_METHOD_PROFILE['batch_size'],
+            'time_per_batch': DEFAULT_METHOD_PROFILE['time_per_batch'],
+            'run_time_per_sample': DEFAULT_METHOD_PROFILE['run_time_per_sample'],
+            'qualified_personnel': self.qualified_operator_names(method_id),
+            'is_active': method['is_active']
+        }
+
+    def method_profile_records(self):
+        return [self.method_profile(method_id) for method_id in self.methods]
+
+    # Instruments
+
+    def has_instrument(self, instrument_id):
+        return instrument_id in self.instruments
+
+    def get_instrument(self, instrument_id):
+        return self.instruments.get(instrument_id)
+
+    def _put_instrument(self, instrument):
+        previous = self.instruments.get(instrument['id'])
+        if previous is not None:
+            _index_remove(self.instruments_by_category, previous['category'], instrument['id'])
+        self.instruments[instrument['id']] = instrument
+        _index_add(self.instruments_by_category, instrument['category'], instrument['id'])
+        self._touch('instruments')
+
+    def add_instrument(self, instrument):
+        self._put_instrument(dict(instrument))
+        return self.instruments[instrument['id']]
+
+    def update_instrument(self, instrument_id, changes):
+        instrument = dict(self.instruments[instrument_id])
+        instrument.update(changes)
+        self._put_instrument(instrument)
+        return instrument
+
+    def remove_instrument(self, instrument_id):
+        """Remove an instrument with its matrix entries"""
+        instrument = self.instruments.pop(instrument_id)
+        for method_id in list(self.matrix_by_instrument.get(instrument_id, ())):
+            self._drop_compatibility(method_id, instrument_id)
+        _index_remove(self.instruments_by_category, instrument['category'], instrument_id)
+        self._touch('instruments')
+        return instrument
+
+    def instrument_status(self, instrument_id, default='active'):
+        instrument = self.instruments.get(instrument_id)
+        return instrument['status'] if instrument else default
+
+    def set_instrument_status(self, instrument_id, status):
+        """Set an instrument status; returns the previous status"""
+        instrument = self.instruments[instrument_id]
+        old_status = instrument['status']
+        self.instruments[instrument_id] = dict(instrument, status=status)
+        self._touch('instruments')
+        return old_status
+
+    def instrument_ids_in_category(self, category):
+        return list(self.instruments_by_category.get(category, ()))
+
+    def instrument_records(self):
+        return [dict(instrument) for instrument in self.instruments.values()]
+
+    # Method x instrument compatibility
+
+    def _put_compatibility(self, method_id, instrument_id, is_compatible):
+        self.matrix[(method_id, instrument_id)] = bool(is_compatible)
+        _index_add(self.matrix_by_method, method_id, instrument_id)
+        _index_add(self.matrix_by_instrument, instrument_id, method_id)
+        self._touch('matrix')
+
+    def _drop_compatibility(self, method_id, instrument_id):
+        self.matrix.pop((method_id, instrument_id), None)
+        _index_remove(self.matrix_by_method, method_id, instrument_id)
+        _index_remove(self.matrix_by_instrument, instrument_id, method_id)
+        self._touch('matrix')
+
+    def set_compatibility(self, method_id, instrument_id, is_compatible):
+        self._put_compatibility(method_id, instrument_id, is_compatible)
+
+    def compatible_instrument_ids(self, method_id):
+        return [instrument_id for instrument_id in self.matrix_by_method.get(method_id, ())
+                if self.matrix[(method_id, instrument_id)]]
+
+    def methods_for_instrument(self, instrument_id):
+        return list(self.matrix_by_instrument.get(instrument_id, ()))
+
+    def matrix_entry(self, method_id, instrument_id):
+        """Matrix row with names and live instrument status resolved"""
+        method = self.methods.get(method_id, {})
+        instrument = self.instruments.get(instrument_id, {})
+        status = instrument.get('status', 'active')
+        return {
+            'method_id': method_id,
+            'method_name': method.get('name', method_id),
+            'instrument_category': instrument.get('category', instrument_category_for(method.get('category'))),
+            'instrument_id': instrument_id,
+            'instrument_name': instrument.get('name', instrument_id),
+            'instrument_status': status,
+            'is_compatible': self.matrix[(method_id, instrument_id)],
+            'is_available': status == 'active'
+        }
+
+    def matrix_records(self):
+        return [self.matrix_entry(method_id, instrument_id) for method_id, instrument_id in self.matrix]
+
+    # Operator skills
+
+    def _put_skill(self, skill):
+        key = (skill['operator_id'], skill['method_id'])
+        previous = self.skills.get(key)
+        if previous is not None:
+            _index_remove(self.skills_by_operator, previous['operator_name'], key)
+        self.skills[key] = skill
+        _index_add(self.skills_by_method, skill['method_id'], key)
+        _index_add(self.skills_by_operator, skill['operator_name'], key)
+        self._touch('skills')
+
+    def _drop_skill(self, key):
+        skill = self.skills.pop(key, None)
+        if skill is not None:
+            _index_remove(self.skills_by_method, skill['method_id'], key)
+            _index_remove(self.skills_by_operator, skill['operator_name'], key)
+            self._touch('skills')
+
+    def add_skill(self, skill):
+        self._put_skill(dict(skill))
+
+    def remove_skill(self, operator_id, method_id):
+        self._drop_skill((operator_id, method_id))
+
+    def skills_for_method(self, method_id):
+        return [self.skills[key] for key in self.skills_by_method.get(method_id, ())]
+
+    def skills_for_operator(self, operator_name):
+        return [self.skills[key] for key in self.skills_by_operator.get(operator_name, ())]
+
+    def qualified_operator_names(self, method_id):
+        return [skill['operator_name'] for skill in self.skills_for_method(method_id)]
+
+    def skill_records(self):
+        return [dict(skill) for skill in self.skills.values()]
+
+    # Demand
+
+    def has_demand(self, demand_id):
+        return demand_id in self.demand
+
+    def _put_demand(self, item):
+        previous = self.demand.get(item['id'])
+        if previous is not None:
+            _index_remove(self.demand_by_method, previous['method'], item['id'])
+        self.demand[item['id']] = item
+        _index_add(self.demand_by_method, item['method'], item['id'])
+        self._touch('demand')
+
+    def _drop_demand(self, demand_id):
+        item = self.demand.pop(demand_id, None)
+        if item is not None:
+            _index_remove(self.demand_by_method, item['method'], demand_id)
+            self._touch('demand')
+
+    def add_demand(self, item):
+        self._put_demand(dict(item))
+        return self.demand[item['id']]
+
+    def remove_demand(self, demand_id):
+        self._drop_demand(demand_id)
+
+    def demand_for_method(self, method_id):
+        return [self.demand[demand_id] for demand_id in self.demand_by_method.get(method_id, ())]
+
+    def demand_records(self):
+        return list(self.demand.values())
+
+    def demand_frame(self):
+        """Demand store as a DataFrame, rebuilt only after the demand store changes"""
+        version = self.store_versions(('demand',))
+        if self._demand_frame_version != version:
+            self._demand_frame = pd.DataFrame.from_records(
+                [[item.get(column) for column in DEMAND_COLUMNS] for item in self.demand.values()],
+                columns=DEMAND_COLUMNS
+            )
+            # Low-cardinality keys as categoricals so groupbys skip string hashing
+            self._demand_frame['date'] = self._demand_frame['date'].astype('category')
+            self._demand_frame['method'] = self._demand_frame['method'].astype('category')
+            self._demand_frame_version = version
+        return self._demand_frame
@@ -0,0 +1,149 @@
+"""
+Lab Capacity Model - Chart Payloads
+Chart.js datasets, or the same series as typed columns styled from a manifest the client caches
+"""
+
+import base64
+from datetime import date, timedelta
+
+import numpy as np
+
+# Response formats of the chart endpoints (?format=)
+CHART_FORMATS = ('chartjs', 'columnar')
+
+# Stacked-bar colors (background, border), cycled per method
+CHART_PALETTE = [
+    ('#3b82f6', '#1d4ed8'),
+    ('#10b981', '#059669'),
+    ('#f59e0b', '#d97706'),
+    ('#ef4444', '#b91c1c'),
+    ('#8b5cf6', '#6d28d9'),
+    ('#06b6d4', '#0e7490'),
+    ('#ec4899', '#be185d'),
+    ('#84cc16', '#4d7c0f')
+]
+
+# Dataset styling per chart: fixed datasets in order, or a cycle applied by
+# dataset position. point_colors are per-point colors picked by index.
+CHART_STYLES = {
+    'personnel_utilization': {
+        'datasets': [{'label': 'Utilization %', 'borderColor': '#ffffff', 'borderWidth': 1}],
+        # Senior Scientist, Associate Scientist, Technician, other roles
+        'point_colors': ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728']
+    },
+    'capacity_timeline': {
+        'datasets': [
+            {'label': 'Personnel Capacity', 'borderColor': '#1f77b4', 'backgroundColor': 'rgba(31, 119, 180, 0.1)',
+             'fill': True, 'tension': 0.4},
+            {'label': 'Instrument Capacity', 'borderColor': '#ff7f0e', 'backgroundColor': 'rgba(255, 127, 14, 0.1)',
+             'fill': True, 'tension': 0.4}
+        ]
+    },
+    'utilization_trend': {
+        'datasets': [
+            {'label': 'Personnel Utilization', 'borderColor': '#1f77b4', 'backgroundColor': 'rgba(31, 119, 180, 0.1)',
+             'fill': False, 'tension': 0.4},
+            {'label': 'Instrument Utilization', 'borderColor': '#ff7f0e', 'backgroundColor': 'rgba(255, 127, 14, 0.1)',
+             'fill': False, 'tension': 0.4}
+        ]
+    },
+    'demand_forecast': {
+        'cycle': [{'backgroundColor': background, 'borderColor': border, 'borderWidth': 1}
+                  for background, border in CHART_PALETTE]
+    }
+}
+
+# Column dtype name -> little-endian numpy type, narrowest first
+INTEGER_DTYPES = {'uint8': 'u1', 'int8': 'i1', 'uint16': '<u2', 'int16': '<i2', 'int32': '<i4'}
+# Decimal places tried before falling back to float64
+MAX_SCALED_DECIMALS = 3
+
+
+def _b64(array):
+    return base64.b64encode(array.tobytes()).decode('ascii')
+
+
+def encode_column(values):
+    """A numeric array as {'dtype', 'data'} with data the base64 bytes of a typed array
+
+    Values are sent in the narrowest integer type that holds them exactly.
+    Values with up to MAX_SCALED_DECIMALS decimals go as integers times
+    a power of ten given in 'scale'; anything else goes as float64.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    if values.size and np.isfinite(values).all():
+        for decimals in range(MAX_SCALED_DECIMALS + 1):
+            scaled = values * 10 ** decimals
+            integers = np.round(scaled)
+            if not np.allclose(scaled, integers, rtol=0, atol=1e-6):
+                continue
+            for name, code in INTEGER_DTYPES.items():
+                limits = np.iinfo(code)
+                if limits.min <= integers.min() and integers.max() <= limits.max:
+                    column = {'dtype': name, 'data': _b64(integers.astype(code))}
+                    if decimals:
+                        column['scale'] = 10 ** decimals
+                    return column
+            break
+    elif not values.size:
+        return {'dtype': 'uint8', 'data': ''}
+    return {'dtype': 'float64', 'data': _b64(values.astype('<f8'))}
+
+
+def encode_labels(labels):
+    """Labels as {'start', 'days', 'more'} when they open with a run of consecutive YYYY-MM-DD days
+
+    The run becomes a start date and a day count; labels after it are
+    listed in more. Any other labels are sent as they are.
+    """
+    labels = list(labels)
+    try:
+        start = date.fromisoformat(labels[0])
+    except (IndexError, TypeError, ValueError):
+        return labels
+    run = 0
+    while run < len(labels) and labels[run] == (start + timedelta(days=run)).isoformat():
+        run += 1
+    if run < 2:
+        return labels
+    encoded = {'start': labels[0], 'days': run}
+    if run < len(labels):
+        encoded['more'] = labels[run:]
+    return encoded
+
+
+def chart_payload(style, labels, values, series=None, point_colors=None, fmt='chartjs'):
+    """One chart in the requested format
+
+    values is a (datasets x points) array. The Chart.js form merges each
+    dataset's style from CHART_STYLES into it; the columnar form sends the
+    values as one typed column and leaves styling to the client's copy of
+    CHART_STYLES. series names the datasets of cycled styles, and
+    point_colors holds one index into the style's point_colors per point
+    of the first dataset.
+    """
+    values = np.atleast_2d(np.asarray(values))
+    if fmt == 'columnar':
+        payload = {
+            'format': 'columnar',
+            'style': style,
+            'labels': encode_labels(labels),
+            'values': dict(encode_column(values), shape=list(values.shape))
+        }
+        if series is not None:
+            payload['series'] = list(series)
+        if point_colors is not None:
+            payload['point_colors'] = encode_column(point_colors)
+        return payload
+
+    spec = CHART_STYLES[style]
+    datasets = []
+    for position, row in enumerate(values):
+        dataset = dict(spec['datasets'][position] if 'datasets' in spec else spec['cycle'][position % len(spec['cycle'])])
+        if series is not None:
+            dataset['label'] = series[position]
+        dataset['data'] = row.tolist()
+        datasets.append(dataset)
+    if point_colors is not None:
+        datasets[0]['backgroundColor'] = [spec['point_colors'][code] for code in point_colors]
+    return {'labels': list(labels), 'datasets': datasets}
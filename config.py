@@ -23,6 +23,46 @@ class Config:
         f"?driver=ODBC+Driver+17+for+SQL+Server"
     )
     
+    # Full SQLAlchemy URL override, e.g. sqlite:///lab_capacity.db for local runs
+    DATABASE_URL = os.getenv('DATABASE_URL', '')
+    
+    # Where the Flask API keeps catalog and demand state: 'memory' or 'database'
+    STORE_BACKEND = os.getenv('STORE_BACKEND', 'memory').lower()
+    
+    # Rows per bulk insert statement / flush
+    DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 500))
+    
+    # ELN/LIMS status feeds; with no base URL the API serves built-in demo data
+    ELN_BASE_URL = os.getenv('ELN_BASE_URL', '')
+    ELN_API_TOKEN = os.getenv('ELN_API_TOKEN', '')
+    ELN_POLL_SECONDS = float(os.getenv('ELN_POLL_SECONDS', 15))
+    ELN_TIMEOUT_SECONDS = float(os.getenv('ELN_TIMEOUT_SECONDS', 5))
+    ELN_MAX_CONNECTIONS = int(os.getenv('ELN_MAX_CONNECTIONS', 10))
+    
+    # Monte Carlo simulation: worker processes (0 = one per CPU) and largest run accepted
+    SIMULATION_WORKERS = int(os.getenv('SIMULATION_WORKERS', 0))
+    SIMULATION_MAX_REPLICATIONS = int(os.getenv('SIMULATION_MAX_REPLICATIONS', 20000))
+    
+    # Demand forecasting: where fitted models are kept and processes per refit
+    FORECAST_MODEL_PATH = os.getenv('FORECAST_MODEL_PATH', 'forecast_models.json')
+    FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', 2))
+    
+    # Production server (gunicorn.conf.py): address, worker processes (0 = one per CPU) and threads per worker
+    WEB_BIND = os.getenv('WEB_BIND', '0.0.0.0:8051')
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 0))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 8))
+    # Set by gunicorn.conf.py: background threads start in each worker after the fork, not at import
+    PREFORK_SERVER = os.getenv('PREFORK_SERVER', 'False').lower() == 'true'
+    # Seconds between a worker's checks of the database store for other workers' changes
+    STATE_SYNC_SECONDS = float(os.getenv('STATE_SYNC_SECONDS', 2))
+    # Lock file electing the one worker that polls the ELN for all of them
+    ELN_LEADER_LOCK = os.getenv('ELN_LEADER_LOCK', 'eln_ingestion.lock')
+    # Capacity metric refresh (database store): incremental every METRICS_REFRESH_SECONDS,
+    # a full one at least every METRICS_FULL_REFRESH_SECONDS, run by the worker holding the lock
+    METRICS_REFRESH_SECONDS = float(os.getenv('METRICS_REFRESH_SECONDS', 300))
+    METRICS_FULL_REFRESH_SECONDS = float(os.getenv('METRICS_FULL_REFRESH_SECONDS', 86400))
+    METRICS_LEADER_LOCK = os.getenv('METRICS_LEADER_LOCK', 'capacity_metrics.lock')
+    
     # App settings
     DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
     HOST = os.getenv('HOST', '0.0.0.0')
@@ -40,6 +80,8 @@ class Config:
     @classmethod
     def get_db_connection_string(cls):
         """Get database connection string"""
+        if cls.DATABASE_URL:
+            return cls.DATABASE_URL
         if cls.DB_USERNAME and cls.DB_PASSWORD:
             return cls.DB_CONNECTION_STRING
         else:
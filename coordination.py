@@ -0,0 +1,71 @@
+"""
+Lab Capacity Model - Process Coordination
+Leader election for work one server process does for all of them, and periodic background tasks
+"""
+
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl, and no prefork server either, so the one process always leads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """An exclusive lock on a file, held by one process at a time until it exits
+
+    acquire_async waits for the lock on a daemon thread and calls
+    on_elected once it holds it. The OS releases the lock when the holder
+    exits, so when the leading worker dies or is restarted one of the
+    waiting workers takes over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.thread = None
+
+    def acquire_async(self, on_elected):
+        self.thread = threading.Thread(target=self._wait, args=(on_elected,), name='leader-election', daemon=True)
+        self.thread.start()
+        return self
+
+    def _wait(self, on_elected):
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        logger.info('Process %d holds %s', os.getpid(), self.path)
+        on_elected()
+
+
+class PeriodicTask:
+    """Call task every interval seconds on a daemon thread; a failed call is logged and retried next time"""
+
+    def __init__(self, task, interval, name='periodic-task'):
+        self.task = task
+        self.interval = interval
+        self.name = name
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.task()
+            except Exception:
+                logger.exception('%s failed', self.name)
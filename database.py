@@ -2,17 +2,58 @@
 Database models and operations for Lab Capacity Model
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Text
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Text, UniqueConstraint, Index
+from sqlalchemy import select, func, case, literal, literal_column, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.dialects.mssql import UNIQUEIDENTIFIER
-from datetime import datetime
+from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 from config import Config
 
 # Database setup
 Base = declarative_base()
-engine = create_engine(Config.get_db_connection_string())
+
+# Seconds a SQLite writer waits for another process's write transaction to finish
+SQLITE_BUSY_TIMEOUT = 30
+
+def _sqlite_connect(dbapi_connection, connection_record):
+    # Transactions are begun by _sqlite_begin rather than by the driver
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers in every worker process run alongside the one writer
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+def _sqlite_begin(connection):
+    # Writers take the write lock up front, so two workers never both read
+    # and then fail to upgrade; they queue on the busy timeout instead
+    if connection.get_execution_options().get("write"):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        connection.exec_driver_sql("BEGIN")
+
+def create_db_engine(url=None):
+    """Create an engine with dialect-appropriate options
+
+    Sessions that write should request their connection with the write
+    execution option; on SQLite that begins the transaction IMMEDIATE.
+    """
+    url = url or Config.get_db_connection_string()
+    if url.startswith("sqlite"):
+        # Flask serves requests from several threads, gunicorn from several processes
+        engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT})
+        event.listen(engine, "connect", _sqlite_connect)
+        event.listen(engine, "begin", _sqlite_begin)
+        return engine
+    if url.startswith("mssql+pyodbc"):
+        # fast_executemany turns bulk inserts into array binds instead of one round trip per row
+        return create_engine(url, fast_executemany=True, pool_pre_ping=True)
+    return create_engine(url, pool_pre_ping=True)
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Database Models
@@ -52,7 +93,21 @@ class Instrument(Base):
     installation_date = Column(DateTime)
     last_maintenance = Column(DateTime)
     next_maintenance = Column(DateTime)
+    
+    # Capacity settings managed from the admin console
+    max_batch_size = Column(Integer)
+    avg_batch_size = Column(Integer)
+    run_time_per_sample_min = Column(Integer)
+    failure_rate_percent = Column(Float)
+    setup_time_hours = Column(Float)
+    cleanup_time_hours = Column(Float)
+    throughput_samples_per_day = Column(Integer)
+    efficiency_factor = Column(Float, default=1.0)
+    maintenance_schedule = Column(String(20))
+    last_calibration = Column(String(20))
+    next_calibration = Column(String(20))
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     tasks = relationship("Task", back_populates="assigned_instrument")
@@ -83,6 +138,12 @@ class Project(Base):
 class Task(Base):
     """Tasks table"""
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Covering indexes for the utilization and progress aggregates
+        Index("ix_tasks_window_personnel", "scheduled_start", "assigned_personnel_id", "actual_duration", "estimated_duration"),
+        Index("ix_tasks_project_status", "project_id", "status"),
+        Index("ix_tasks_updated_at", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
@@ -92,13 +153,14 @@ class Task(Base):
     actual_duration = Column(Integer)
     status = Column(String(20), default="Not_Started")  # Not_Started, In_Progress, Completed, Blocked
     priority = Column(String(20), default="Medium")
-    assigned_personnel_id = Column(Integer, ForeignKey("personnel.id"))
-    assigned_instrument_id = Column(Integer, ForeignKey("instruments.id"))
+    assigned_personnel_id = Column(Integer, ForeignKey("personnel.id"), index=True)
+    assigned_instrument_id = Column(Integer, ForeignKey("instruments.id"), index=True)
     scheduled_start = Column(DateTime)
     scheduled_end = Column(DateTime)
     actual_start = Column(DateTime)
     actual_end = Column(DateTime)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     project = relationship("Project", back_populates="tasks")
@@ -108,6 +170,9 @@ class Task(Base):
 class PersonnelAvailability(Base):
     """Personnel availability tracking"""
     __tablename__ = "personnel_availability"
+    __table_args__ = (
+        Index("ix_personnel_availability_updated_at", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     personnel_id = Column(Integer, ForeignKey("personnel.id"))
@@ -115,6 +180,7 @@ class PersonnelAvailability(Base):
     end_date = Column(DateTime, nullable=False)
     availability_type = Column(String(20), nullable=False)  # Available, Vacation, Training, Meeting, Sick
     notes = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     personnel = relationship("Personnel", back_populates="availability")
@@ -122,15 +188,20 @@ class PersonnelAvailability(Base):
 class InstrumentSchedule(Base):
     """Instrument scheduling table"""
     __tablename__ = "instrument_schedules"
+    __table_args__ = (
+        Index("ix_instrument_schedules_window", "start_time", "instrument_id", "end_time", "status", "setup_time", "cleanup_time"),
+        Index("ix_instrument_schedules_updated_at", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    instrument_id = Column(Integer, ForeignKey("instruments.id"))
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"))
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=False)
     status = Column(String(20), default="Scheduled")  # Scheduled, In_Progress, Completed, Cancelled
     setup_time = Column(Integer, default=0)  # in minutes
     cleanup_time = Column(Integer, default=0)  # in minutes
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     instrument = relationship("Instrument", back_populates="schedules")
@@ -139,11 +210,16 @@ class InstrumentSchedule(Base):
 class CapacityMetric(Base):
     """Capacity metrics for reporting"""
     __tablename__ = "capacity_metrics"
+    __table_args__ = (
+        Index("ix_capacity_metrics_period", "period", "date", "resource_type", "resource_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(DateTime, nullable=False)
+    period = Column(String(10), nullable=False, default="day")  # day, week, month
+    date = Column(DateTime, nullable=False)  # first day of the period
     resource_type = Column(String(20), nullable=False)  # Personnel, Instrument
-    resource_id = Column(Integer, nullable=False)
+    resource_id = Column(Integer, nullable=False)  # 0 = all resources of the type
+    available_hours = Column(Float)
     planned_hours = Column(Float)
     actual_hours = Column(Float)
     utilization_rate = Column(Float)
@@ -151,6 +227,100 @@ class CapacityMetric(Base):
     downtime_hours = Column(Float, default=0)
     overtime_hours = Column(Float, default=0)
 
+class Method(Base):
+    """Analytical methods offered by the lab"""
+    __tablename__ = "methods"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    method_id = Column(String(50), unique=True, index=True, nullable=False)
+    name = Column(String(200), nullable=False)
+    description = Column(Text)
+    category = Column(String(50), index=True)
+    lead_time_days = Column(Integer)
+    is_active = Column(Boolean, default=True)
+    is_base = Column(Boolean, default=False)
+    profile = Column(Text)  # JSON published profile: batch size, run time, instrument types
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MethodInstrumentCompatibility(Base):
+    """Method x instrument compatibility matrix"""
+    __tablename__ = "method_instrument_matrix"
+    __table_args__ = (UniqueConstraint("method_id", "instrument_id"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    method_id = Column(String(50), index=True, nullable=False)
+    instrument_id = Column(String(50), index=True, nullable=False)  # instruments.asset_tag
+    is_compatible = Column(Boolean, default=True)
+
+class OperatorSkill(Base):
+    """Operator qualifications per method"""
+    __tablename__ = "operator_skills"
+    __table_args__ = (UniqueConstraint("operator_id", "method_id"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    operator_id = Column(String(50), index=True, nullable=False)
+    operator_name = Column(String(100), index=True)
+    method_id = Column(String(50), index=True, nullable=False)
+    method_name = Column(String(200))
+    proficiency_level = Column(String(50))
+    certification_date = Column(String(20))
+    last_training = Column(String(20))
+    can_train_others = Column(Boolean, default=False)
+    max_batch_size = Column(Integer, default=0)
+
+class DemandItem(Base):
+    """Sample demand requests"""
+    __tablename__ = "demand_items"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    demand_id = Column(String(50), unique=True, index=True, nullable=False)
+    start_date = Column(DateTime, index=True)
+    method_id = Column(String(50), index=True, nullable=False)
+    method_name = Column(String(200))
+    sample_count = Column(Integer, nullable=False)
+    priority = Column(String(20), default="medium")
+    status = Column(String(20), default="pending")  # pending, approved, scheduled, in-progress, completed
+    client = Column(String(100))
+    project = Column(String(200))
+    requirements = Column(Text)
+    assay_breakdown = Column(Text)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RefreshWatermark(Base):
+    """Last change time processed by an incremental refresh job"""
+    __tablename__ = "refresh_watermarks"
+    
+    name = Column(String(50), primary_key=True)
+    watermark = Column(DateTime, nullable=False)
+
+class StoreVersion(Base):
+    """Change counters for the shared state (row 1 the catalog tables); workers reload when one moves"""
+    __tablename__ = "store_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class FeedSnapshot(Base):
+    """Latest records of an ELN feed, published by the one worker that polls the ELN"""
+    __tablename__ = "feed_snapshots"
+    
+    feed = Column(String(50), primary_key=True)
+    records = Column(Text)  # JSON
+    refreshed_at = Column(String(30))
+    error = Column(Text)
+
+class ScenarioDefinition(Base):
+    """A what-if scenario's name and list of changes"""
+    __tablename__ = "scenarios"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+    description = Column(Text)
+    created_at = Column(String(30))
+    changes = Column(Text)  # JSON
+
 # Database operations
 
 def get_db():
@@ -161,9 +331,48 @@ def get_db():
     finally:
         db.close()
 
+def _add_column_ddl(connection, table, column):
+    preparer = connection.dialect.identifier_preparer
+    ddl = f"ALTER TABLE {preparer.format_table(table)} ADD {preparer.quote(column.name)} {column.type.compile(dialect=connection.dialect)}"
+    if column.default is not None and column.default.is_scalar:
+        # Existing rows take the default; a NOT NULL column could not be added to them without one
+        value = literal(column.default.arg, column.type).compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+def upgrade_schema(bind=None):
+    """Add the columns and indexes create_all skips on tables that already exist
+
+    create_all only creates missing tables, so a database made by an earlier
+    version lacks the columns added since (e.g. the instrument capacity
+    settings, updated_at on tasks and bookings, the capacity metric period).
+    Added columns take their scalar default, if any, and are otherwise NULL
+    on existing rows. Returns the names of the columns and indexes added.
+    """
+    added = []
+    with (bind or engine).begin() as connection:
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    connection.execute(text(_add_column_ddl(connection, table, column)))
+                    added.append(f"{table.name}.{column.name}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    added.append(index.name)
+    return added
+
 def create_tables():
-    """Create all tables"""
+    """Create all tables and bring existing ones up to the current schema"""
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
 
 def init_sample_data():
     """Initialize with sample data for MVP"""
@@ -214,69 +423,104 @@ def init_sample_data():
 
 # Data access functions
 
-def get_personnel_utilization():
-    """Get personnel utilization data"""
-    db = SessionLocal()
-    try:
-        # This is a simplified calculation - in production, you'd calculate based on actual scheduling data
-        personnel = db.query(Personnel).all()
-        data = []
-        for person in personnel:
-            # Mock utilization calculation
-            utilization = hash(person.name) % 40 + 60  # Random between 60-100
-            data.append({
-                'id': person.id,
-                'name': person.name,
-                'role': person.role,
-                'department': person.department,
-                'status': person.status,
-                'utilization': utilization
-            })
-        return pd.DataFrame(data)
-    finally:
-        db.close()
+# Utilization window and standard working day used by the data access functions
+UTILIZATION_WINDOW_DAYS = 30
+WORK_HOURS_PER_DAY = 8
 
-def get_instrument_status():
-    """Get instrument status data"""
-    db = SessionLocal()
-    try:
-        instruments = db.query(Instrument).all()
-        data = []
-        for instrument in instruments:
-            # Mock utilization calculation
-            utilization = hash(instrument.name) % 30 + 50 if instrument.status == "Available" else 0
-            data.append({
-                'id': instrument.id,
-                'name': instrument.name,
-                'type': instrument.instrument_type,
-                'location': instrument.location,
-                'status': instrument.status,
-                'utilization': utilization
-            })
-        return pd.DataFrame(data)
-    finally:
-        db.close()
+def _utilization_window(start=None, end=None):
+    """Resolve a reporting window; returns (start, end, available hours per full-time resource)"""
+    end = end or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    start = start or end - timedelta(days=UTILIZATION_WINDOW_DAYS)
+    working_days = int(np.busday_count(start.date(), end.date()))
+    return start, end, max(working_days, 1) * WORK_HOURS_PER_DAY
+
+def _hours_between(start, end):
+    """Dialect-neutral SQL expression for the hours between two datetime columns"""
+    if engine.dialect.name == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 24.0
+    return func.datediff(literal_column("minute"), start, end) / 60.0
+
+def _read_frame(statement):
+    """Run a select and load the rows straight into a DataFrame"""
+    with engine.connect() as connection:
+        return pd.read_sql(statement, connection)
+
+def get_personnel_utilization(start=None, end=None):
+    """Get personnel utilization from task hours booked in the window"""
+    start, end, available_hours = _utilization_window(start, end)
+    
+    # Actual duration when recorded, otherwise the estimate
+    task_minutes = func.coalesce(Task.actual_duration, Task.estimated_duration, 0)
+    busy = (
+        select(Task.assigned_personnel_id.label("personnel_id"), func.sum(task_minutes).label("busy_minutes"))
+        .where(Task.scheduled_start >= start, Task.scheduled_start < end)
+        .group_by(Task.assigned_personnel_id)
+        .subquery()
+    )
+    capacity_hours = available_hours * func.nullif(Personnel.fte_percentage, 0) / 100.0
+    utilization = func.coalesce(busy.c.busy_minutes, 0) / 60.0 * 100.0 / capacity_hours
+    statement = (
+        select(
+            Personnel.id, Personnel.name, Personnel.role, Personnel.department, Personnel.status,
+            func.round(func.coalesce(utilization, 0), 1).label("utilization")
+        )
+        .outerjoin(busy, busy.c.personnel_id == Personnel.id)
+        .order_by(Personnel.id)
+    )
+    return _read_frame(statement)
+
+def get_instrument_status(start=None, end=None):
+    """Get instrument status with utilization from bookings in the window"""
+    start, end, available_hours = _utilization_window(start, end)
+    
+    booked_hours = (
+        _hours_between(InstrumentSchedule.start_time, InstrumentSchedule.end_time)
+        + (func.coalesce(InstrumentSchedule.setup_time, 0) + func.coalesce(InstrumentSchedule.cleanup_time, 0)) / 60.0
+    )
+    busy = (
+        select(InstrumentSchedule.instrument_id, func.sum(booked_hours).label("busy_hours"))
+        .where(
+            InstrumentSchedule.start_time >= start,
+            InstrumentSchedule.start_time < end,
+            InstrumentSchedule.status != "Cancelled"
+        )
+        .group_by(InstrumentSchedule.instrument_id)
+        .subquery()
+    )
+    statement = (
+        select(
+            Instrument.id, Instrument.name, Instrument.instrument_type.label("type"),
+            Instrument.location, Instrument.status,
+            func.round(func.coalesce(busy.c.busy_hours, 0) * 100.0 / available_hours, 1).label("utilization")
+        )
+        .outerjoin(busy, busy.c.instrument_id == Instrument.id)
+        .order_by(Instrument.id)
+    )
+    return _read_frame(statement)
 
 def get_project_data():
-    """Get project data"""
-    db = SessionLocal()
-    try:
-        projects = db.query(Project).all()
-        data = []
-        for project in projects:
-            # Mock progress calculation
-            progress = hash(project.name) % 80 + 10  # Random between 10-90
-            data.append({
-                'id': project.id,
-                'name': project.name,
-                'status': project.status,
-                'priority': project.priority,
-                'progress': progress,
-                'due_date': project.due_date.strftime('%Y-%m-%d') if project.due_date else None
-            })
-        return pd.DataFrame(data)
-    finally:
-        db.close()
+    """Get project data with progress as the share of completed tasks"""
+    progress = (
+        select(
+            Task.project_id,
+            (func.sum(case((Task.status == "Completed", 1), else_=0)) * 100.0 / func.count(Task.id)).label("progress")
+        )
+        .group_by(Task.project_id)
+        .subquery()
+    )
+    statement = (
+        select(
+            Project.id, Project.name, Project.status, Project.priority,
+            func.round(func.coalesce(progress.c.progress, 0), 0).label("progress"),
+            Project.due_date
+        )
+        .outerjoin(progress, progress.c.project_id == Project.id)
+        .order_by(Project.id)
+    )
+    data = _read_frame(statement)
+    due_dates = pd.to_datetime(data["due_date"])
+    data["due_date"] = due_dates.dt.strftime("%Y-%m-%d").astype(object).where(due_dates.notna(), None)
+    return data
 
 if __name__ == "__main__":
     # Initialize database
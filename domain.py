@@ -0,0 +1,142 @@
+"""
+Lab Capacity Model - Domain Records
+Slotted records for methods, instruments, compatibility, skills and demand, loaded from the catalog's dicts
+"""
+
+from dataclasses import dataclass, field, fields
+from operator import attrgetter
+
+import pandas as pd
+
+# Method categories that run on instruments filed under another category
+CATEGORY_ALIASES = {'MS': 'LC-MS'}
+
+DEFAULT_BATCH_SIZE = 24
+
+# Strings read as booleans; anything else in a bool field is an error
+TRUE_STRINGS = {'true', 't', 'yes', 'y', '1', 'on'}
+FALSE_STRINGS = {'false', 'f', 'no', 'n', '0', 'off'}
+
+
+def instrument_category_for(category):
+    """Map a method category onto the instrument category that runs it"""
+    return CATEGORY_ALIASES.get(category, category)
+
+
+def _field(default, *names):
+    """Field read from the first of names present in a source record"""
+    return field(default=default, metadata={'names': names})
+
+
+@dataclass(slots=True)
+class Method:
+    """A method with the batch and run-time requirements it is planned by"""
+    id: str
+    name: str = ''
+    category: str = ''
+    instrument_category: str = _field('', 'instrument_category', 'category')
+    batch_size: int = DEFAULT_BATCH_SIZE
+    time_per_batch: float = 0.0
+    run_time_per_sample: float = 0.0
+    lead_time_days: int = 0
+    is_active: bool = True
+
+    def __post_init__(self):
+        self.instrument_category = instrument_category_for(self.instrument_category)
+
+
+@dataclass(slots=True)
+class Instrument:
+    """An instrument's status and the throughput and overheads it runs with"""
+    id: str
+    name: str = ''
+    category: str = ''
+    status: str = 'active'
+    max_batch_size: int = 0
+    avg_batch_size: int = 1
+    run_time_per_sample_min: float = _field(0.0, 'run_time_per_sample_min', 'run_time_per_sample')
+    failure_rate_percent: float = 0.0
+    setup_time_hours: float = 0.0
+    cleanup_time_hours: float = 0.0
+    throughput_samples_per_day: float = 0.0
+    efficiency_factor: float = 1.0
+
+
+@dataclass(slots=True)
+class Compatibility:
+    """One method x instrument matrix entry"""
+    method_id: str
+    instrument_id: str
+    is_compatible: bool = True
+
+
+@dataclass(slots=True)
+class Skill:
+    """An operator's qualification on a method"""
+    operator_id: str
+    operator_name: str
+    method_id: str
+    proficiency_level: str = ''
+    max_batch_size: int = 0
+
+
+@dataclass(slots=True)
+class DemandItem:
+    """A demand queue item; date is the start date the item is wanted from"""
+    id: str
+    method: str
+    date: str = _field(None, 'start_date', 'date')
+    sample_count: int = 0
+    priority: str = 'medium'
+    status: str = ''
+
+
+def _to_bool(value):
+    """bool('false') is True, so strings are parsed rather than tested for emptiness"""
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in TRUE_STRINGS:
+            return True
+        if text in FALSE_STRINGS:
+            return False
+        raise ValueError(f'Not a boolean: {value!r}')
+    return bool(value)
+
+
+def _to_int(value):
+    """Whole-number field; '12.5' and 12.5 truncate like a float would rather than failing"""
+    return int(float(value)) if isinstance(value, (str, float)) else int(value)
+
+
+# Field type -> coercer, for types whose constructor misreads source values
+COERCERS = {bool: _to_bool, int: _to_int}
+
+
+def load(cls, record):
+    """Build a cls record from a source dict
+
+    Each field is read from its own name, or from the names listed in its
+    metadata for fields whose name drifts between sources. Missing, None
+    and empty values take the field default; the rest are coerced to the
+    field type, through COERCERS where the type's constructor would misread them.
+    """
+    values = {}
+    for spec in fields(cls):
+        for name in spec.metadata.get('names', (spec.name,)):
+            value = record.get(name)
+            if value is not None and value != '':
+                values[spec.name] = COERCERS.get(spec.type, spec.type)(value)
+                break
+    return cls(**values)
+
+
+def load_all(cls, records):
+    return [load(cls, record) for record in records]
+
+
+def to_frame(cls, records, columns=None):
+    """Records as a DataFrame with one column per field (or per name in columns)"""
+    columns = list(columns or (spec.name for spec in fields(cls)))
+    getter = attrgetter(*columns)
+    rows = [getter(item) for item in records] if len(columns) > 1 else [(getter(item),) for item in records]
+    return pd.DataFrame.from_records(rows, columns=columns)
@@ -0,0 +1,290 @@
+"""
+Lab Capacity Model - ELN Stub Server
+Local stand-in for the ELN/LIMS status API, used for development and tests
+
+Run with: python eln_stub.py --port 8060 [--latency 0.2] [--failure-rate 0.1]
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+import random
+import threading
+
+# Status vocabulary the ELN uses on the wire; ingestion maps it back
+ELN_INSTRUMENT_STATES = {'available': 'IDLE', 'running': 'IN_USE', 'maintenance': 'DOWN', 'queued': 'WAITING'}
+ELN_PERSONNEL_STATES = {'available': 'FREE', 'busy': 'ENGAGED', 'on_leave': 'LEAVE'}
+
+# Moment the demo records describe; real-time views of the demo data are computed as of then
+DEMO_AS_OF = '2024-01-25T12:00:00'
+
+DEMO_INSTRUMENT_STATUS = [
+    {
+        'instrument_id': 'HPLC-01',
+        'instrument_name': 'HPLC System 1',
+        'type': 'HPLC',
+        'location': 'Lab A',
+        'status': 'running',
+        'current_sample_batch': 'SAM-001-B2',
+        'current_method': 'HPLC Potency Assay',
+        'operator': 'Alice Johnson',
+        'started_at': '2024-01-25T09:00:00',
+        'estimated_completion': '2024-01-25T15:00:00',
+        'samples_remaining': 8,
+        'total_samples_in_batch': 12,
+        'queue_position': 2,
+        'next_available': '2024-01-25T15:30:00'
+    },
+    {
+        'instrument_id': 'HPLC-04',
+        'instrument_name': 'HPLC System 4',
+        'type': 'HPLC',
+        'location': 'Lab A',
+        'status': 'available',
+        'current_sample_batch': None,
+        'current_method': None,
+        'operator': None,
+        'next_available': '2024-01-25T08:00:00'
+    },
+    {
+        'instrument_id': 'LCMS-02',
+        'instrument_name': 'LC-MS System 2',
+        'type': 'LC-MS',
+        'location': 'Lab A',
+        'status': 'running',
+        'current_sample_batch': 'SAM-002-B1',
+        'current_method': 'LC-MS Impurity Screen',
+        'operator': 'Carol Davis',
+        'started_at': '2024-01-25T10:00:00',
+        'estimated_completion': '2024-01-25T18:00:00',
+        'samples_remaining': 12,
+        'total_samples_in_batch': 18,
+        'queue_position': 1,
+        'next_available': '2024-01-25T18:30:00'
+    },
+    {
+        'instrument_id': 'LCMS-05',
+        'instrument_name': 'LC-MS System 5',
+        'type': 'LC-MS',
+        'location': 'Lab B',
+        'status': 'maintenance',
+        'current_sample_batch': None,
+        'current_method': None,
+        'operator': None,
+        'maintenance_until': '2024-01-26T12:00:00',
+        'next_available': '2024-01-26T12:00:00'
+    },
+    {
+        'instrument_id': 'GC-03',
+        'instrument_name': 'GC System 3',
+        'type': 'GC',
+        'location': 'Lab B',
+        'status': 'queued',
+        'current_sample_batch': None,
+        'current_method': None,
+        'operator': None,
+        'queue_position': 3,
+        'queued_batches': [
+            {'batch_id': 'SAM-005-B1', 'method': 'GC Residual Solvents', 'estimated_duration': 7},
+            {'batch_id': 'SAM-006-B1', 'method': 'GC Residual Solvents', 'estimated_duration': 7}
+        ],
+        'next_available': '2024-01-26T08:00:00'
+    },
+    {
+        'instrument_id': 'NMR-01',
+        'instrument_name': 'NMR System 1',
+        'type': 'NMR',
+        'location': 'Lab C',
+        'status': 'available',
+        'current_sample_batch': None,
+        'current_method': None,
+        'operator': None,
+        'next_available': '2024-01-25T08:00:00'
+    },
+    {
+        'instrument_id': 'DSC-01',
+        'instrument_name': 'DSC System 1',
+        'type': 'DSC',
+        'location': 'Lab C',
+        'status': 'running',
+        'current_sample_batch': 'SAM-004-B1',
+        'current_method': 'DSC Thermal Analysis',
+        'operator': 'Frank Miller',
+        'started_at': '2024-01-25T14:00:00',
+        'estimated_completion': '2024-01-25T22:00:00',
+        'samples_remaining': 3,
+        'total_samples_in_batch': 6,
+        'next_available': '2024-01-25T22:30:00'
+    }
+]
+
+DEMO_PERSONNEL_AVAILABILITY = [
+    {
+        'person_id': 'alice_johnson',
+        'name': 'Alice Johnson',
+        'role': 'Senior Scientist',
+        'status': 'busy',
+        'current_activity': 'Running HPLC-01',
+        'available_from': '2024-01-25T15:30:00',
+        'qualified_methods': ['hplc-potency', 'hplc-impurity'],
+        'shift_end': '2024-01-25T17:00:00'
+    },
+    {
+        'person_id': 'bob_smith',
+        'name': 'Bob Smith',
+        'role': 'Associate Scientist',
+        'status': 'available',
+        'current_activity': None,
+        'available_from': '2024-01-25T08:00:00',
+        'qualified_methods': ['hplc-potency', 'gc-residual'],
+        'shift_end': '2024-01-25T17:00:00'
+    },
+    {
+        'person_id': 'carol_davis',
+        'name': 'Carol Davis',
+        'role': 'Technician',
+        'status': 'busy',
+        'current_activity': 'Running LCMS-02',
+        'available_from': '2024-01-25T18:30:00',
+        'qualified_methods': ['lcms-impurity'],
+        'shift_end': '2024-01-25T17:00:00',
+        'overtime_approved': True
+    },
+    {
+        'person_id': 'david_wilson',
+        'name': 'David Wilson',
+        'role': 'Senior Scientist',
+        'status': 'available',
+        'current_activity': None,
+        'available_from': '2024-01-25T08:00:00',
+        'qualified_methods': ['lcms-impurity'],
+        'shift_end': '2024-01-25T17:00:00'
+    },
+    {
+        'person_id': 'emma_brown',
+        'name': 'Emma Brown',
+        'role': 'Associate Scientist',
+        'status': 'on_leave',
+        'current_activity': 'Vacation',
+        'available_from': '2024-01-28T08:00:00',
+        'qualified_methods': ['hplc-potency', 'hplc-impurity'],
+        'shift_end': '2024-01-25T17:00:00'
+    },
+    {
+        'person_id': 'frank_miller',
+        'name': 'Frank Miller',
+        'role': 'Technician',
+        'status': 'busy',
+        'current_activity': 'Running DSC-01',
+        'available_from': '2024-01-25T22:30:00',
+        'qualified_methods': ['nmr-structure', 'gc-residual'],
+        'shift_end': '2024-01-25T17:00:00',
+        'overtime_approved': True
+    }
+]
+
+
+def eln_records(records, states):
+    """Render demo records the way the ELN API returns them"""
+    return [dict(record, status=states.get(record['status'], record['status'].upper())) for record in records]
+
+
+def make_app(latency=0.0, failure_rate=0.0, instruments=None, personnel=None, fail_next=0):
+    """Build the stub aiohttp application
+
+    latency delays every response by that many seconds and failure_rate is
+    the share of requests answered with a 503, for exercising timeouts and
+    backoff in the ingestion worker. The first fail_next requests always
+    get a 503, so tests can inject a failure deterministically.
+    """
+    from aiohttp import web
+
+    feeds = {
+        'instruments': DEMO_INSTRUMENT_STATUS if instruments is None else instruments,
+        'personnel': DEMO_PERSONNEL_AVAILABILITY if personnel is None else personnel
+    }
+    # Requests served so far, and how many of the next ones to fail
+    state = {'requests': 0, 'fail_next': fail_next}
+
+    def feed_handler(name, states):
+        async def handler(request):
+            state['requests'] += 1
+            if latency:
+                await asyncio.sleep(latency)
+            if state['fail_next'] > 0:
+                state['fail_next'] -= 1
+                return web.json_response({'error': 'ELN temporarily unavailable'}, status=503)
+            if failure_rate and random.random() < failure_rate:
+                return web.json_response({'error': 'ELN temporarily unavailable'}, status=503)
+            return web.json_response({
+                'items': eln_records(feeds[name], states),
+                'generatedAt': datetime.now().isoformat(timespec='seconds')
+            })
+        return handler
+
+    app = web.Application()
+    app['feeds'] = feeds
+    app['state'] = state
+    app.router.add_get('/api/v1/instruments/status', feed_handler('instruments', ELN_INSTRUMENT_STATES))
+    app.router.add_get('/api/v1/personnel/availability', feed_handler('personnel', ELN_PERSONNEL_STATES))
+    return app
+
+
+class StubServer:
+    """Run the stub on a free local port in a background thread
+
+    Usage in tests: ``with StubServer() as stub: worker = IngestionWorker(stub.url, ...)``.
+    Records in ``stub.feeds`` can be edited while it runs, and setting
+    ``stub.state['fail_next']`` fails that many of the following requests.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.url = None
+        self.feeds = None
+        self.state = None
+        self.loop = None
+        self.runner = None
+        self.thread = None
+
+    def start(self):
+        from aiohttp import web
+
+        async def serve():
+            app = make_app(**self.options)
+            self.feeds = app['feeds']
+            self.state = app['state']
+            self.runner = web.AppRunner(app)
+            await self.runner.setup()
+            site = web.TCPSite(self.runner, '127.0.0.1', 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            self.url = f'http://127.0.0.1:{port}'
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='eln-stub', daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(serve(), self.loop).result(timeout=10)
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(timeout=10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    from aiohttp import web
+
+    parser = argparse.ArgumentParser(description='Local stand-in for the ELN/LIMS status API')
+    parser.add_argument('--port', type=int, default=8060)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to delay each response')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of requests answered with 503')
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.failure_rate), host='127.0.0.1', port=args.port)
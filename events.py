@@ -0,0 +1,92 @@
+"""
+Lab Capacity Model - Event Broker
+In-process publish/subscribe for the Server-Sent Events stream
+"""
+
+from collections import deque
+import json
+import queue
+import threading
+import time
+
+# Events kept for clients that reconnect with Last-Event-ID
+HISTORY_SIZE = 512
+
+# Pending events per subscriber before it is treated as stalled and dropped
+SUBSCRIBER_BACKLOG = 256
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+
+
+def format_event(event_id, event, data):
+    """Encode one event in text/event-stream framing"""
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventBroker:
+    """Fan published events out to every subscribed stream
+
+    Each subscriber owns a bounded queue. Publishing never blocks: a
+    subscriber whose queue is full is dropped, and its client reconnects
+    and replays what it missed from the history via Last-Event-ID.
+    """
+
+    def __init__(self, history_size=HISTORY_SIZE, backlog=SUBSCRIBER_BACKLOG):
+        self.backlog = backlog
+        self.history = deque(maxlen=history_size)
+        self.subscribers = set()
+        self.last_id = 0
+        self.lock = threading.Lock()
+
+    def publish(self, event, data):
+        with self.lock:
+            self.last_id += 1
+            message = (self.last_id, event, data)
+            self.history.append(message)
+            stalled = []
+            for subscriber in self.subscribers:
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    stalled.append(subscriber)
+            for subscriber in stalled:
+                self.subscribers.discard(subscriber)
+                # Wake the stream so it closes instead of waiting for a heartbeat
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(None)
+            return self.last_id
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber; returns (queue, missed events to replay first)"""
+        subscriber = queue.Queue(maxsize=self.backlog)
+        with self.lock:
+            missed = []
+            if last_event_id is not None:
+                missed = [message for message in self.history if message[0] > last_event_id]
+            self.subscribers.add(subscriber)
+        return subscriber, missed
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def stream(self, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+        """Generator of SSE frames for one client, ending when the client goes away"""
+        subscriber, missed = self.subscribe(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            for message in missed:
+                yield format_event(*message)
+            while True:
+                try:
+                    message = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield f": keep-alive {int(time.time())}\n\n"
+                    continue
+                if message is None:
+                    return
+                yield format_event(*message)
+        finally:
+            self.unsubscribe(subscriber)
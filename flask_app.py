@@ -3,62 +3,743 @@ Lab Capacity Model - Flask API Server
 Serves data via REST API, frontend rendered with JavaScript
 """
 
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request, g, has_app_context, stream_with_context
+from contextlib import contextmanager
+from functools import lru_cache, wraps
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, date
+import base64
 import json
+import threading
+
+from availability import schedule_availability_index
+from capacity_gap import CLOSED_DEMAND_STATUSES, GROUP_BY, INTERVALS, capacity_gap
+from catalog import Catalog, STORES
+from charts import CHART_FORMATS, CHART_STYLES, chart_payload
+from config import Config
+from coordination import LeaderLock, PeriodicTask
+from domain import CATEGORY_ALIASES, DemandItem, instrument_category_for, load_all
+from eln_stub import DEMO_AS_OF, DEMO_INSTRUMENT_STATUS, DEMO_PERSONNEL_AVAILABILITY
+from events import EventBroker
+from forecasting import ForecastEngine, baseline_models, daily_history
+from ingestion import IngestionWorker, StatusStore
+from realtime import BLOCKED_STATUSES, RealtimeCapacity, parse_time
+from response_cache import ResponseCache
+from scenarios import ScenarioStore, UnknownScenario
+from scheduler import BatchScheduler
+from serialization import FastJSONProvider, ResponseCompressor
+from simulation import run_simulation, simulation_inputs
+from workcalendar import DEFAULT_SHIFT_PATTERN, SHIFT_PATTERNS, WorkCalendar, parse_date
 
 # Initialize Flask app
 app = Flask(__name__)
+# jsonify writes bytes directly (orjson when installed) and accepts DataFrames
+app.json = FastJSONProvider(app)
+
+# Seed catalog data (in production, this would be loaded from the database)
+BASE_METHODS = [
+    {
+        'id': 'HPLC-001',
+        'name': 'HPLC Method A',
+        'description': 'Standard HPLC analysis for organic compounds',
+        'category': 'HPLC',
+        'lead_time_days': 3,
+        'is_active': True
+    },
+    {
+        'id': 'HPLC-002',
+        'name': 'HPLC Method B',
+        'description': 'Advanced HPLC method for complex matrices',
+        'category': 'HPLC',
+        'lead_time_days': 5,
+        'is_active': True
+    },
+    {
+        'id': 'GC-001',
+        'name': 'GC Method A',
+        'description': 'Gas chromatography for volatile compounds',
+        'category': 'GC',
+        'lead_time_days': 2,
+        'is_active': True
+    },
+    {
+        'id': 'MS-001',
+        'name': 'Mass Spec Method A',
+        'description': 'LC-MS/MS analysis for trace compounds',
+        'category': 'MS',
+        'lead_time_days': 7,
+        'is_active': True
+    },
+    {
+        'id': 'ICP-001',
+        'name': 'ICP-MS Method A',
+        'description': 'Inductively coupled plasma mass spectrometry',
+        'category': 'ICP',
+        'lead_time_days': 4,
+        'is_active': True
+    }
+]
+
+# Published method profiles with batch and run-time requirements
+BASE_METHOD_PROFILES = [
+    {
+        'id': 'HPLC-001',
+        'name': 'HPLC Method A',
+        'type': 'method',
+        'category': 'HPLC',
+        'lead_time_days': 5,
+        'description': 'Comprehensive metabolite profiling for biomarker discovery and metabolic pathway analysis',
+        'instrument_category': 'HPLC',
+        'instrument_types': ['HPLC-UV', 'HPLC-RID'],
+        'batch_size': 24,
+        'time_per_batch': 4,
+        'run_time_per_sample': 10,
+        'qualified_personnel': ['Dr. Sarah Chen', 'Alice Johnson'],
+        'is_active': True
+    },
+    {
+        'id': 'HPLC-002',
+        'name': 'HPLC Method B', 
+        'type': 'method',
+        'category': 'HPLC',
+        'lead_time_days': 5,
+        'description': 'Advanced HPLC method for complex matrices',
+        'instrument_category': 'HPLC',
+        'instrument_types': ['HPLC-UV', 'HPLC-CAD'],
+        'batch_size': 24,
+        'time_per_batch': 5,
+        'run_time_per_sample': 12,
+        'qualified_personnel': ['Dr. James Thompson', 'David Wilson'],
+        'is_active': True
+    },
+    {
+        'id': 'GC-001',
+        'name': 'GC Method A',
+        'type': 'method',
+        'category': 'GC',
+        'lead_time_days': 2,
+        'description': 'Gas chromatography for volatile compounds',
+        'instrument_category': 'GC',
+        'instrument_types': ['GC-FID', 'GC-MS'],
+        'batch_size': 36,
+        'time_per_batch': 3,
+        'run_time_per_sample': 5,
+        'qualified_personnel': ['Dr. Michael Rodriguez', 'Bob Smith'],
+        'is_active': True
+    },
+    {
+        'id': 'MS-001',
+        'name': 'Mass Spec Method A',
+        'type': 'method',
+        'category': 'MS',
+        'lead_time_days': 7,
+        'description': 'LC-MS/MS analysis for trace compounds',
+        'instrument_category': 'LC-MS',
+        'instrument_types': ['LC-MS/MS', 'LC-MS'],
+        'batch_size': 16,
+        'time_per_batch': 6,
+        'run_time_per_sample': 22,
+        'qualified_personnel': ['Dr. Sarah Chen', 'Emma Brown'],
+        'is_active': True
+    },
+    {
+        'id': 'ICP-001',
+        'name': 'ICP-MS Method A',
+        'type': 'method',
+        'category': 'ICP',
+        'lead_time_days': 4,
+        'description': 'Inductively coupled plasma mass spectrometry',
+        'instrument_category': 'ICP',
+        'instrument_types': ['ICP-MS', 'ICP-OES'],
+        'batch_size': 48,
+        'time_per_batch': 4,
+        'run_time_per_sample': 5,
+        'qualified_personnel': ['Dr. Lisa Anderson', 'Carol Davis'],
+        'is_active': True
+    }
+]
+
+BASE_INSTRUMENTS = [
+    # HPLC Instruments
+    {
+        'id': 'HPLC-01',
+        'name': 'Agilent 1260 HPLC',
+        'category': 'HPLC',
+        'status': 'active',
+        'location': 'Lab A-101',
+        'max_batch_size': 96,
+        'avg_batch_size': 77,
+        'run_time_per_sample_min': 10,
+        'failure_rate_percent': 2.5,
+        'setup_time_hours': 1.0,
+        'cleanup_time_hours': 0.5,
+        'throughput_samples_per_day': 192,
+        'efficiency_factor': 1.0,
+        'maintenance_schedule': 'Weekly',
+        'last_calibration': '2024-01-15',
+        'next_calibration': '2024-02-15'
+    },
+    {
+        'id': 'HPLC-02',
+        'name': 'Waters Alliance HPLC',
+        'category': 'HPLC',
+        'status': 'active',
+        'location': 'Lab A-102',
+        'max_batch_size': 96,
+        'avg_batch_size': 77,
+        'run_time_per_sample_min': 12,
+        'failure_rate_percent': 3.0,
+        'setup_time_hours': 1.5,
+        'cleanup_time_hours': 0.5,
+        'throughput_samples_per_day': 160,
+        'efficiency_factor': 0.9,
+        'maintenance_schedule': 'Weekly',
+        'last_calibration': '2024-01-20',
+        'next_calibration': '2024-02-20'
+    },
+    {
+        'id': 'HPLC-03',
+        'name': 'Shimadzu LC-20AD HPLC',
+        'category': 'HPLC',
+        'status': 'maintenance',
+        'location': 'Lab A-103',
+        'max_batch_size': 48,
+        'avg_batch_size': 38,
+        'run_time_per_sample_min': 15,
+        'failure_rate_percent': 4.5,
+        'setup_time_hours': 2.0,
+        'cleanup_time_hours': 1.0,
+        'throughput_samples_per_day': 96,
+        'efficiency_factor': 0.8,
+        'maintenance_schedule': 'Bi-weekly',
+        'last_calibration': '2024-01-10',
+        'next_calibration': '2024-02-10'
+    },
+    # GC Instruments
+    {
+        'id': 'GC-01',
+        'name': 'Agilent 7890B GC',
+        'category': 'GC',
+        'status': 'active',
+        'location': 'Lab B-201',
+        'max_batch_size': 48,
+        'avg_batch_size': 38,
+        'run_time_per_sample_min': 25,
+        'failure_rate_percent': 1.8,
+        'setup_time_hours': 0.5,
+        'cleanup_time_hours': 0.25,
+        'throughput_samples_per_day': 96,
+        'efficiency_factor': 1.0,
+        'maintenance_schedule': 'Bi-weekly',
+        'last_calibration': '2024-01-18',
+        'next_calibration': '2024-02-18'
+    },
+    {
+        'id': 'GC-02',
+        'name': 'Shimadzu GC-2010 Plus',
+        'category': 'GC',
+        'status': 'active',
+        'location': 'Lab B-202',
+        'max_batch_size': 36,
+        'avg_batch_size': 29,
+        'run_time_per_sample_min': 30,
+        'failure_rate_percent': 2.2,
+        'setup_time_hours': 0.75,
+        'cleanup_time_hours': 0.5,
+        'throughput_samples_per_day': 72,
+        'efficiency_factor': 0.95,
+        'maintenance_schedule': 'Bi-weekly',
+        'last_calibration': '2024-01-22',
+        'next_calibration': '2024-02-22'
+    },
+    {
+        'id': 'GC-03',
+        'name': 'PerkinElmer Clarus 590 GC',
+        'category': 'GC',
+        'status': 'inactive',
+        'location': 'Lab B-203',
+        'max_batch_size': 24,
+        'avg_batch_size': 19,
+        'run_time_per_sample_min': 35,
+        'failure_rate_percent': 3.8,
+        'setup_time_hours': 1.0,
+        'cleanup_time_hours': 0.75,
+        'throughput_samples_per_day': 48,
+        'efficiency_factor': 0.85,
+        'maintenance_schedule': 'Monthly',
+        'last_calibration': '2024-01-05',
+        'next_calibration': '2024-02-05'
+    },
+    # LC-MS Instruments
+    {
+        'id': 'MS-01',
+        'name': 'Thermo Q Exactive MS',
+        'category': 'LC-MS',
+        'status': 'active',
+        'location': 'Lab C-301',
+        'max_batch_size': 24,
+        'avg_batch_size': 19,
+        'run_time_per_sample_min': 45,
+        'failure_rate_percent': 4.2,
+        'setup_time_hours': 2.0,
+        'cleanup_time_hours': 1.0,
+        'throughput_samples_per_day': 48,
+        'efficiency_factor': 1.0,
+        'maintenance_schedule': 'Monthly',
+        'last_calibration': '2024-01-25',
+        'next_calibration': '2024-02-25'
+    },
+    {
+        'id': 'MS-02',
+        'name': 'Waters Xevo TQ-XS MS',
+        'category': 'LC-MS',
+        'status': 'active',
+        'location': 'Lab C-302',
+        'max_batch_size': 32,
+        'avg_batch_size': 26,
+        'run_time_per_sample_min': 35,
+        'failure_rate_percent': 3.5,
+        'setup_time_hours': 1.5,
+        'cleanup_time_hours': 0.75,
+        'throughput_samples_per_day': 64,
+        'efficiency_factor': 0.95,
+        'maintenance_schedule': 'Monthly',
+        'last_calibration': '2024-01-28',
+        'next_calibration': '2024-02-28'
+    },
+    # ICP Instruments
+    {
+        'id': 'ICP-01',
+        'name': 'PerkinElmer NexION ICP-MS',
+        'category': 'ICP',
+        'status': 'active',
+        'location': 'Lab D-401',
+        'max_batch_size': 72,
+        'avg_batch_size': 58,
+        'run_time_per_sample_min': 15,
+        'failure_rate_percent': 1.5,
+        'setup_time_hours': 1.0,
+        'cleanup_time_hours': 0.5,
+        'throughput_samples_per_day': 144,
+        'efficiency_factor': 1.0,
+        'maintenance_schedule': 'Bi-weekly',
+        'last_calibration': '2024-01-30',
+        'next_calibration': '2024-02-29'
+    },
+    {
+        'id': 'ICP-02',
+        'name': 'Agilent 7900 ICP-MS',
+        'category': 'ICP',
+        'status': 'active',
+        'location': 'Lab D-402',
+        'max_batch_size': 96,
+        'avg_batch_size': 77,
+        'run_time_per_sample_min': 12,
+        'failure_rate_percent': 1.2,
+        'setup_time_hours': 0.75,
+        'cleanup_time_hours': 0.25,
+        'throughput_samples_per_day': 192,
+        'efficiency_factor': 1.1,
+        'maintenance_schedule': 'Bi-weekly',
+        'last_calibration': '2024-02-01',
+        'next_calibration': '2024-03-01'
+    },
+    {
+        'id': 'ICP-03',
+        'name': 'Thermo iCAP RQ ICP-MS',
+        'category': 'ICP',
+        'status': 'maintenance',
+        'location': 'Lab D-403',
+        'max_batch_size': 48,
+        'avg_batch_size': 38,
+        'run_time_per_sample_min': 20,
+        'failure_rate_percent': 2.8,
+        'setup_time_hours': 2.0,
+        'cleanup_time_hours': 1.0,
+        'throughput_samples_per_day': 72,
+        'efficiency_factor': 0.8,
+        'maintenance_schedule': 'Monthly',
+        'last_calibration': '2024-01-15',
+        'next_calibration': '2024-02-15'
+    }
+    ]
 
-# In-memory storage for added data (in production, this would be a database)
-added_demand_items = []
-added_methods = []
-added_method_instrument_matrix = []
-
-# Global instrument status store - this will be updated when status changes
-instrument_status_store = {
-    'HPLC-01': 'active',
-    'HPLC-02': 'active', 
-    'HPLC-03': 'maintenance',
-    'GC-01': 'active',
-    'GC-02': 'active',
-    'GC-03': 'inactive',
-    'MS-01': 'active',
-    'MS-02': 'active',
-    'ICP-01': 'active',
-    'ICP-02': 'active',
-    'ICP-03': 'maintenance'
-}
-
-# Store for base method edits (simulating database updates)
-base_method_edits = {}
-
-# Store for method-instrument compatibility changes
-method_instrument_compatibility = {}
-added_operator_skills = []
-removed_methods = set()
-
-BASE_METHOD_IDS = {'HPLC-001', 'HPLC-002', 'GC-001', 'MS-001', 'ICP-001'}
+# (method_id, instrument_id, is_compatible)
+BASE_METHOD_INSTRUMENT_MATRIX = [
+    ('HPLC-001', 'HPLC-01', True),
+    ('HPLC-001', 'HPLC-02', True),
+    ('HPLC-001', 'HPLC-03', False),
+    ('HPLC-002', 'HPLC-01', True),
+    ('HPLC-002', 'HPLC-02', False),
+    ('HPLC-002', 'HPLC-03', True),
+    ('GC-001', 'GC-01', True),
+    ('GC-001', 'GC-02', True),
+    ('GC-001', 'GC-03', False),
+    ('MS-001', 'MS-01', True),
+    ('MS-001', 'MS-02', True),
+    ('ICP-001', 'ICP-01', True),
+    ('ICP-001', 'ICP-02', True),
+    ('ICP-001', 'ICP-03', False)
+]
+
+BASE_OPERATOR_SKILLS = [
+    {
+        'operator_id': 'OP-001',
+        'operator_name': 'Alice Johnson',
+        'method_id': 'HPLC-001',
+        'method_name': 'HPLC Method A',
+        'proficiency_level': 'Expert',
+        'certification_date': '2020-02-15',
+        'last_training': '2023-01-10',
+        'can_train_others': True,
+        'max_batch_size': 96
+    },
+    {
+        'operator_id': 'OP-001',
+        'operator_name': 'Alice Johnson',
+        'method_id': 'GC-001',
+        'method_name': 'GC Method A',
+        'proficiency_level': 'Intermediate',
+        'certification_date': '2020-03-20',
+        'last_training': '2022-08-15',
+        'can_train_others': False,
+        'max_batch_size': 48
+    },
+    {
+        'operator_id': 'OP-001',
+        'operator_name': 'Alice Johnson',
+        'method_id': 'MS-001',
+        'method_name': 'Mass Spec Method A',
+        'proficiency_level': 'Beginner',
+        'certification_date': '2021-05-10',
+        'last_training': '2023-03-05',
+        'can_train_others': False,
+        'max_batch_size': 24
+    },
+    {
+        'operator_id': 'OP-002',
+        'operator_name': 'Bob Smith',
+        'method_id': 'HPLC-001',
+        'method_name': 'HPLC Method A',
+        'proficiency_level': 'Expert',
+        'certification_date': '2019-04-01',
+        'last_training': '2023-02-20',
+        'can_train_others': True,
+        'max_batch_size': 96
+    },
+    {
+        'operator_id': 'OP-002',
+        'operator_name': 'Bob Smith',
+        'method_id': 'HPLC-002',
+        'method_name': 'HPLC Method B',
+        'proficiency_level': 'Expert',
+        'certification_date': '2019-06-15',
+        'last_training': '2023-01-15',
+        'can_train_others': True,
+        'max_batch_size': 48
+    },
+    {
+        'operator_id': 'OP-002',
+        'operator_name': 'Bob Smith',
+        'method_id': 'GC-001',
+        'method_name': 'GC Method A',
+        'proficiency_level': 'Advanced',
+        'certification_date': '2019-05-10',
+        'last_training': '2022-11-30',
+        'can_train_others': True,
+        'max_batch_size': 48
+    },
+    {
+        'operator_id': 'OP-002',
+        'operator_name': 'Bob Smith',
+        'method_id': 'ICP-001',
+        'method_name': 'ICP-MS Method A',
+        'proficiency_level': 'Intermediate',
+        'certification_date': '2020-08-20',
+        'last_training': '2023-02-10',
+        'can_train_others': False,
+        'max_batch_size': 72
+    }
+]
+
+# Indexed catalog of methods, instruments, compatibility, skills and added demand
+catalog = Catalog()
+catalog.load(
+    methods=BASE_METHODS,
+    method_profiles=BASE_METHOD_PROFILES,
+    instruments=BASE_INSTRUMENTS,
+    matrix=BASE_METHOD_INSTRUMENT_MATRIX,
+    skills=BASE_OPERATOR_SKILLS,
+    base=True
+)
+
+# Taken by catalog writers and reloads, one at a time; readers never wait on it
+catalog_lock = threading.Lock()
+
+# Database-backed store shared by every worker (STORE_BACKEND=database); the
+# seed data above only populates empty tables
+repository = None
+catalog_version = None
+if Config.STORE_BACKEND == 'database':
+    from repository import CatalogRepository, FeedPublisher
+    repository = CatalogRepository()
+    repository.create_schema()
+    repository.seed(catalog)
+    catalog, catalog_version = repository.load_catalog()
+
+# Last solved schedule over the demand queue, repaired in place on edits: a
+# (catalog versions it matches, scheduler, draft of a repair not yet published) tuple
+last_schedule = None
+# Held while the cached schedule is repaired, replaced or read
+schedule_lock = threading.Lock()
+
+# Serialized JSON of read-mostly endpoints, keyed on the catalog stores they read
+response_cache = ResponseCache()
+
+# gzip/brotli for JSON responses, remembering the encoded bodies of cached ones
+response_compressor = ResponseCompressor()
+
+# Change notifications pushed to open /api/events streams in this process
+event_broker = EventBroker()
+
+# Named what-if scenarios, each a copy-on-write overlay of the catalog
+scenario_store = ScenarioStore(repository)
+
+# Versions of the ELN feeds and scenarios last synced from the database store
+status_version = None
+scenarios_version = None
+
+# Per-method demand models, refitted in the background as demand history changes
+forecast_engine = ForecastEngine(Config.FORECAST_MODEL_PATH, Config.FORECAST_WORKERS)
+
+
+@app.before_request
+def sync_shared_state():
+    """Reload the catalog, ELN feeds or scenarios when another worker has changed them in the database store"""
+    global catalog, catalog_version, status_version, scenarios_version
+    if repository is None:
+        return
+    versions = repository.versions()
+    if (versions['catalog'] == catalog_version and versions['scenarios'] == scenarios_version
+            and (versions['status'] == status_version or not Config.ELN_BASE_URL)):
+        return
+    # Under the writers' lock, so a reload never lands between a write and its publish
+    with catalog_lock:
+        if versions['catalog'] != catalog_version:
+            catalog, catalog_version = repository.load_catalog()
+            invalidate_schedule()
+            # Another worker made the change, so we only know that something moved
+            notify('catalog_changed', stores=list(STORES), source='sync')
+        if Config.ELN_BASE_URL and versions['status'] != status_version:
+            status_version = versions['status']
+            for name, (records, refreshed_at, error) in repository.load_feeds().items():
+                status_store.restore(name, records, refreshed_at, error)
+        if versions['scenarios'] != scenarios_version:
+            scenarios_version = versions['scenarios']
+            scenario_store.sync(repository.load_scenarios())
+
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON bodies for clients that accept gzip or brotli"""
+    return response_compressor(response, request.accept_encodings)
+
+
+def persist(operation, *args):
+    """Write a catalog change through to the database store, if one is configured"""
+    global catalog_version
+    if repository is None:
+        return
+    version = getattr(repository, operation)(*args)
+    # Only skip the next reload if no other worker wrote in between
+    if version == catalog_version + 1:
+        catalog_version = version
+
+
+@contextmanager
+def catalog_transaction():
+    """Stage catalog changes on a draft and publish them together
+
+    Yields a copy-on-write fork of the live catalog. Writers run one at a
+    time, and their checks belong inside the block too, so that nothing
+    changes between check and write. When the block completes, persist()
+    calls included, the draft is merged and becomes the live catalog in
+    one assignment: readers see all of a multi-store change or none of it,
+    and never wait. If the block raises, nothing is published.
+    """
+    global catalog
+    with catalog_lock:
+        draft = catalog.fork()
+        yield draft
+        catalog = draft.merged()
+        publish_schedule_repair(draft)
+    if has_app_context():
+        # Let the rest of this request read its own write
+        g.pop('catalog', None)
+
+
+def live_catalog():
+    """The live catalog as this request first read it, so one request never mixes two versions
+
+    Outside a request, such as on the ELN ingestion thread, it is the
+    snapshot published at the time of the call.
+    """
+    if not has_app_context():
+        return catalog
+    return g.setdefault('catalog', catalog)
+
+
+def current_scenario():
+    """The scenario named by the request's scenario= argument, or None for live data"""
+    name = request.args.get('scenario')
+    if not name:
+        return None
+    scenario = scenario_store.get(name)
+    scenario_store.catalog(name, live_catalog())
+    return scenario
+
+
+def get_catalog():
+    """The catalog views read from: the requested scenario's overlay, else the live catalog"""
+    name = request.args.get('scenario')
+    return scenario_store.catalog(name, live_catalog()) if name else live_catalog()
+
+
+@app.errorhandler(UnknownScenario)
+def unknown_scenario(e):
+    return jsonify({'success': False, 'message': f'Unknown scenario {e.args[0]}'}), 404
+
+
+def notify(event, **data):
+    """Publish a change to the clients listening on /api/events"""
+    data['timestamp'] = datetime.now().isoformat()
+    return event_broker.publish(event, data)
+
+
+def catalog_method_category(method_id):
+    """Instrument category of a catalog method, or None for methods only the ELN knows"""
+    method = live_catalog().methods.get(method_id)
+    return instrument_category_for(method['category']) if method else None
+
+
+def publish_status_change(feed, changed, removed):
+    """Apply an ELN status delta from the ingestion worker and forward it to /api/events"""
+    realtime_capacity.apply(feed, changed, removed)
+    notify(f'eln_{feed}', changed=changed, removed=removed)
+
+
+# Next-free times per category, maintained from the ELN deltas
+realtime_capacity = RealtimeCapacity(method_category=catalog_method_category)
+# Catalog instruments version the blocked set was last taken from
+realtime_blocked_key = None
+
+# Latest ELN/LIMS records, kept fresh by a background worker when an ELN is configured
+status_store = StatusStore(on_change=publish_status_change)
+if not Config.ELN_BASE_URL:
+    status_store.replace('instruments', DEMO_INSTRUMENT_STATUS, notify=False)
+    status_store.replace('personnel', DEMO_PERSONNEL_AVAILABILITY, notify=False)
+    realtime_capacity.load(status_store.snapshot('instruments'), status_store.snapshot('personnel'))
+
+ingestion_worker = None
+leader_lock = None
+state_sync = None
+metrics_lock = None
+metrics_refresh = None
+
+
+def start_ingestion():
+    """Poll the ELN into this process's status store, or for every worker into the database store"""
+    global ingestion_worker
+    ingestion_worker = IngestionWorker(
+        Config.ELN_BASE_URL, status_store if repository is None else FeedPublisher(repository),
+        interval=Config.ELN_POLL_SECONDS,
+        timeout=Config.ELN_TIMEOUT_SECONDS,
+        max_connections=Config.ELN_MAX_CONNECTIONS,
+        token=Config.ELN_API_TOKEN or None
+    ).start()
+
+
+def start_metrics_refresh():
+    """Keep the capacity metrics behind /api/utilization/trend up to date for every worker"""
+    global metrics_refresh
+    from utilization import refresh_changed_metrics
+    metrics_refresh = PeriodicTask(
+        lambda: refresh_changed_metrics(full_every=Config.METRICS_FULL_REFRESH_SECONDS),
+        Config.METRICS_REFRESH_SECONDS, name='metrics-refresh'
+    ).start()
+
+
+def start_background_threads():
+    """Start this process's ELN polling, metrics refresh and shared-state sync
+
+    Called at import, or by the prefork server in each worker after the
+    fork, since threads do not survive one. With the database store one
+    worker, elected by a lock file, polls the ELN for all of them, another
+    lock elects the one that refreshes the capacity metrics, and every
+    worker syncs from the database every STATE_SYNC_SECONDS so that its
+    /api/events clients hear of other workers' changes.
+    """
+    global leader_lock, metrics_lock, state_sync
+    if repository is None:
+        if Config.ELN_BASE_URL:
+            start_ingestion()
+        return
+    state_sync = PeriodicTask(sync_shared_state, Config.STATE_SYNC_SECONDS, name='state-sync').start()
+    metrics_lock = LeaderLock(Config.METRICS_LEADER_LOCK).acquire_async(start_metrics_refresh)
+    if Config.ELN_BASE_URL:
+        leader_lock = LeaderLock(Config.ELN_LEADER_LOCK).acquire_async(start_ingestion)
+
+
+# Simulation and forecast pool workers import the main module as __mp_main__ and must not poll
+if not Config.PREFORK_SERVER and __name__ != '__mp_main__':
+    start_background_threads()
+
+
+def cached_response(*stores, daily=False, version=None):
+    """Serve a view's JSON from the response cache until one of its stores changes
+
+    Views whose output also depends on today's date pass daily=True, and
+    ones that depend on other state pass a version callable for it.
+    Responses carry an ETag, so polling clients that send If-None-Match
+    get a 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (
+                request.full_path,
+                get_catalog().store_versions(stores),
+                datetime.now().date() if daily else None,
+                version() if version else None
+            )
+            entry = response_cache.get(key)
+            if entry is None:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = response_cache.put(key, response.get_data())
+            body, etag = entry
+            response = app.response_class(body, mimetype='application/json')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def shared(name, factory):
+    """Per-request memo so views dispatched together reuse intermediate data"""
+    memo = g.setdefault('shared', {})
+    # Batched views can ask for different scenarios within one request
+    key = (request.args.get('scenario'), name)
+    if key not in memo:
+        memo[key] = factory()
+    return memo[key]
 
 
 def is_base_method(method_id):
-    return method_id in BASE_METHOD_IDS
-
-
-def method_exists(method_id):
-    active_base = BASE_METHOD_IDS - removed_methods
-    added_ids = {m['id'] for m in added_methods if m['id'] not in removed_methods}
-    return method_id in active_base or method_id in added_ids
-
-
-def get_all_method_ids(include_removed=False):
-    ids = set(BASE_METHOD_IDS)
-    ids.update(m['id'] for m in added_methods)
-    if not include_removed:
-        ids -= removed_methods
-    return ids
+    return get_catalog().is_base_method(method_id)
 
 # Sample data for MVP
 def get_sample_data():
@@ -152,37 +833,42 @@ def api_dashboard():
 @app.route('/api/personnel')
 def api_personnel():
     """Get personnel data"""
-    return jsonify(df_personnel.to_dict('records'))
+    return jsonify(df_personnel)
 
 @app.route('/api/instruments')
 def api_instruments():
     """Get instruments data"""
-    return jsonify(df_instruments.to_dict('records'))
+    return jsonify(df_instruments)
 
 @app.route('/api/projects')
 def api_projects():
     """Get projects data"""
-    return jsonify(df_projects.to_dict('records'))
+    return jsonify(df_projects)
+
+# Personnel role -> bar color index in the personnel_utilization chart style; other roles use the last
+PERSONNEL_ROLE_COLORS = {'Senior Scientist': 0, 'Associate Scientist': 1, 'Technician': 2}
+
+def chart_format():
+    """The format= argument of a chart endpoint: chartjs (default) or columnar"""
+    return request.args.get('format', 'chartjs')
+
+def invalid_chart_format():
+    return jsonify({'success': False, 'message': f"format must be one of: {', '.join(CHART_FORMATS)}"}), 400
+
+@app.route('/api/charts/styles')
+@cached_response()
+def api_chart_styles():
+    """Dataset styles of the chart endpoints, for decoding their format=columnar responses"""
+    return jsonify(CHART_STYLES)
 
 @app.route('/api/personnel/utilization')
 def api_personnel_utilization():
     """Get personnel utilization chart data"""
-    chart_data = {
-        'labels': df_personnel['name'].tolist(),
-        'datasets': [{
-            'label': 'Utilization %',
-            'data': df_personnel['utilization'].tolist(),
-            'backgroundColor': [
-                '#1f77b4' if role == 'Senior Scientist' else
-                '#ff7f0e' if role == 'Associate Scientist' else
-                '#2ca02c' if role == 'Technician' else '#d62728'
-                for role in df_personnel['role']
-            ],
-            'borderColor': '#ffffff',
-            'borderWidth': 1
-        }]
-    }
-    return jsonify(chart_data)
+    if chart_format() not in CHART_FORMATS:
+        return invalid_chart_format()
+    colors = df_personnel['role'].map(PERSONNEL_ROLE_COLORS).fillna(3).astype(int).tolist()
+    return jsonify(chart_payload('personnel_utilization', df_personnel['name'], [df_personnel['utilization']],
+                                 point_colors=colors, fmt=chart_format()))
 
 @app.route('/api/instruments/status')
 def api_instrument_status():
@@ -201,34 +887,20 @@ def api_instrument_status():
 
 @app.route('/api/capacity/timeline')
 def api_capacity_timeline():
-    """Get capacity timeline data"""
+    """Get capacity timeline data
+
+    Sample data, the same for every scenario; scenario= is only checked.
+    """
+    if chart_format() not in CHART_FORMATS:
+        return invalid_chart_format()
+    current_scenario()
     # Generate sample timeline data
     dates = pd.date_range(start=datetime.now(), periods=14, freq='D')
     personnel_capacity = np.random.randint(70, 95, 14)
     instrument_capacity = np.random.randint(60, 90, 14)
     
-    chart_data = {
-        'labels': [d.strftime('%Y-%m-%d') for d in dates],
-        'datasets': [
-            {
-                'label': 'Personnel Capacity',
-                'data': personnel_capacity.tolist(),
-                'borderColor': '#1f77b4',
-                'backgroundColor': 'rgba(31, 119, 180, 0.1)',
-                'fill': True,
-                'tension': 0.4
-            },
-            {
-                'label': 'Instrument Capacity',
-                'data': instrument_capacity.tolist(),
-                'borderColor': '#ff7f0e',
-                'backgroundColor': 'rgba(255, 127, 14, 0.1)',
-                'fill': True,
-                'tension': 0.4
-            }
-        ]
-    }
-    return jsonify(chart_data)
+    return jsonify(chart_payload('capacity_timeline', dates.strftime('%Y-%m-%d'),
+                                 [personnel_capacity, instrument_capacity], fmt=chart_format()))
 
 @app.route('/api/schedule/gantt')
 def api_schedule_gantt():
@@ -288,159 +960,173 @@ def api_assignments_today():
 
 @app.route('/api/utilization/trend')
 def api_utilization_trend():
-    """Get utilization trend data"""
-    # Generate sample trend data
-    dates = pd.date_range(start=datetime.now() - timedelta(days=30), periods=30, freq='D')
-    personnel_util = np.random.randint(70, 95, 30)
-    instrument_util = np.random.randint(60, 90, 30)
+    """Get utilization trend data from the capacity metric rollups"""
+    period = request.args.get('period', 'day')
+    if period not in ('day', 'week', 'month'):
+        return jsonify({'success': False, 'message': 'period must be one of: day, week, month'}), 400
+    if chart_format() not in CHART_FORMATS:
+        return invalid_chart_format()
+    
+    if repository is not None:
+        from utilization import get_utilization_trend
+        trend = get_utilization_trend(period, 30 if period == 'day' else 12).fillna(0)
+        dates = trend.index
+        personnel_util = trend['Personnel'].round(1)
+        instrument_util = trend['Instrument'].round(1)
+    else:
+        # No database store: sample trend data for the demo
+        dates = pd.date_range(start=datetime.now() - timedelta(days=30), periods=30, freq='D')
+        personnel_util = np.random.randint(70, 95, 30)
+        instrument_util = np.random.randint(60, 90, 30)
     
-    chart_data = {
-        'labels': [d.strftime('%Y-%m-%d') for d in dates],
-        'datasets': [
-            {
-                'label': 'Personnel Utilization',
-                'data': personnel_util.tolist(),
-                'borderColor': '#1f77b4',
-                'backgroundColor': 'rgba(31, 119, 180, 0.1)',
-                'fill': False,
-                'tension': 0.4
-            },
-            {
-                'label': 'Instrument Utilization',
-                'data': instrument_util.tolist(),
-                'borderColor': '#ff7f0e',
-                'backgroundColor': 'rgba(255, 127, 14, 0.1)',
-                'fill': False,
-                'tension': 0.4
-            }
-        ]
-    }
-    return jsonify(chart_data)
+    return jsonify(chart_payload('utilization_trend', [d.strftime('%Y-%m-%d') for d in dates],
+                                 [personnel_util, instrument_util], fmt=chart_format()))
 
 @app.route('/api/demand/forecast')
+@cached_response('demand', 'methods', daily=True, version=lambda: get_forecast_engine().version)
 def api_demand_forecast():
-    """Get demand forecast data for stacked bar chart with proper method/panel structure"""
-    # Generate sample demand forecast data by method/panel type
-    dates = pd.date_range(start=datetime.now(), periods=30, freq='D')
-    
-    # Use fixed seed for consistent data generation
-    np.random.seed(42)
-    
-    # Sample data for different methods/panels
-    metabolite_samples = np.random.randint(8, 25, 30)
-    stability_samples = np.random.randint(12, 30, 30)
-    purity_samples = np.random.randint(6, 18, 30)
-    
-    # Create demand items for table integration
-    clients = ['PharmaCorp', 'BioTech Inc', 'ChemLabs', 'Research Corp', 'Analytics Ltd']
-    projects = ['Q4 Validation', 'Method Development', 'Routine Testing', 'Research Study', 'Quality Control']
-    methods = ['HPLC-001', 'HPLC-002', 'GC-001']
-    
-    demand_items = []
-    for i, date in enumerate(dates):
-        # Create multiple demand items per day for different methods
-        for j, method in enumerate(methods):
-            if j == 0:  # HPLC-001
-                sample_count = metabolite_samples[i]
-            elif j == 1:  # HPLC-002  
-                sample_count = stability_samples[i]
-            else:  # GC-001
-                sample_count = purity_samples[i]
-                
-            if sample_count > 0:
-                # Determine priority based on sample count and method type
-                priority = 'high' if sample_count > 20 else 'medium' if sample_count > 12 else 'low'
-                
-                # Determine status based on date
-                days_from_now = (date.date() - datetime.now().date()).days
-                if days_from_now < 0:
-                    status = 'completed'
-                elif days_from_now < 3:
-                    status = 'in-progress'
-                elif days_from_now < 7:
-                    status = 'scheduled'
-                else:
-                    status = 'pending'
-                
-                demand_items.append({
-                    'id': f'DEM-{i+1:03d}-{j+1}',
-                    'date': date.strftime('%Y-%m-%d'),
-                    'method': method,
-                    'method_name': method.replace('-', ' ').title(),
-                    'sample_count': int(sample_count),
-                    'priority': priority,
-                    'client': clients[(i + j) % len(clients)],
-                    'project': f'{projects[(i + j) % len(projects)]} - {i+1}-{j+1}',
-                    'status': status,
-                    'assay_breakdown': get_assay_breakdown_for_method(method, int(sample_count))
-                })
-    
-    # Add newly created demand items
-    demand_items.extend(added_demand_items)
-    
-    # Aggregate samples by method for chart display (including added items)
-    chart_labels = [d.strftime('%Y-%m-%d') for d in dates]
-    
-    # Initialize chart data arrays
-    metabolite_chart_data = metabolite_samples.tolist()
-    stability_chart_data = stability_samples.tolist()
-    purity_chart_data = purity_samples.tolist()
-    
-    # Add samples from newly added demand items to chart data
-    for item in added_demand_items:
-        item_date = item['date']
-        if item_date in chart_labels:
-            date_index = chart_labels.index(item_date)
-            if item['method'] == 'HPLC-001':
-                metabolite_chart_data[date_index] += item['sample_count']
-            elif item['method'] == 'HPLC-002':
-                stability_chart_data[date_index] += item['sample_count']
-            elif item['method'] == 'GC-001':
-                purity_chart_data[date_index] += item['sample_count']
-        else:
-            # If the date is outside our 30-day forecast, add it as a new data point
-            chart_labels.append(item_date)
-            # Add zero for existing methods
-            metabolite_chart_data.append(0)
-            stability_chart_data.append(0)
-            purity_chart_data.append(0)
-            # Add the sample count for the appropriate method
-            if item['method'] == 'HPLC-001':
-                metabolite_chart_data[-1] = item['sample_count']
-            elif item['method'] == 'HPLC-002':
-                stability_chart_data[-1] = item['sample_count']
-            elif item['method'] == 'GC-001':
-                purity_chart_data[-1] = item['sample_count']
-    
-    chart_data = {
-        'labels': chart_labels,
-        'datasets': [
-            {
-                'label': 'HPLC Method A',
-                'data': metabolite_chart_data,
-                'backgroundColor': '#3b82f6',
-                'borderColor': '#1d4ed8',
-                'borderWidth': 1
-            },
-            {
-                'label': 'HPLC Method B',
-                'data': stability_chart_data,
-                'backgroundColor': '#10b981',
-                'borderColor': '#059669',
-                'borderWidth': 1
-            },
-            {
-                'label': 'GC Method A',
-                'data': purity_chart_data,
-                'backgroundColor': '#f59e0b',
-                'borderColor': '#d97706',
-                'borderWidth': 1
-            }
-        ],
-        'demand_items': demand_items
-    }
+    """Get demand forecast data for stacked bar chart with proper method/panel structure
+
+    With format=columnar the series come as typed columns (see charts.py);
+    demand items are included the same way in both formats.
+    """
+    if chart_format() not in CHART_FORMATS:
+        return invalid_chart_format()
+    today = datetime.now().date()
+    refresh_forecast_models(today)
+    engine = get_forecast_engine()
+    forecast = get_forecast_demand_frame(today, engine, engine.version)
+    added_demand = get_catalog().demand_frame()
+    
+    # One (date, method) aggregation each for the generated forecast and the added requests
+    chart = sample_totals(forecast).add(sample_totals(added_demand), fill_value=0).fillna(0)
+    
+    # Forecast window first, then dates outside it in the order they were requested
+    chart_labels = list(forecast['date'].drop_duplicates())
+    window = set(chart_labels)
+    chart_labels += [item_date for item_date in added_demand['date'].drop_duplicates() if item_date not in window]
+    forecast_methods = list(forecast['method'].drop_duplicates())
+    methods = forecast_methods + [method_id for method_id in added_demand['method'].drop_duplicates()
+                                  if method_id not in forecast_methods]
+    chart = chart.reindex(index=chart_labels, columns=methods, fill_value=0)
+    
+    names = []
+    for method_id in methods:
+        method = get_catalog().get_method(method_id)
+        names.append(method['name'] if method else method_id.replace('-', ' ').title())
+    chart_data = chart_payload('demand_forecast', chart_labels, chart.to_numpy(dtype=int).T,
+                               series=names, fmt=chart_format())
+    
+    # Demand items take the same filters, paging and projection as the queue
+    if request.args.get('include_items', 'true').lower() != 'false':
+        items, page, error = query_demand_items(get_forecast_demand_items(today) + get_catalog().demand_records(), request.args)
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
+        chart_data['demand_items'] = items
+        if page is not None:
+            chart_data['demand_items_page'] = page
     return jsonify(chart_data)
 
+@app.route('/api/demand/forecast/models')
+def api_demand_forecast_models():
+    """Fitted forecast models: version, fit time, per-method parameters and error"""
+    refresh_forecast_models(datetime.now().date())
+    return jsonify(get_forecast_engine().status())
+
+# Methods in the demo demand history with their daily sample-count range
+FORECAST_METHODS = {
+    'HPLC-001': (8, 25),
+    'HPLC-002': (12, 30),
+    'GC-001': (6, 18)
+}
+FORECAST_DAYS = 30
+# Days of daily demand the forecast models are fitted on
+FORECAST_HISTORY_DAYS = 364
+# Demo demand by weekday, Monday first: the lab receives little at weekends
+DEMO_WEEKDAY_FACTORS = np.array([1.0, 1.1, 1.0, 0.95, 0.8, 0.25, 0.15])
+FORECAST_CLIENTS = ['PharmaCorp', 'BioTech Inc', 'ChemLabs', 'Research Corp', 'Analytics Ltd']
+FORECAST_PROJECTS = ['Q4 Validation', 'Method Development', 'Routine Testing', 'Research Study', 'Quality Control']
+
+def sample_totals(demand):
+    """Samples per date x method from a columnar demand frame"""
+    return demand.groupby(['date', 'method'], observed=True)['sample_count'].sum().unstack(fill_value=0)
+
+@lru_cache(maxsize=1)
+def demo_demand_history(end_date):
+    """Generated daily demand for the demo methods over the history window before end_date"""
+    dates = pd.date_range(end=end_date - timedelta(days=1), periods=FORECAST_HISTORY_DAYS, freq='D')
+    # Fixed seed for consistent data generation
+    rng = np.random.RandomState(42)
+    weekday = DEMO_WEEKDAY_FACTORS[dates.weekday]
+    return pd.DataFrame({method_id: np.round(rng.randint(low, high, len(dates)) * weekday).astype(int)
+                         for method_id, (low, high) in FORECAST_METHODS.items()}, index=dates)
+
+def get_forecast_engine():
+    """Forecast models for the requested scenario's demand, else the live models"""
+    scenario = current_scenario()
+    if scenario is None:
+        return forecast_engine
+    with scenario_store.lock:
+        if scenario.forecast_engine is None:
+            # Not saved to disk; a restarted server refits from the scenario's history
+            scenario.forecast_engine = ForecastEngine(workers=Config.FORECAST_WORKERS)
+        return scenario.forecast_engine
+
+def demand_history(today):
+    """Daily samples per method before today from the demand store views read
+
+    The in-memory store only holds requests added since startup, so
+    without a database the demo history stands in for the past year.
+    """
+    history = daily_history(get_catalog().demand_frame(), today, FORECAST_HISTORY_DAYS)
+    if repository is None:
+        history = demo_demand_history(today).add(history, fill_value=0)
+    return history.fillna(0)
+
+def refresh_forecast_models(today):
+    """Start a background refit when the demand history has moved; returns at once"""
+    engine = get_forecast_engine()
+    key = (today, get_catalog().store_versions(('demand',)))
+    if engine.needs_fit(key):
+        engine.fit_async(key, demand_history(today))
+
+@lru_cache(maxsize=4)
+def get_forecast_demand_frame(start_date, engine, model_version):
+    """Forecast demand from the fitted models, one row per (day, method), built column-wise"""
+    dates = pd.date_range(start=start_date, periods=FORECAST_DAYS, freq='D')
+    methods, predicted = engine.predict(start_date, FORECAST_DAYS,
+                                        baseline=lambda: baseline_models(demand_history(start_date)))
+    counts = np.round(predicted).astype(int)
+    
+    day_index, method_index = np.nonzero(counts > 0)
+    sample_count = counts[day_index, method_index]
+    method_ids = np.array(methods, dtype=object)[method_index]
+    days_from_now = (dates[day_index] - pd.Timestamp(start_date)).days.to_numpy()
+    rotation = (day_index + method_index) % len(FORECAST_CLIENTS)
+    day_number = pd.Series(day_index + 1).astype(str)
+    method_number = pd.Series(method_index + 1).astype(str)
+    
+    return pd.DataFrame({
+        'id': 'DEM-' + day_number.str.zfill(3) + '-' + method_number,
+        'date': dates[day_index].strftime('%Y-%m-%d'),
+        'method': method_ids,
+        'method_name': pd.Series(method_ids).str.replace('-', ' ').str.title(),
+        'sample_count': sample_count,
+        'priority': np.select([sample_count > 20, sample_count > 12], ['high', 'medium'], 'low'),
+        'client': np.array(FORECAST_CLIENTS)[rotation],
+        'project': np.array(FORECAST_PROJECTS)[rotation] + ' - ' + day_number + '-' + method_number,
+        'status': np.select([days_from_now < 0, days_from_now < 3, days_from_now < 7],
+                            ['completed', 'in-progress', 'scheduled'], 'pending')
+    })
+
+def get_forecast_demand_items(start_date):
+    """Forecast demand as queue records with assay breakdowns"""
+    engine = get_forecast_engine()
+    items = get_forecast_demand_frame(start_date, engine, engine.version).to_dict('records')
+    for item in items:
+        item['assay_breakdown'] = get_assay_breakdown_for_method(item['method'], item['sample_count'])
+    return items
+
 def get_assay_breakdown_for_method(method_id, sample_count):
     """Get assay breakdown for a specific method and sample count"""
     # Ensure sample_count is a Python int
@@ -466,111 +1152,217 @@ def get_assay_breakdown_for_method(method_id, sample_count):
     }
     
     # Handle newly added methods
-    if method_id not in assay_breakdowns:
+    method = get_catalog().get_method(method_id)
+    if method_id not in assay_breakdowns and method is not None:
         # For new methods, create a simple breakdown based on category
-        for method in added_methods:
-            if method['id'] == method_id:
-                category = method['category']
-                if category == 'HPLC':
-                    batch_size = 24
-                elif category == 'GC':
-                    batch_size = 36
-                elif category == 'LC-MS':
-                    batch_size = 16
-                elif category == 'ICP':
-                    batch_size = 48
-                else:
-                    batch_size = 24  # Default
-                
-                return [{'name': method['name'], 'category': category, 'samples': sample_count, 'batches': max(1, sample_count // batch_size)}]
+        category = method['category']
+        if category == 'HPLC':
+            batch_size = 24
+        elif category == 'GC':
+            batch_size = 36
+        elif category == 'LC-MS':
+            batch_size = 16
+        elif category == 'ICP':
+            batch_size = 48
+        else:
+            batch_size = 24  # Default
+        
+        return [{'name': method['name'], 'category': category, 'samples': sample_count, 'batches': max(1, sample_count // batch_size)}]
     
     return assay_breakdowns.get(method_id, [])
 
+# Demand item fields that can be filtered on with ?field=value[,value...]
+DEMAND_FILTERS = ('status', 'priority', 'method', 'client')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def demand_item_date(item):
+    # Queue seed items carry start_date, added and forecast items carry date
+    return item.get('start_date') or item.get('date') or ''
+
+def encode_cursor(item):
+    return base64.urlsafe_b64encode(json.dumps([demand_item_date(item), item['id']]).encode()).decode()
+
+def decode_cursor(cursor):
+    date_key, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return str(date_key), str(item_id)
+
+def query_demand_items(items, args):
+    """Filter, page and project demand items from request query args
+
+    Filters take comma-separated values; date_from/date_to are inclusive
+    YYYY-MM-DD bounds. Paging starts when limit or cursor is given: items are
+    then ordered by (date, id) and the cursor is the key of the last row
+    served, so pages stay stable while requests are added or removed.
+    Returns (items, page, error); page is None when no paging was requested.
+    """
+    for name in DEMAND_FILTERS:
+        if args.get(name):
+            wanted = {value.strip().lower() for value in args[name].split(',')}
+            items = [item for item in items if str(item.get(name, '')).lower() in wanted]
+    for name in ('date_from', 'date_to'):
+        if args.get(name):
+            try:
+                datetime.strptime(args[name], '%Y-%m-%d')
+            except ValueError:
+                return None, None, f'{name} must be YYYY-MM-DD'
+    if args.get('date_from'):
+        items = [item for item in items if demand_item_date(item) >= args['date_from']]
+    if args.get('date_to'):
+        items = [item for item in items if demand_item_date(item) <= args['date_to']]
+    
+    page = None
+    if args.get('limit') or args.get('cursor'):
+        try:
+            limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return None, None, 'limit must be an integer'
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return None, None, f'limit must be between 1 and {MAX_PAGE_SIZE}'
+        
+        ordered = sorted(items, key=lambda item: (demand_item_date(item), item['id']))
+        page = {'total': len(ordered)}
+        if args.get('cursor'):
+            try:
+                after = decode_cursor(args['cursor'])
+            except (ValueError, TypeError):
+                return None, None, 'Invalid cursor'
+            ordered = [item for item in ordered if (demand_item_date(item), item['id']) > after]
+        else:
+            # Totals over every matching row come with the first page only
+            page['summary'] = summarize_demand_items(ordered)
+        items = ordered[:limit]
+        page['next_cursor'] = encode_cursor(items[-1]) if len(ordered) > limit else None
+    
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        items = [{field: item[field] for field in fields if field in item} for item in items]
+    return items, page, None
+
+def summarize_demand_items(items):
+    """Sample, batch and hour totals for the batch planning overview"""
+    total_samples = 0
+    total_batches = 0
+    total_hours = 0
+    for item in items:
+        total_samples += item['sample_count']
+        breakdown = item.get('assay_breakdown') or []
+        total_batches += sum(assay['batches'] for assay in breakdown)
+        if breakdown:
+            total_hours += sum(assay['batches'] * (6 if assay['category'] == 'LC-MS' else 8 if assay['category'] == 'SEC' else 4)
+                               for assay in breakdown)
+        else:
+            total_hours += item['sample_count'] * 2
+    return {
+        'total_samples': total_samples,
+        'total_batches': total_batches,
+        'avg_batch_size': round(total_samples / total_batches) if total_batches else 0,
+        'total_hours': total_hours
+    }
+
+BASE_DEMAND_QUEUE = [
+    {
+        'id': 'DEM-001',
+        'project_name': 'HPLC Analysis Project',
+        'method': 'HPLC-001',
+        'method_name': 'HPLC Method A',
+        'sample_count': 48,
+        'start_date': '2024-01-25',
+        'priority': 'high',
+        'status': 'pending',
+        'client': 'PharmaCorp',
+        'requester': 'Dr. Sarah Chen',
+        'assay_breakdown': [
+            {'name': 'HPLC Method A', 'category': 'HPLC', 'samples': 48, 'batches': 2, 'instruments': ['HPLC-UV', 'HPLC-RID']}
+        ]
+    },
+    {
+        'id': 'DEM-002',
+        'project_name': 'Advanced HPLC Analysis',
+        'method': 'HPLC-002',
+        'method_name': 'HPLC Method B',
+        'sample_count': 36,
+        'start_date': '2024-01-28',
+        'priority': 'medium',
+        'status': 'approved',
+        'client': 'BioTech Inc',
+        'requester': 'Dr. James Thompson',
+        'assay_breakdown': [
+            {'name': 'HPLC Method B', 'category': 'HPLC', 'samples': 36, 'batches': 2, 'instruments': ['HPLC-UV', 'HPLC-CAD']}
+        ]
+    },
+    {
+        'id': 'DEM-003',
+        'project_name': 'GC Volatiles Analysis',
+        'method': 'GC-001',
+        'method_name': 'GC Method A',
+        'sample_count': 24,
+        'start_date': '2024-02-05',
+        'priority': 'medium',
+        'status': 'pending',
+        'client': 'ChemLabs',
+        'requester': 'Dr. Lisa Anderson',
+        'assay_breakdown': [
+            {'name': 'GC Method A', 'category': 'GC', 'samples': 24, 'batches': 1, 'instruments': ['GC-FID', 'GC-MS']}
+        ]
+    },
+    {
+        'id': 'DEM-004',
+        'project_name': 'Mass Spectrometry Analysis',
+        'method': 'MS-001',
+        'method_name': 'Mass Spec Method A',
+        'sample_count': 96,
+        'start_date': '2024-02-10',
+        'priority': 'high',
+        'status': 'scheduled',
+        'client': 'Research Corp',
+        'requester': 'Dr. Michael Rodriguez',
+        'assay_breakdown': [
+            {'name': 'Mass Spec Method A', 'category': 'LC-MS', 'samples': 96, 'batches': 6, 'instruments': ['LC-MS/MS', 'LC-MS']}
+        ]
+    },
+    {
+        'id': 'DEM-005',
+        'project_name': 'ICP Analysis Project',
+        'method': 'ICP-001',
+        'method_name': 'ICP-MS Method A',
+        'sample_count': 72,
+        'start_date': '2024-01-30',
+        'priority': 'medium',
+        'status': 'in-progress',
+        'client': 'Analytics Ltd',
+        'requester': 'Dr. James Thompson',
+        'assay_breakdown': [
+            {'name': 'ICP-MS Method A', 'category': 'ICP', 'samples': 72, 'batches': 2, 'instruments': ['ICP-MS', 'ICP-OES']}
+        ]
+    }
+]
+
+# The seed queue as domain records, loaded once
+BASE_DEMAND_ITEMS = load_all(DemandItem, BASE_DEMAND_QUEUE)
+
+def get_demand_queue():
+    """Get demand queue items including newly added requests"""
+    return shared('demand_queue', lambda: BASE_DEMAND_QUEUE + get_catalog().demand_records())
+
+def get_demand_items():
+    """Demand queue as DemandItem records for the capacity planners"""
+    return shared('demand_items', lambda: BASE_DEMAND_ITEMS + list(get_catalog().records('demand')))
+
 @app.route('/api/demand/queue')
+@cached_response('demand')
 def api_demand_queue():
-    """Get demand queue data with sample-based hierarchy"""
-    demand_queue = [
-        {
-            'id': 'DEM-001',
-            'project_name': 'HPLC Analysis Project',
-            'method': 'HPLC-001',
-            'method_name': 'HPLC Method A',
-            'sample_count': 48,
-            'start_date': '2024-01-25',
-            'priority': 'high',
-            'status': 'pending',
-            'client': 'PharmaCorp',
-            'requester': 'Dr. Sarah Chen',
-            'assay_breakdown': [
-                {'name': 'HPLC Method A', 'category': 'HPLC', 'samples': 48, 'batches': 2, 'instruments': ['HPLC-UV', 'HPLC-RID']}
-            ]
-        },
-        {
-            'id': 'DEM-002',
-            'project_name': 'Advanced HPLC Analysis',
-            'method': 'HPLC-002',
-            'method_name': 'HPLC Method B',
-            'sample_count': 36,
-            'start_date': '2024-01-28',
-            'priority': 'medium',
-            'status': 'approved',
-            'client': 'BioTech Inc',
-            'requester': 'Dr. James Thompson',
-            'assay_breakdown': [
-                {'name': 'HPLC Method B', 'category': 'HPLC', 'samples': 36, 'batches': 2, 'instruments': ['HPLC-UV', 'HPLC-CAD']}
-            ]
-        },
-        {
-            'id': 'DEM-003',
-            'project_name': 'GC Volatiles Analysis',
-            'method': 'GC-001',
-            'method_name': 'GC Method A',
-            'sample_count': 24,
-            'start_date': '2024-02-05',
-            'priority': 'medium',
-            'status': 'pending',
-            'client': 'ChemLabs',
-            'requester': 'Dr. Lisa Anderson',
-            'assay_breakdown': [
-                {'name': 'GC Method A', 'category': 'GC', 'samples': 24, 'batches': 1, 'instruments': ['GC-FID', 'GC-MS']}
-            ]
-        },
-        {
-            'id': 'DEM-004',
-            'project_name': 'Mass Spectrometry Analysis',
-            'method': 'MS-001',
-            'method_name': 'Mass Spec Method A',
-            'sample_count': 96,
-            'start_date': '2024-02-10',
-            'priority': 'high',
-            'status': 'scheduled',
-            'client': 'Research Corp',
-            'requester': 'Dr. Michael Rodriguez',
-            'assay_breakdown': [
-                {'name': 'Mass Spec Method A', 'category': 'LC-MS', 'samples': 96, 'batches': 6, 'instruments': ['LC-MS/MS', 'LC-MS']}
-            ]
-        },
-        {
-            'id': 'DEM-005',
-            'project_name': 'ICP Analysis Project',
-            'method': 'ICP-001',
-            'method_name': 'ICP-MS Method A',
-            'sample_count': 72,
-            'start_date': '2024-01-30',
-            'priority': 'medium',
-            'status': 'in-progress',
-            'client': 'Analytics Ltd',
-            'requester': 'Dr. James Thompson',
-            'assay_breakdown': [
-                {'name': 'ICP-MS Method A', 'category': 'ICP', 'samples': 72, 'batches': 2, 'instruments': ['ICP-MS', 'ICP-OES']}
-            ]
-        }
-    ]
-    
-    # Add newly created demand items to the queue
-    demand_queue.extend(added_demand_items)
-    
-    return jsonify(demand_queue)
+    """Get demand queue data with sample-based hierarchy
+
+    Supports the filters, cursor paging and fields= projection of
+    query_demand_items; paged responses are wrapped with the page metadata.
+    """
+    items, page, error = query_demand_items(get_demand_queue(), request.args)
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
+    if page is None:
+        return jsonify(items)
+    return jsonify(dict(page, items=items))
 
 @app.route('/api/demand/by-instrument')
 def api_demand_by_instrument():
@@ -592,36 +1384,85 @@ def api_demand_by_instrument():
     }
     return jsonify(chart_data)
 
+def earliest_open_demand_date(items):
+    """Date of the earliest demand item still needing instrument time, else today"""
+    dates = [parse_date(item.date) for item in items if item.status.lower() not in CLOSED_DEMAND_STATUSES]
+    return min([day for day in dates if day], default=date.today())
+
+# Capacity-gap horizon: default and longest allowed, in days
+CAPACITY_GAP_HORIZON_DAYS = 28
+MAX_CAPACITY_GAP_HORIZON_DAYS = 366
+
 @app.route('/api/demand/capacity-gap')
+@cached_response('demand', 'methods', 'instruments', daily=True)
 def api_demand_capacity_gap():
-    """Get demand vs capacity gap analysis"""
-    instruments = ['HPLC', 'LC-MS', 'GC', 'NMR', 'DSC']
-    demand_hours = [120, 95, 60, 45, 30]
-    capacity_hours = [100, 80, 70, 50, 40]
+    """Get demand vs capacity gap analysis
+
+    Demand is open demand priced as run time per sample plus batch setup
+    and cleanup; capacity is the effective throughput of in-service
+    instruments over the lab's working days. Optional args: start
+    (defaults to the earliest open demand, else today), horizon_days,
+    interval (day, week or total) and group_by (category or method). The
+    per-period matrices come back alongside the chart datasets.
+    """
+    items = get_demand_items()
+    if request.args.get('start'):
+        start = parse_date(request.args['start'])
+        if start is None:
+            return jsonify({'success': False, 'message': 'start must be a YYYY-MM-DD date'}), 400
+    else:
+        start = earliest_open_demand_date(items)
+    try:
+        horizon_days = int(request.args.get('horizon_days', CAPACITY_GAP_HORIZON_DAYS))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'horizon_days must be an integer'}), 400
+    if not 1 <= horizon_days <= MAX_CAPACITY_GAP_HORIZON_DAYS:
+        return jsonify({'success': False, 'message': f'horizon_days must be between 1 and {MAX_CAPACITY_GAP_HORIZON_DAYS}'}), 400
+    interval = request.args.get('interval', 'total')
+    if interval not in INTERVALS:
+        return jsonify({'success': False, 'message': f"interval must be one of {', '.join(INTERVALS)}"}), 400
+    group_by = request.args.get('group_by', 'category')
+    if group_by not in GROUP_BY:
+        return jsonify({'success': False, 'message': f"group_by must be one of {', '.join(GROUP_BY)}"}), 400
+
+    calendar = WorkCalendar.from_holiday_calendar(get_holiday_calendar(), start, days=horizon_days)
+    catalog = get_catalog()
+    groups, periods, demand_hours, capacity_hours = capacity_gap(
+        items, catalog.records('methods'), catalog.records('instruments'), calendar, horizon_days, interval, group_by)
     
     chart_data = {
-        'labels': instruments,
+        'labels': groups,
         'datasets': [
             {
-                'label': 'Demand (Hours/Week)',
-                'data': demand_hours,
+                'label': f'Demand (Hours/{horizon_days} days)',
+                'data': demand_hours.sum(axis=1).round(1).tolist(),
                 'backgroundColor': 'rgba(239, 68, 68, 0.8)',
                 'borderColor': '#ef4444',
                 'borderWidth': 2
             },
             {
-                'label': 'Capacity (Hours/Week)',
-                'data': capacity_hours,
+                'label': f'Capacity (Hours/{horizon_days} days)',
+                'data': capacity_hours.sum(axis=1).round(1).tolist(),
                 'backgroundColor': 'rgba(16, 185, 129, 0.8)',
                 'borderColor': '#10b981',
                 'borderWidth': 2
             }
-        ]
+        ],
+        'horizon': {
+            'start': start.isoformat(),
+            'end': (start + timedelta(days=horizon_days)).isoformat(),
+            'working_days': calendar.working_days_between(start, start + timedelta(days=horizon_days)),
+            'interval': interval,
+            'group_by': group_by
+        },
+        'periods': [period.isoformat() for period in periods],
+        'demand_hours': demand_hours.round(1).tolist(),
+        'capacity_hours': capacity_hours.round(1).tolist(),
+        'gap_hours': (demand_hours - capacity_hours).round(1).tolist()
     }
     return jsonify(chart_data)
 
-@app.route('/api/personnel/skills')
-def api_personnel_skills():
+def get_personnel_skill_records():
     """Get personnel skills matrix - who is trained on what methods"""
     personnel_skills = [
         {
@@ -710,7 +1551,16 @@ def api_personnel_skills():
             'overtime_approved': False
         }
     ]
-    return jsonify(personnel_skills)
+    return personnel_skills
+
+@app.route('/api/personnel/skills')
+def api_personnel_skills():
+    """Get personnel skills matrix - who is trained on what methods"""
+    return jsonify(get_personnel_skill_records())
+
+def get_operator_shift_patterns():
+    """Shift pattern per operator name, as the scheduler keys operators"""
+    return {person['name']: person.get('shift_pattern') for person in get_personnel_skill_records()}
 
 @app.route('/api/methods/instrument-compatibility')
 def api_method_instrument_compatibility():
@@ -833,9 +1683,8 @@ def api_method_instrument_compatibility():
     ]
     return jsonify(compatibility_matrix)
 
-@app.route('/api/calendar/holidays')
-def api_holiday_calendar():
-    """Get holiday and weekend calendar for scheduling calculations"""
+def get_holiday_calendar():
+    """Get lab holidays, shutdowns and working policies"""
     holidays = [
         {
             'date': '2024-01-01',
@@ -904,127 +1753,81 @@ def api_holiday_calendar():
         }
     ]
     
-    return jsonify({
+    return {
         'holidays': holidays,
         'lab_shutdowns': lab_shutdowns,
         'weekend_policy': 'no_work', # or 'overtime_only'
         'holiday_policy': 'no_work'
+    }
+
+@app.route('/api/calendar/holidays')
+def api_holiday_calendar():
+    """Get holiday and weekend calendar for scheduling calculations"""
+    return jsonify(get_holiday_calendar())
+
+# The working calendar starts this long before today so recent past dates still resolve
+CALENDAR_LOOKBACK_DAYS = 365
+
+@lru_cache(maxsize=1)
+def get_work_calendar(today):
+    """Lab working calendar from a year before today, rebuilt once a day"""
+    return WorkCalendar.from_holiday_calendar(get_holiday_calendar(), today - timedelta(days=CALENDAR_LOOKBACK_DAYS))
+
+@app.route('/api/calendar/add-working-days')
+def api_add_working_days():
+    """Date that is working_days lab working days from date (negative to count back)"""
+    day = parse_date(request.args.get('date'))
+    try:
+        working_days = int(request.args.get('working_days', ''))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'working_days must be an integer'}), 400
+    if day is None:
+        return jsonify({'success': False, 'message': 'date must be YYYY-MM-DD'}), 400
+    
+    try:
+        result = get_work_calendar(date.today()).add_working_days(day, working_days)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if result is None:
+        return jsonify({'success': False, 'message': 'Result is outside the working calendar'}), 400
+    return jsonify({'date': day.isoformat(), 'working_days': working_days, 'result': result.isoformat()})
+
+@app.route('/api/calendar/working-time')
+def api_working_time():
+    """Working days and shift hours between two instants for a shift pattern"""
+    shift_pattern = request.args.get('shift_pattern', DEFAULT_SHIFT_PATTERN)
+    if shift_pattern not in SHIFT_PATTERNS:
+        return jsonify({'success': False, 'message': f'shift_pattern must be one of: {list(SHIFT_PATTERNS)}'}), 400
+    # Offsets are converted to naive local time, which the calendar runs on
+    start = parse_time(request.args.get('start'))
+    end = parse_time(request.args.get('end'))
+    if start is None or end is None:
+        return jsonify({'success': False, 'message': 'start and end must be ISO datetimes'}), 400
+    
+    calendar = get_work_calendar(date.today())
+    if shift_pattern != calendar.shift_pattern:
+        calendar = calendar.for_operator(shift_pattern=shift_pattern)
+    try:
+        working_days = calendar.working_days_between(start.date(), end.date())
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'shift_pattern': shift_pattern,
+        'working_days': working_days,
+        'working_hours': round(calendar.working_hours_between(start, end), 2)
     })
 
+def get_method_records():
+    """Get method records with batch and run-time requirements"""
+    return shared('method_records', get_catalog().method_profile_records)
+
 @app.route('/api/methods')
+@cached_response('methods', 'matrix', 'skills')
 def api_methods():
     """Get available methods/panels with their assays and requirements"""
-    methods = [
-        {
-            'id': 'HPLC-001',
-            'name': 'HPLC Method A',
-            'type': 'method',
-            'category': 'HPLC',
-            'lead_time_days': 5,
-            'description': 'Comprehensive metabolite profiling for biomarker discovery and metabolic pathway analysis',
-            'instrument_category': 'HPLC',
-            'instrument_types': ['HPLC-UV', 'HPLC-RID'],
-            'batch_size': 24,
-            'time_per_batch': 4,
-            'run_time_per_sample': 10,
-            'qualified_personnel': ['Dr. Sarah Chen', 'Alice Johnson'],
-            'is_active': True
-        },
-        {
-            'id': 'HPLC-002',
-            'name': 'HPLC Method B', 
-            'type': 'method',
-            'category': 'HPLC',
-            'lead_time_days': 5,
-            'description': 'Advanced HPLC method for complex matrices',
-            'instrument_category': 'HPLC',
-            'instrument_types': ['HPLC-UV', 'HPLC-CAD'],
-            'batch_size': 24,
-            'time_per_batch': 5,
-            'run_time_per_sample': 12,
-            'qualified_personnel': ['Dr. James Thompson', 'David Wilson'],
-            'is_active': True
-        },
-        {
-            'id': 'GC-001',
-            'name': 'GC Method A',
-            'type': 'method',
-            'category': 'GC',
-            'lead_time_days': 2,
-            'description': 'Gas chromatography for volatile compounds',
-            'instrument_category': 'GC',
-            'instrument_types': ['GC-FID', 'GC-MS'],
-            'batch_size': 36,
-            'time_per_batch': 3,
-            'run_time_per_sample': 5,
-            'qualified_personnel': ['Dr. Michael Rodriguez', 'Bob Smith'],
-            'is_active': True
-        },
-        {
-            'id': 'MS-001',
-            'name': 'Mass Spec Method A',
-            'type': 'method',
-            'category': 'MS',
-            'lead_time_days': 7,
-            'description': 'LC-MS/MS analysis for trace compounds',
-            'instrument_category': 'LC-MS',
-            'instrument_types': ['LC-MS/MS', 'LC-MS'],
-            'batch_size': 16,
-            'time_per_batch': 6,
-            'run_time_per_sample': 22,
-            'qualified_personnel': ['Dr. Sarah Chen', 'Emma Brown'],
-            'is_active': True
-        },
-        {
-            'id': 'ICP-001',
-            'name': 'ICP-MS Method A',
-            'type': 'method',
-            'category': 'ICP',
-            'lead_time_days': 4,
-            'description': 'Inductively coupled plasma mass spectrometry',
-            'instrument_category': 'ICP',
-            'instrument_types': ['ICP-MS', 'ICP-OES'],
-            'batch_size': 48,
-            'time_per_batch': 4,
-            'run_time_per_sample': 5,
-            'qualified_personnel': ['Dr. Lisa Anderson', 'Carol Davis'],
-            'is_active': True
-        }
-    ]
-    
-    methods = [m for m in methods if m['id'] not in removed_methods]
-
-    for method in added_methods:
-        if method['id'] in removed_methods:
-            continue
-        methods.append({
-            'id': method['id'],
-            'name': method['name'],
-            'type': 'method',
-            'category': method['category'],
-            'lead_time_days': method['lead_time_days'],
-            'description': method['description'],
-            'instrument_category': method['category'],
-            'instrument_types': [entry['instrument_id'] for entry in added_method_instrument_matrix
-                                 if entry['method_id'] == method['id'] and entry['is_compatible']],
-            'batch_size': 24,
-            'time_per_batch': 4,
-            'run_time_per_sample': 10,
-            'qualified_personnel': [skill['operator_name'] for skill in added_operator_skills if skill['method_id'] == method['id']],
-            'is_active': method['is_active']
-        })
-    
-    # Apply base method edits if they exist
-    for method in methods:
-        if method['id'] in base_method_edits:
-            edit = base_method_edits[method['id']]
-            method['name'] = edit['name']
-            method['category'] = edit['category']
-            method['description'] = edit['description']
-            method['lead_time_days'] = edit['lead_time_days']
-            method['is_active'] = edit['is_active']
-    
-    return jsonify(methods)
+    return jsonify(get_method_records())
 
 @app.route('/api/instrument-categories')
 def api_instrument_categories():
@@ -1350,285 +2153,178 @@ def api_instrument_categories_real():
 @app.route('/api/eln/instruments/status')
 def api_eln_instrument_status():
     """Get real-time instrument status from ELN system"""
-    # Simulated ELN data - in reality this would call external ELN API
-    instrument_status = [
-        {
-            'instrument_id': 'HPLC-01',
-            'instrument_name': 'HPLC System 1',
-            'type': 'HPLC',
-            'location': 'Lab A',
-            'status': 'running',
-            'current_sample_batch': 'SAM-001-B2',
-            'current_method': 'HPLC Potency Assay',
-            'operator': 'Alice Johnson',
-            'started_at': '2024-01-25T09:00:00',
-            'estimated_completion': '2024-01-25T15:00:00',
-            'samples_remaining': 8,
-            'total_samples_in_batch': 12,
-            'queue_position': 2,
-            'next_available': '2024-01-25T15:30:00'
-        },
-        {
-            'instrument_id': 'HPLC-04',
-            'instrument_name': 'HPLC System 4',
-            'type': 'HPLC',
-            'location': 'Lab A',
-            'status': 'available',
-            'current_sample_batch': None,
-            'current_method': None,
-            'operator': None,
-            'next_available': '2024-01-25T08:00:00'
-        },
-        {
-            'instrument_id': 'LCMS-02',
-            'instrument_name': 'LC-MS System 2',
-            'type': 'LC-MS',
-            'location': 'Lab A',
-            'status': 'running',
-            'current_sample_batch': 'SAM-002-B1',
-            'current_method': 'LC-MS Impurity Screen',
-            'operator': 'Carol Davis',
-            'started_at': '2024-01-25T10:00:00',
-            'estimated_completion': '2024-01-25T18:00:00',
-            'samples_remaining': 12,
-            'total_samples_in_batch': 18,
-            'queue_position': 1,
-            'next_available': '2024-01-25T18:30:00'
-        },
-        {
-            'instrument_id': 'LCMS-05',
-            'instrument_name': 'LC-MS System 5',
-            'type': 'LC-MS',
-            'location': 'Lab B',
-            'status': 'maintenance',
-            'current_sample_batch': None,
-            'current_method': None,
-            'operator': None,
-            'maintenance_until': '2024-01-26T12:00:00',
-            'next_available': '2024-01-26T12:00:00'
-        },
-        {
-            'instrument_id': 'GC-03',
-            'instrument_name': 'GC System 3',
-            'type': 'GC',
-            'location': 'Lab B',
-            'status': 'queued',
-            'current_sample_batch': None,
-            'current_method': None,
-            'operator': None,
-            'queue_position': 3,
-            'queued_batches': [
-                {'batch_id': 'SAM-005-B1', 'method': 'GC Residual Solvents', 'estimated_duration': 7},
-                {'batch_id': 'SAM-006-B1', 'method': 'GC Residual Solvents', 'estimated_duration': 7}
-            ],
-            'next_available': '2024-01-26T08:00:00'
-        },
-        {
-            'instrument_id': 'NMR-01',
-            'instrument_name': 'NMR System 1',
-            'type': 'NMR',
-            'location': 'Lab C',
-            'status': 'available',
-            'current_sample_batch': None,
-            'current_method': None,
-            'operator': None,
-            'next_available': '2024-01-25T08:00:00'
-        },
-        {
-            'instrument_id': 'DSC-01',
-            'instrument_name': 'DSC System 1',
-            'type': 'DSC',
-            'location': 'Lab C',
-            'status': 'running',
-            'current_sample_batch': 'SAM-004-B1',
-            'current_method': 'DSC Thermal Analysis',
-            'operator': 'Frank Miller',
-            'started_at': '2024-01-25T14:00:00',
-            'estimated_completion': '2024-01-25T22:00:00',
-            'samples_remaining': 3,
-            'total_samples_in_batch': 6,
-            'next_available': '2024-01-25T22:30:00'
-        }
-    ]
-    return jsonify(instrument_status)
+    # Served from the status store; the ingestion worker does the ELN calls off the request path
+    return jsonify(status_store.snapshot('instruments'))
 
 @app.route('/api/eln/personnel/availability')
 def api_eln_personnel_availability():
     """Get real-time personnel availability from ELN/scheduling system"""
-    personnel_availability = [
-        {
-            'person_id': 'alice_johnson',
-            'name': 'Alice Johnson',
-            'role': 'Senior Scientist',
-            'status': 'busy',
-            'current_activity': 'Running HPLC-01',
-            'available_from': '2024-01-25T15:30:00',
-            'qualified_methods': ['hplc-potency', 'hplc-impurity'],
-            'shift_end': '2024-01-25T17:00:00'
-        },
-        {
-            'person_id': 'bob_smith',
-            'name': 'Bob Smith',
-            'role': 'Associate Scientist',
-            'status': 'available',
-            'current_activity': None,
-            'available_from': '2024-01-25T08:00:00',
-            'qualified_methods': ['hplc-potency', 'gc-residual'],
-            'shift_end': '2024-01-25T17:00:00'
-        },
-        {
-            'person_id': 'carol_davis',
-            'name': 'Carol Davis',
-            'role': 'Technician',
-            'status': 'busy',
-            'current_activity': 'Running LCMS-02',
-            'available_from': '2024-01-25T18:30:00',
-            'qualified_methods': ['lcms-impurity'],
-            'shift_end': '2024-01-25T17:00:00',
-            'overtime_approved': True
-        },
-        {
-            'person_id': 'david_wilson',
-            'name': 'David Wilson',
-            'role': 'Senior Scientist',
-            'status': 'available',
-            'current_activity': None,
-            'available_from': '2024-01-25T08:00:00',
-            'qualified_methods': ['lcms-impurity'],
-            'shift_end': '2024-01-25T17:00:00'
-        },
-        {
-            'person_id': 'emma_brown',
-            'name': 'Emma Brown',
-            'role': 'Associate Scientist',
-            'status': 'on_leave',
-            'current_activity': 'Vacation',
-            'available_from': '2024-01-28T08:00:00',
-            'qualified_methods': ['hplc-potency', 'hplc-impurity'],
-            'shift_end': '2024-01-25T17:00:00'
-        },
-        {
-            'person_id': 'frank_miller',
-            'name': 'Frank Miller',
-            'role': 'Technician',
-            'status': 'busy',
-            'current_activity': 'Running DSC-01',
-            'available_from': '2024-01-25T22:30:00',
-            'qualified_methods': ['nmr-structure', 'gc-residual'],
-            'shift_end': '2024-01-25T17:00:00',
-            'overtime_approved': True
-        }
-    ]
-    return jsonify(personnel_availability)
+    return jsonify(status_store.snapshot('personnel'))
+
+@app.route('/api/eln/health')
+def api_eln_health():
+    """Freshness and last error of each ELN feed"""
+    return jsonify({'source': Config.ELN_BASE_URL or 'demo', 'feeds': status_store.health()})
 
 @app.route('/api/capacity/realtime')
 def api_realtime_capacity():
     """Calculate real-time capacity availability based on ELN data"""
-    # This would integrate instrument and personnel availability
-    capacity_data = {
-        'HPLC': {
-            'total_instruments': 2,
-            'available_now': 1,
-            'available_today': 2,
-            'earliest_slot': '2024-01-25T15:30:00',
-            'queue_depth': 2,
-            'avg_wait_time_hours': 6.5
-        },
-        'LC-MS': {
-            'total_instruments': 2,
-            'available_now': 0,
-            'available_today': 1,
-            'earliest_slot': '2024-01-25T18:30:00',
-            'queue_depth': 1,
-            'avg_wait_time_hours': 8.5
-        },
-        'GC': {
-            'total_instruments': 1,
-            'available_now': 0,
-            'available_today': 0,
-            'earliest_slot': '2024-01-26T08:00:00',
-            'queue_depth': 3,
-            'avg_wait_time_hours': 18
-        },
-        'NMR': {
-            'total_instruments': 1,
-            'available_now': 1,
-            'available_today': 1,
-            'earliest_slot': '2024-01-25T08:00:00',
-            'queue_depth': 0,
-            'avg_wait_time_hours': 0
-        },
-        'DSC': {
-            'total_instruments': 1,
-            'available_now': 0,
-            'available_today': 1,
-            'earliest_slot': '2024-01-25T22:30:00',
-            'queue_depth': 0,
-            'avg_wait_time_hours': 8.5
-        }
+    global realtime_blocked_key
+    as_of = request.args.get('as_of') or (None if Config.ELN_BASE_URL else DEMO_AS_OF)
+    now = parse_time(as_of) if as_of else datetime.now()
+    if now is None:
+        return jsonify({'success': False, 'message': 'as_of must be an ISO timestamp'}), 400
+
+    # Instruments taken out of service in the admin console override the ELN
+    live = live_catalog()
+    key = live.store_versions(('instruments',))
+    if key != realtime_blocked_key:
+        realtime_capacity.set_blocked(instrument_id for instrument_id, instrument in live.instruments.items()
+                                      if instrument['status'] in BLOCKED_STATUSES)
+        realtime_blocked_key = key
+    return jsonify(realtime_capacity.snapshot(now))
+
+def build_batch_scheduler(start=None):
+    """Build a batch scheduler from the current methods, matrix, instruments, skills and calendars"""
+    catalog = get_catalog()
+    return BatchScheduler(
+        methods=catalog.records('methods'),
+        matrix=catalog.records('matrix'),
+        instruments=catalog.records('instruments'),
+        operator_skills=catalog.records('skills'),
+        calendar=get_holiday_calendar(),
+        operator_holidays=get_operator_holiday_records(),
+        start=start,
+        operator_shifts=get_operator_shift_patterns()
+    )
+
+def schedule_key(source):
+    """Versions of the catalog stores a schedule is solved from"""
+    return source.store_versions(STORES)
+
+def invalidate_schedule():
+    """Drop the cached schedule so the next optimize call re-solves from scratch"""
+    global last_schedule
+    with schedule_lock:
+        last_schedule = None
+
+def repair_schedule(draft, repair):
+    """Apply repair(scheduler) to the cached schedule for a write staged on draft
+
+    Only a schedule that matches the catalog the draft was forked from is
+    repaired; any other is dropped. The repaired schedule is not served
+    until catalog_transaction publishes the draft.
+    """
+    global last_schedule
+    with schedule_lock:
+        entry = last_schedule
+        if entry is None or entry[2] is not None or entry[0] != schedule_key(draft.parent):
+            last_schedule = None
+            return
+        repair(entry[1])
+        last_schedule = (entry[0], entry[1], draft)
+
+def publish_schedule_repair(draft):
+    """Move a schedule repaired for draft onto the catalog draft was just published as"""
+    global last_schedule
+    with schedule_lock:
+        entry = last_schedule
+        if entry is not None and entry[2] is draft:
+            last_schedule = (schedule_key(catalog), entry[1], None)
+
+def demand_to_sample_request(item):
+    """Convert a demand queue item into a scheduler sample request"""
+    return {
+        'id': item.get('id'),
+        'method': item.get('method'),
+        'sample_count': item.get('sample_count', 0),
+        'priority': item.get('priority', 'medium'),
+        'start_date': item.get('start_date') or item.get('date'),
+        # Due start_date + lead time unless the item names its own due date
+        'required_by_date': item.get('required_by')
     }
-    return jsonify(capacity_data)
+
+def open_sample_requests():
+    """Scheduler requests for every demand item still waiting on the lab"""
+    return [demand_to_sample_request(item) for item in get_demand_queue()
+            if item.get('status') not in ('completed', 'cancelled')]
+
+def cached_schedule():
+    """The cached schedule, if it matches the catalog this request reads"""
+    scenario = current_scenario()
+    if scenario is not None:
+        return scenario.schedule
+    entry = last_schedule
+    if entry is None or entry[2] is not None or entry[0] != schedule_key(live_catalog()):
+        return None
+    return entry[1]
+
+def cache_schedule(scheduler, source):
+    """Keep a schedule solved over the open demand queue of source for repairs and incremental calls
+
+    A live schedule solved from a catalog that has since been replaced is
+    not kept, so a slow solve cannot bring back a schedule a write dropped.
+    """
+    global last_schedule
+    scenario = current_scenario()
+    if scenario is None:
+        with schedule_lock:
+            if schedule_key(source) == schedule_key(catalog):
+                last_schedule = (schedule_key(source), scheduler, None)
+    else:
+        # Scenario schedules are not repaired in place; they are dropped when the scenario changes
+        scenario.schedule = scheduler
+
+def solved_schedule():
+    """The cached schedule over the open demand queue, solving it first if needed"""
+    scheduler = cached_schedule()
+    if scheduler is None:
+        scheduler = build_batch_scheduler()
+        scheduler.schedule(open_sample_requests())
+        cache_schedule(scheduler, get_catalog())
+    return scheduler
 
 @app.route('/api/scheduling/optimize', methods=['POST'])
 def api_optimize_schedule():
     """Generate optimal schedule based on samples, methods, personnel, and constraints"""
-    req_data = request.get_json()
-    
-    # Sample optimization algorithm (simplified)
-    # In reality, this would be a complex constraint satisfaction problem
-    sample_requests = req_data.get('sample_requests', [])
-    
-    optimized_schedule = []
-    current_time = datetime.now()
-    
-    # Sample optimization logic
-    for i, sample_request in enumerate(sample_requests):
-        method_id = sample_request.get('method')
-        sample_count = sample_request.get('sample_count', 0)
-        priority = sample_request.get('priority', 'medium')
-        required_by = sample_request.get('required_by_date')
-        
-        # Find best operator (highest proficiency, lowest workload)
-        best_operator = 'Alice Johnson'  # Simplified selection
-        best_instrument = 'HPLC-01'     # Simplified selection
-        
-        # Calculate batches
-        batch_size = 12  # From method-instrument compatibility
-        batches_needed = np.ceil(sample_count / batch_size)
-        
-        # Schedule each batch
-        for batch_num in range(int(batches_needed)):
-            start_time = current_time + timedelta(hours=i * 8)  # Simplified scheduling
-            end_time = start_time + timedelta(hours=6)  # Batch duration
-            
-            optimized_schedule.append({
-                'request_id': sample_request.get('id', f'REQ-{i+1}'),
-                'batch_id': f"{sample_request.get('id', f'REQ-{i+1}')}-B{batch_num+1}",
-                'operator': best_operator,
-                'instrument': best_instrument,
-                'method': method_id,
-                'samples_in_batch': min(batch_size, sample_count - (batch_num * batch_size)),
-                'start_time': start_time.isoformat(),
-                'end_time': end_time.isoformat(),
-                'priority': priority,
-                'status': 'scheduled'
-            })
-    
-    return jsonify({
-        'optimized_schedule': optimized_schedule,
-        'total_batches': len(optimized_schedule),
-        'schedule_efficiency': 85.5,  # Percentage
-        'bottlenecks': ['LC-MS capacity', 'Frank Miller availability'],
-        'recommendations': [
-            'Consider overtime for LC-MS methods',
-            'Cross-train additional personnel on NMR',
-            'Schedule maintenance during low-demand periods'
-        ]
-    })
+    req_data = request.get_json(silent=True) or {}
+    mode = req_data.get('mode', 'full')
+    if mode not in ('full', 'incremental'):
+        return jsonify({'success': False, 'message': 'mode must be one of: full, incremental'}), 400
+    
+    # Incremental mode serves the last solved schedule, already repaired by the edit hooks
+    sample_requests = req_data.get('sample_requests')
+    if mode == 'incremental' and sample_requests is None:
+        scheduler = cached_schedule()
+        if scheduler is not None:
+            # Repairs change the schedule in place
+            with schedule_lock:
+                summary = scheduler.summary()
+            return jsonify(dict(summary, mode='incremental'))
+    
+    start = None
+    if req_data.get('start_time'):
+        start = parse_time(req_data['start_time'])
+        if start is None:
+            return jsonify({'success': False, 'message': 'start_time must be an ISO datetime'}), 400
+    
+    scheduler = build_batch_scheduler(start=start)
+    
+    # Explicit requests are a one-off solve; the open demand queue is cached for repairs
+    if sample_requests is not None:
+        return jsonify(dict(scheduler.schedule(sample_requests), mode='full'))
+    
+    result = scheduler.schedule(open_sample_requests())
+    cache_schedule(scheduler, get_catalog())
+    return jsonify(dict(result, mode='full'))
 
 @app.route('/api/capacity/overview')
 def api_capacity_overview():
-    """Get capacity overview comparing sample capacity by method"""
+    """Get capacity overview comparing sample capacity by method
+
+    Sample data, the same for every scenario; scenario= is only checked.
+    """
+    current_scenario()
     capacity_overview = {
         'by_method': [
             {
@@ -1718,26 +2414,35 @@ def api_add_demand():
     
     # Generate unique ID using Python random instead of numpy
     import random
-    demand_id = f"DEM-{random.randint(100, 999):03d}"
-    
-    # Create the demand item
-    demand_item = {
-        'id': demand_id,
-        'date': data.get('start_date', datetime.now().strftime('%Y-%m-%d')),
-        'method': str(method_id),
-        'method_name': str(method_id.replace('-', ' ').title()),
-        'sample_count': sample_count,
-        'priority': str(data.get('priority', 'medium')),
-        'status': str(data.get('status', 'pending')),
-        'client': str(data.get('client', '')),
-        'project': str(data.get('project_name', '')),
-        'requirements': str(data.get('requirements', '')),
-        'assay_breakdown': assay_breakdown,
-        'created_at': datetime.now().isoformat()
-    }
-    
-    # Store in memory (in production, this would save to database)
-    added_demand_items.append(demand_item)
+    with catalog_transaction() as draft:
+        demand_id = f"DEM-{random.randint(100, 999):03d}"
+        while draft.has_demand(demand_id):
+            demand_id = f"DEM-{random.randint(100, 9999):03d}"
+        
+        # Create the demand item
+        demand_item = {
+            'id': demand_id,
+            'date': data.get('start_date', datetime.now().strftime('%Y-%m-%d')),
+            'method': str(method_id),
+            'method_name': str(method_id.replace('-', ' ').title()),
+            'sample_count': sample_count,
+            'priority': str(data.get('priority', 'medium')),
+            'status': str(data.get('status', 'pending')),
+            'client': str(data.get('client', '')),
+            'project': str(data.get('project_name', '')),
+            'requirements': str(data.get('requirements', '')),
+            'assay_breakdown': assay_breakdown,
+            'created_at': datetime.now().isoformat()
+        }
+        if data.get('required_by'):
+            demand_item['required_by'] = str(data['required_by'])
+        
+        draft.add_demand(demand_item)
+        persist('add_demand', demand_item)
+        
+        # Repair the cached schedule with just the new request
+        repair_schedule(draft, lambda scheduler: scheduler.add_requests([demand_to_sample_request(demand_item)]))
+    notify('demand_added', item=demand_item)
     
     return jsonify({
         'success': True,
@@ -1750,60 +2455,15 @@ def api_add_demand():
 # ADMIN API ENDPOINTS
 # ============================================================================
 
+def get_admin_method_records():
+    """Get admin method records with edits and removals applied"""
+    return get_catalog().method_records()
+
 @app.route('/api/admin/methods', methods=['GET'])
+@cached_response('methods')
 def api_admin_methods():
     """Get all methods for admin management"""
-    base_methods = [
-        {
-            'id': 'HPLC-001',
-            'name': 'HPLC Method A',
-            'description': 'Standard HPLC analysis for organic compounds',
-            'category': 'HPLC',
-            'lead_time_days': 3,
-            'is_active': True
-        },
-        {
-            'id': 'HPLC-002',
-            'name': 'HPLC Method B',
-            'description': 'Advanced HPLC method for complex matrices',
-            'category': 'HPLC',
-            'lead_time_days': 5,
-            'is_active': True
-        },
-        {
-            'id': 'GC-001',
-            'name': 'GC Method A',
-            'description': 'Gas chromatography for volatile compounds',
-            'category': 'GC',
-            'lead_time_days': 2,
-            'is_active': True
-        },
-        {
-            'id': 'MS-001',
-            'name': 'Mass Spec Method A',
-            'description': 'LC-MS/MS analysis for trace compounds',
-            'category': 'MS',
-            'lead_time_days': 7,
-            'is_active': True
-        },
-        {
-            'id': 'ICP-001',
-            'name': 'ICP-MS Method A',
-            'description': 'Inductively coupled plasma mass spectrometry',
-            'category': 'ICP',
-            'lead_time_days': 4,
-            'is_active': True
-        }
-    ]
-
-    # Apply base method edits if they exist
-    for method in base_methods:
-        if method['id'] in base_method_edits:
-            method.update(base_method_edits[method['id']])
-    
-    methods = [m for m in base_methods if m['id'] not in removed_methods]
-    methods.extend(m for m in added_methods if m['id'] not in removed_methods)
-    return jsonify(methods)
+    return jsonify(get_admin_method_records())
 
 @app.route('/api/admin/methods', methods=['POST'])
 def api_admin_add_method():
@@ -1825,9 +2485,6 @@ def api_admin_add_method():
     if not method_id or not method_name or not category or not description:
         return jsonify({'success': False, 'message': 'All fields are required'}), 400
 
-    if method_exists(method_id):
-        return jsonify({'success': False, 'message': f'Method ID {method_id} already exists'}), 400
-
     new_method = {
         'id': method_id,
         'name': method_name,
@@ -1837,63 +2494,34 @@ def api_admin_add_method():
         'is_active': True
     }
 
-    added_methods.append(new_method)
-
-    instrument_ids_by_category = {
-        'HPLC': ['HPLC-01', 'HPLC-02', 'HPLC-03'],
-        'GC': ['GC-01', 'GC-02', 'GC-03'],
-        'LC-MS': ['MS-01', 'MS-02'],
-        'MS': ['MS-01', 'MS-02'],
-        'ICP': ['ICP-01', 'ICP-02', 'ICP-03'],
-        'NMR': ['NMR-01'],
-        'SEC': ['SEC-01']
-    }
+    # The method, its matrix entries and its skill are published together
+    with catalog_transaction() as draft:
+        if draft.has_method(method_id):
+            return jsonify({'success': False, 'message': f'Method ID {method_id} already exists'}), 400
 
-    instrument_names = {
-        'HPLC-01': 'Agilent 1260 HPLC', 'HPLC-02': 'Waters Alliance HPLC', 'HPLC-03': 'Shimadzu LC-20AD HPLC',
-        'GC-01': 'Agilent 7890B GC', 'GC-02': 'Shimadzu GC-2010 Plus', 'GC-03': 'PerkinElmer Clarus 590 GC',
-        'MS-01': 'Thermo Q Exactive MS', 'MS-02': 'Waters Xevo TQ-XS MS',
-        'ICP-01': 'PerkinElmer NexION ICP-MS', 'ICP-02': 'Agilent 7900 ICP-MS', 'ICP-03': 'Thermo iCAP RQ ICP-MS',
-        'NMR-01': 'Bruker Avance III 600 NMR',
-        'SEC-01': 'Wyatt Dawn Heleos SEC-MALS'
-    }
-
-    instrument_status_store = {
-        'HPLC-01': 'active', 'HPLC-02': 'active', 'HPLC-03': 'maintenance',
-        'GC-01': 'active', 'GC-02': 'active', 'GC-03': 'inactive',
-        'MS-01': 'active', 'MS-02': 'active',
-        'ICP-01': 'active', 'ICP-02': 'active', 'ICP-03': 'maintenance',
-        'NMR-01': 'active', 'SEC-01': 'active'
-    }
+        draft.add_method(new_method)
 
-    compatible_instruments = instrument_ids_by_category.get(category, [])
-    created_matrix_entries = 0
+        # Every instrument in the method's category starts out compatible
+        compatible_instruments = draft.instrument_ids_in_category(instrument_category_for(category))
+        for instrument_id in compatible_instruments:
+            draft.set_compatibility(method_id, instrument_id, True)
+        created_matrix_entries = len(compatible_instruments)
 
-    for instrument_id in compatible_instruments:
-        matrix_entry = {
+        draft.add_skill({
+            'operator_id': 'OP-NEW',
+            'operator_name': 'Auto Assign Team',
             'method_id': method_id,
             'method_name': method_name,
-            'instrument_category': category,
-            'instrument_id': instrument_id,
-            'instrument_name': instrument_names.get(instrument_id, instrument_id),
-            'instrument_status': instrument_status_store.get(instrument_id, 'active'),
-            'is_compatible': True,
-            'is_available': instrument_status_store.get(instrument_id, 'active') == 'active'
-        }
-        added_method_instrument_matrix.append(matrix_entry)
-        created_matrix_entries += 1
+            'proficiency_level': 'Pending Training',
+            'certification_date': 'N/A',
+            'last_training': 'N/A',
+            'can_train_others': False,
+            'max_batch_size': 0
+        })
+        persist('add_method', new_method, compatible_instruments, draft.skills[('OP-NEW', method_id)])
+    notify('catalog_changed', stores=['methods', 'matrix', 'skills'], action='method_added', id=method_id)
 
-    added_operator_skills.append({
-        'operator_id': 'OP-NEW',
-        'operator_name': 'Auto Assign Team',
-        'method_id': method_id,
-        'method_name': method_name,
-        'proficiency_level': 'Pending Training',
-        'certification_date': 'N/A',
-        'last_training': 'N/A',
-        'can_train_others': False,
-        'max_batch_size': 0
-    })
+    invalidate_schedule()
 
     return jsonify({
         'success': True,
@@ -1920,63 +2548,30 @@ def api_admin_update_method():
         if not data.get(field):
             return jsonify({'success': False, 'message': f'Missing required field: {field}'}), 400
     
-    global added_methods
-    
-    # Check if method exists in added_methods (custom methods)
-    method_index = None
-    for i, method in enumerate(added_methods):
-        if method['id'] == method_id:
-            method_index = i
-            break
-    
-    if method_index is not None:
-        # Update custom method
-        added_methods[method_index].update({
+    with catalog_transaction() as draft:
+        if not draft.has_method(method_id):
+            return jsonify({
+                'success': False, 
+                'message': f'Method {method_id} not found'
+            }), 404
+        
+        updated_method = draft.update_method(method_id, {
             'name': data['name'],
             'category': data['category'],
             'description': data['description'],
             'lead_time_days': int(data['lead_time_days']),
             'is_active': data.get('is_active', True)
         })
-        
-        return jsonify({
-            'success': True,
-            'message': f'Method {method_id} updated successfully',
-            'method': added_methods[method_index]
-        })
-    else:
-        # For base methods, store the edits in base_method_edits
-        if method_id in BASE_METHOD_IDS:
-            global base_method_edits
-            
-            # Store the edit for this base method
-            base_method_edits[method_id] = {
-                'name': data['name'],
-                'category': data['category'],
-                'description': data['description'],
-                'lead_time_days': int(data['lead_time_days']),
-                'is_active': data.get('is_active', True)
-            }
-            
-            updated_method = {
-                'id': method_id,
-                'name': data['name'],
-                'category': data['category'],
-                'description': data['description'],
-                'lead_time_days': int(data['lead_time_days']),
-                'is_active': data.get('is_active', True)
-            }
-            
-            return jsonify({
-                'success': True,
-                'message': f'Method {method_id} updated successfully',
-                'method': updated_method
-            })
-        else:
-            return jsonify({
-                'success': False, 
-                'message': f'Method {method_id} not found'
-            }), 404
+        persist('update_method', updated_method, draft.method_profiles.get(method_id))
+    notify('catalog_changed', stores=['methods'], action='method_updated', id=method_id)
+    
+    invalidate_schedule()
+    
+    return jsonify({
+        'success': True,
+        'message': f'Method {method_id} updated successfully',
+        'method': updated_method
+    })
 
 @app.route('/api/admin/methods', methods=['DELETE'])
 def api_admin_delete_method():
@@ -1987,263 +2582,31 @@ def api_admin_delete_method():
     if not method_id:
         return jsonify({'success': False, 'message': 'Method ID is required'}), 400
     
-    # In a real implementation, this would:
-    # 1. Remove method from methods table
-    # 2. Remove all demand items with this method
-    # 3. Remove all method-instrument matrix entries
-    # 4. Remove from operator skills matrix
-    # 5. Update any schedules/assignments
-    
-    # Check impact before deletion
-    global added_demand_items, added_methods, added_method_instrument_matrix
-    
-    affected_demand = [item for item in added_demand_items if item['method'] == method_id]
-    affected_matrix = [item for item in added_method_instrument_matrix if item['method_id'] == method_id]
-    affected_methods = [method for method in added_methods if method['id'] == method_id]
-    affected_skills = [skill for skill in added_operator_skills if skill['method_id'] == method_id]
-
-    added_demand_items[:] = [item for item in added_demand_items if item['method'] != method_id]
-    added_methods[:] = [method for method in added_methods if method['id'] != method_id]
-    added_method_instrument_matrix[:] = [item for item in added_method_instrument_matrix if item['method_id'] != method_id]
-    added_operator_skills[:] = [skill for skill in added_operator_skills if skill['method_id'] != method_id]
-
-    if is_base_method(method_id):
-        removed_methods.add(method_id)
+    # Remove the method with its demand, matrix entries and skills in one pass over the
+    # indexes; readers see either all four stores before the delete or all after it
+    with catalog_transaction() as draft:
+        if not draft.has_method(method_id):
+            return jsonify({'success': False, 'message': f'Method {method_id} not found'}), 404
+        impact = draft.remove_method(method_id)
+        persist('delete_method', method_id)
+        repair_schedule(draft, lambda scheduler: scheduler.remove_method(method_id))
+    notify('catalog_changed', stores=['methods', 'matrix', 'skills', 'demand'], action='method_deleted', id=method_id)
 
     return jsonify({
         'success': True,
         'message': f'Method {method_id} deleted successfully',
-        'impact': {
-            'demand_items_removed': len(affected_demand),
-            'matrix_entries_removed': len(affected_matrix),
-            'custom_methods_removed': len(affected_methods),
-            'operator_skill_entries_removed': len(affected_skills)
-        }
+        'impact': impact
     })
 
+def get_admin_instrument_records():
+    """Get instrument records with edits and live status applied"""
+    return get_catalog().instrument_records()
+
 @app.route('/api/admin/instruments', methods=['GET'])
+@cached_response('instruments')
 def api_admin_instruments():
     """Get all instruments for admin management"""
-    base_instruments = [
-        # HPLC Instruments
-        {
-            'id': 'HPLC-01',
-            'name': 'Agilent 1260 HPLC',
-            'category': 'HPLC',
-            'status': instrument_status_store.get('HPLC-01', 'active'),
-            'location': 'Lab A-101',
-            'max_batch_size': 96,
-            'avg_batch_size': 77,
-            'run_time_per_sample_min': 10,
-            'failure_rate_percent': 2.5,
-            'setup_time_hours': 1.0,
-            'cleanup_time_hours': 0.5,
-            'throughput_samples_per_day': 192,
-            'efficiency_factor': 1.0,
-            'maintenance_schedule': 'Weekly',
-            'last_calibration': '2024-01-15',
-            'next_calibration': '2024-02-15'
-        },
-        {
-            'id': 'HPLC-02',
-            'name': 'Waters Alliance HPLC',
-            'category': 'HPLC',
-            'status': instrument_status_store.get('HPLC-02', 'active'),
-            'location': 'Lab A-102',
-            'max_batch_size': 96,
-            'avg_batch_size': 77,
-            'run_time_per_sample_min': 12,
-            'failure_rate_percent': 3.0,
-            'setup_time_hours': 1.5,
-            'cleanup_time_hours': 0.5,
-            'throughput_samples_per_day': 160,
-            'efficiency_factor': 0.9,
-            'maintenance_schedule': 'Weekly',
-            'last_calibration': '2024-01-20',
-            'next_calibration': '2024-02-20'
-        },
-        {
-            'id': 'HPLC-03',
-            'name': 'Shimadzu LC-20AD HPLC',
-            'category': 'HPLC',
-            'status': instrument_status_store.get('HPLC-03', 'maintenance'),
-            'location': 'Lab A-103',
-            'max_batch_size': 48,
-            'avg_batch_size': 38,
-            'run_time_per_sample_min': 15,
-            'failure_rate_percent': 4.5,
-            'setup_time_hours': 2.0,
-            'cleanup_time_hours': 1.0,
-            'throughput_samples_per_day': 96,
-            'efficiency_factor': 0.8,
-            'maintenance_schedule': 'Bi-weekly',
-            'last_calibration': '2024-01-10',
-            'next_calibration': '2024-02-10'
-        },
-        # GC Instruments
-        {
-            'id': 'GC-01',
-            'name': 'Agilent 7890B GC',
-            'category': 'GC',
-            'status': instrument_status_store.get('GC-01', 'active'),
-            'location': 'Lab B-201',
-            'max_batch_size': 48,
-            'avg_batch_size': 38,
-            'run_time_per_sample_min': 25,
-            'failure_rate_percent': 1.8,
-            'setup_time_hours': 0.5,
-            'cleanup_time_hours': 0.25,
-            'throughput_samples_per_day': 96,
-            'efficiency_factor': 1.0,
-            'maintenance_schedule': 'Bi-weekly',
-            'last_calibration': '2024-01-18',
-            'next_calibration': '2024-02-18'
-        },
-        {
-            'id': 'GC-02',
-            'name': 'Shimadzu GC-2010 Plus',
-            'category': 'GC',
-            'status': instrument_status_store.get('GC-02', 'active'),
-            'location': 'Lab B-202',
-            'max_batch_size': 36,
-            'avg_batch_size': 29,
-            'run_time_per_sample_min': 30,
-            'failure_rate_percent': 2.2,
-            'setup_time_hours': 0.75,
-            'cleanup_time_hours': 0.5,
-            'throughput_samples_per_day': 72,
-            'efficiency_factor': 0.95,
-            'maintenance_schedule': 'Bi-weekly',
-            'last_calibration': '2024-01-22',
-            'next_calibration': '2024-02-22'
-        },
-        {
-            'id': 'GC-03',
-            'name': 'PerkinElmer Clarus 590 GC',
-            'category': 'GC',
-            'status': instrument_status_store.get('GC-03', 'inactive'),
-            'location': 'Lab B-203',
-            'max_batch_size': 24,
-            'avg_batch_size': 19,
-            'run_time_per_sample_min': 35,
-            'failure_rate_percent': 3.8,
-            'setup_time_hours': 1.0,
-            'cleanup_time_hours': 0.75,
-            'throughput_samples_per_day': 48,
-            'efficiency_factor': 0.85,
-            'maintenance_schedule': 'Monthly',
-            'last_calibration': '2024-01-05',
-            'next_calibration': '2024-02-05'
-        },
-        # LC-MS Instruments
-        {
-            'id': 'MS-01',
-            'name': 'Thermo Q Exactive MS',
-            'category': 'LC-MS',
-            'status': instrument_status_store.get('MS-01', 'active'),
-            'location': 'Lab C-301',
-            'max_batch_size': 24,
-            'avg_batch_size': 19,
-            'run_time_per_sample_min': 45,
-            'failure_rate_percent': 4.2,
-            'setup_time_hours': 2.0,
-            'cleanup_time_hours': 1.0,
-            'throughput_samples_per_day': 48,
-            'efficiency_factor': 1.0,
-            'maintenance_schedule': 'Monthly',
-            'last_calibration': '2024-01-25',
-            'next_calibration': '2024-02-25'
-        },
-        {
-            'id': 'MS-02',
-            'name': 'Waters Xevo TQ-XS MS',
-            'category': 'LC-MS',
-            'status': instrument_status_store.get('MS-02', 'active'),
-            'location': 'Lab C-302',
-            'max_batch_size': 32,
-            'avg_batch_size': 26,
-            'run_time_per_sample_min': 35,
-            'failure_rate_percent': 3.5,
-            'setup_time_hours': 1.5,
-            'cleanup_time_hours': 0.75,
-            'throughput_samples_per_day': 64,
-            'efficiency_factor': 0.95,
-            'maintenance_schedule': 'Monthly',
-            'last_calibration': '2024-01-28',
-            'next_calibration': '2024-02-28'
-        },
-        # ICP Instruments
-        {
-            'id': 'ICP-01',
-            'name': 'PerkinElmer NexION ICP-MS',
-            'category': 'ICP',
-            'status': instrument_status_store.get('ICP-01', 'active'),
-            'location': 'Lab D-401',
-            'max_batch_size': 72,
-            'avg_batch_size': 58,
-            'run_time_per_sample_min': 15,
-            'failure_rate_percent': 1.5,
-            'setup_time_hours': 1.0,
-            'cleanup_time_hours': 0.5,
-            'throughput_samples_per_day': 144,
-            'efficiency_factor': 1.0,
-            'maintenance_schedule': 'Bi-weekly',
-            'last_calibration': '2024-01-30',
-            'next_calibration': '2024-02-29'
-        },
-        {
-            'id': 'ICP-02',
-            'name': 'Agilent 7900 ICP-MS',
-            'category': 'ICP',
-            'status': instrument_status_store.get('ICP-02', 'active'),
-            'location': 'Lab D-402',
-            'max_batch_size': 96,
-            'avg_batch_size': 77,
-            'run_time_per_sample_min': 12,
-            'failure_rate_percent': 1.2,
-            'setup_time_hours': 0.75,
-            'cleanup_time_hours': 0.25,
-            'throughput_samples_per_day': 192,
-            'efficiency_factor': 1.1,
-            'maintenance_schedule': 'Bi-weekly',
-            'last_calibration': '2024-02-01',
-            'next_calibration': '2024-03-01'
-        },
-        {
-            'id': 'ICP-03',
-            'name': 'Thermo iCAP RQ ICP-MS',
-            'category': 'ICP',
-            'status': instrument_status_store.get('ICP-03', 'maintenance'),
-            'location': 'Lab D-403',
-            'max_batch_size': 48,
-            'avg_batch_size': 38,
-            'run_time_per_sample_min': 20,
-            'failure_rate_percent': 2.8,
-            'setup_time_hours': 2.0,
-            'cleanup_time_hours': 1.0,
-            'throughput_samples_per_day': 72,
-            'efficiency_factor': 0.8,
-            'maintenance_schedule': 'Monthly',
-            'last_calibration': '2024-01-15',
-            'next_calibration': '2024-02-15'
-        }
-        ]
-    
-    # Apply base instrument edits if they exist
-    global base_instrument_edits
-    if 'base_instrument_edits' not in globals():
-        base_instrument_edits = {}
-    
-    for instrument in base_instruments:
-        if instrument['id'] in base_instrument_edits:
-            instrument.update(base_instrument_edits[instrument['id']])
-    
-    # Include added instruments
-    all_instruments = base_instruments.copy()
-    if 'added_instruments' in globals():
-        all_instruments.extend(added_instruments)
-    
-    return jsonify(all_instruments)
+    return jsonify(get_admin_instrument_records())
 
 @app.route('/api/admin/operators', methods=['GET'])
 def api_admin_operators():
@@ -2296,261 +2659,28 @@ def api_admin_operators():
     ]
     return jsonify(operators)
 
+def get_method_instrument_matrix():
+    """Get method x instrument matrix with compatibility changes applied"""
+    return get_catalog().matrix_records()
+
 @app.route('/api/admin/method-instrument-matrix', methods=['GET'])
+@cached_response('methods', 'instruments', 'matrix')
 def api_admin_method_instrument_matrix():
     """Get method x instrument compatibility matrix for admin management"""
-    
-    # Use centralized instrument status store for synchronization
-    
-    matrix = [
-        # HPLC Methods
-        {
-            'method_id': 'HPLC-001',
-            'method_name': 'HPLC Method A',
-            'instrument_category': 'HPLC',
-            'instrument_id': 'HPLC-01',
-            'instrument_name': 'Agilent 1260 HPLC',
-            'instrument_status': instrument_status_store['HPLC-01'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['HPLC-01'] == 'active'
-        },
-        {
-            'method_id': 'HPLC-001',
-            'method_name': 'HPLC Method A',
-            'instrument_category': 'HPLC',
-            'instrument_id': 'HPLC-02',
-            'instrument_name': 'Waters Alliance HPLC',
-            'instrument_status': instrument_status_store['HPLC-02'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['HPLC-02'] == 'active'
-        },
-        {
-            'method_id': 'HPLC-001',
-            'method_name': 'HPLC Method A',
-            'instrument_category': 'HPLC',
-            'instrument_id': 'HPLC-03',
-            'instrument_name': 'Shimadzu LC-20AD HPLC',
-            'instrument_status': instrument_status_store['HPLC-03'],
-            'is_compatible': False,
-            'is_available': instrument_status_store['HPLC-03'] == 'active'
-        },
-        {
-            'method_id': 'HPLC-002',
-            'method_name': 'HPLC Method B',
-            'instrument_category': 'HPLC',
-            'instrument_id': 'HPLC-01',
-            'instrument_name': 'Agilent 1260 HPLC',
-            'instrument_status': instrument_status_store['HPLC-01'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['HPLC-01'] == 'active'
-        },
-        {
-            'method_id': 'HPLC-002',
-            'method_name': 'HPLC Method B',
-            'instrument_category': 'HPLC',
-            'instrument_id': 'HPLC-02',
-            'instrument_name': 'Waters Alliance HPLC',
-            'instrument_status': instrument_status_store['HPLC-02'],
-            'is_compatible': False,
-            'is_available': instrument_status_store['HPLC-02'] == 'active'
-        },
-        {
-            'method_id': 'HPLC-002',
-            'method_name': 'HPLC Method B',
-            'instrument_category': 'HPLC',
-            'instrument_id': 'HPLC-03',
-            'instrument_name': 'Shimadzu LC-20AD HPLC',
-            'instrument_status': instrument_status_store['HPLC-03'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['HPLC-03'] == 'active'
-        },
-        # GC Methods
-        {
-            'method_id': 'GC-001',
-            'method_name': 'GC Method A',
-            'instrument_category': 'GC',
-            'instrument_id': 'GC-01',
-            'instrument_name': 'Agilent 7890B GC',
-            'instrument_status': instrument_status_store['GC-01'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['GC-01'] == 'active'
-        },
-        {
-            'method_id': 'GC-001',
-            'method_name': 'GC Method A',
-            'instrument_category': 'GC',
-            'instrument_id': 'GC-02',
-            'instrument_name': 'Shimadzu GC-2010 Plus',
-            'instrument_status': instrument_status_store['GC-02'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['GC-02'] == 'active'
-        },
-        {
-            'method_id': 'GC-001',
-            'method_name': 'GC Method A',
-            'instrument_category': 'GC',
-            'instrument_id': 'GC-03',
-            'instrument_name': 'PerkinElmer Clarus 590 GC',
-            'instrument_status': instrument_status_store['GC-03'],
-            'is_compatible': False,
-            'is_available': instrument_status_store['GC-03'] == 'active'
-        },
-        # MS Methods
-        {
-            'method_id': 'MS-001',
-            'method_name': 'Mass Spec Method A',
-            'instrument_category': 'LC-MS',
-            'instrument_id': 'MS-01',
-            'instrument_name': 'Thermo Q Exactive MS',
-            'instrument_status': instrument_status_store['MS-01'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['MS-01'] == 'active'
-        },
-        {
-            'method_id': 'MS-001',
-            'method_name': 'Mass Spec Method A',
-            'instrument_category': 'LC-MS',
-            'instrument_id': 'MS-02',
-            'instrument_name': 'Waters Xevo TQ-XS MS',
-            'instrument_status': instrument_status_store['MS-02'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['MS-02'] == 'active'
-        },
-        # ICP Methods
-        {
-            'method_id': 'ICP-001',
-            'method_name': 'ICP-MS Method A',
-            'instrument_category': 'ICP',
-            'instrument_id': 'ICP-01',
-            'instrument_name': 'PerkinElmer NexION ICP-MS',
-            'instrument_status': instrument_status_store['ICP-01'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['ICP-01'] == 'active'
-        },
-        {
-            'method_id': 'ICP-001',
-            'method_name': 'ICP-MS Method A',
-            'instrument_category': 'ICP',
-            'instrument_id': 'ICP-02',
-            'instrument_name': 'Agilent 7900 ICP-MS',
-            'instrument_status': instrument_status_store['ICP-02'],
-            'is_compatible': True,
-            'is_available': instrument_status_store['ICP-02'] == 'active'
-        },
-        {
-            'method_id': 'ICP-001',
-            'method_name': 'ICP-MS Method A',
-            'instrument_category': 'ICP',
-            'instrument_id': 'ICP-03',
-            'instrument_name': 'Thermo iCAP RQ ICP-MS',
-            'instrument_status': instrument_status_store['ICP-03'],
-            'is_compatible': False,
-            'is_available': instrument_status_store['ICP-03'] == 'active'
-        }
-    ]
-    
-    # Add newly created method-instrument matrix entries
-    matrix.extend(added_method_instrument_matrix)
-    
-    # Apply stored compatibility changes
-    global method_instrument_compatibility
-    for item in matrix:
-        key = f"{item['method_id']}_{item['instrument_id']}"
-        if key in method_instrument_compatibility:
-            item['is_compatible'] = method_instrument_compatibility[key]['is_compatible']
-    
-    return jsonify(matrix)
+    return jsonify(get_method_instrument_matrix())
+
+def get_operator_skill_records():
+    """Get operator skill records for active methods"""
+    return get_catalog().skill_records()
 
 @app.route('/api/admin/operator-skills', methods=['GET'])
+@cached_response('skills')
 def api_admin_operator_skills():
     """Get operator skills matrix for admin management"""
-    skills = [
-        {
-            'operator_id': 'OP-001',
-            'operator_name': 'Alice Johnson',
-            'method_id': 'HPLC-001',
-            'method_name': 'HPLC Method A',
-            'proficiency_level': 'Expert',
-            'certification_date': '2020-02-15',
-            'last_training': '2023-01-10',
-            'can_train_others': True,
-            'max_batch_size': 96
-        },
-        {
-            'operator_id': 'OP-001',
-            'operator_name': 'Alice Johnson',
-            'method_id': 'GC-001',
-            'method_name': 'GC Method A',
-            'proficiency_level': 'Intermediate',
-            'certification_date': '2020-03-20',
-            'last_training': '2022-08-15',
-            'can_train_others': False,
-            'max_batch_size': 48
-        },
-        {
-            'operator_id': 'OP-001',
-            'operator_name': 'Alice Johnson',
-            'method_id': 'MS-001',
-            'method_name': 'Mass Spec Method A',
-            'proficiency_level': 'Beginner',
-            'certification_date': '2021-05-10',
-            'last_training': '2023-03-05',
-            'can_train_others': False,
-            'max_batch_size': 24
-        },
-        {
-            'operator_id': 'OP-002',
-            'operator_name': 'Bob Smith',
-            'method_id': 'HPLC-001',
-            'method_name': 'HPLC Method A',
-            'proficiency_level': 'Expert',
-            'certification_date': '2019-04-01',
-            'last_training': '2023-02-20',
-            'can_train_others': True,
-            'max_batch_size': 96
-        },
-        {
-            'operator_id': 'OP-002',
-            'operator_name': 'Bob Smith',
-            'method_id': 'HPLC-002',
-            'method_name': 'HPLC Method B',
-            'proficiency_level': 'Expert',
-            'certification_date': '2019-06-15',
-            'last_training': '2023-01-15',
-            'can_train_others': True,
-            'max_batch_size': 48
-        },
-        {
-            'operator_id': 'OP-002',
-            'operator_name': 'Bob Smith',
-            'method_id': 'GC-001',
-            'method_name': 'GC Method A',
-            'proficiency_level': 'Advanced',
-            'certification_date': '2019-05-10',
-            'last_training': '2022-11-30',
-            'can_train_others': True,
-            'max_batch_size': 48
-        },
-        {
-            'operator_id': 'OP-002',
-            'operator_name': 'Bob Smith',
-            'method_id': 'ICP-001',
-            'method_name': 'ICP-MS Method A',
-            'proficiency_level': 'Intermediate',
-            'certification_date': '2020-08-20',
-            'last_training': '2023-02-10',
-            'can_train_others': False,
-            'max_batch_size': 72
-        }
-    ]
+    return jsonify(get_operator_skill_records())
 
-    skills.extend(added_operator_skills)
-    skills = [s for s in skills if s['method_id'] not in removed_methods]
-    return jsonify(skills)
-
-@app.route('/api/admin/operator-holidays', methods=['GET'])
-def api_admin_operator_holidays():
-    """Get operator holidays for admin management"""
+def get_operator_holiday_records():
+    """Get operator holiday records"""
     holidays = [
         {
             'id': 'HOL-001',
@@ -2613,7 +2743,12 @@ def api_admin_operator_holidays():
             'notes': 'Advanced HPLC training course'
         }
     ]
-    return jsonify(holidays)
+    return holidays
+
+@app.route('/api/admin/operator-holidays', methods=['GET'])
+def api_admin_operator_holidays():
+    """Get operator holidays for admin management"""
+    return jsonify(get_operator_holiday_records())
 
 @app.route('/api/admin/method-instrument-matrix', methods=['POST'])
 def api_admin_update_method_instrument():
@@ -2626,15 +2761,20 @@ def api_admin_update_method_instrument():
     if not method_id or not instrument_id or is_compatible is None:
         return jsonify({'success': False, 'message': 'Missing required fields: method_id, instrument_id, is_compatible'}), 400
     
-    # Store the compatibility change
-    global method_instrument_compatibility
-    key = f"{method_id}_{instrument_id}"
-    method_instrument_compatibility[key] = {
-        'method_id': method_id,
-        'instrument_id': instrument_id,
-        'is_compatible': is_compatible
-    }
+    with catalog_transaction() as draft:
+        if not draft.has_method(method_id):
+            return jsonify({'success': False, 'message': f'Method {method_id} not found'}), 404
+        if not draft.has_instrument(instrument_id):
+            return jsonify({'success': False, 'message': f'Instrument {instrument_id} not found'}), 404
+        
+        # Store the compatibility change
+        draft.set_compatibility(method_id, instrument_id, is_compatible)
+        persist('set_compatibility', method_id, instrument_id, is_compatible)
+    notify('catalog_changed', stores=['matrix'], action='compatibility_updated',
+           id=method_id, instrument_id=instrument_id, is_compatible=bool(is_compatible))
     
+    invalidate_schedule()
+
     return jsonify({
         'success': True, 
         'message': f'Compatibility updated: {method_id} <-> {instrument_id} = {is_compatible}',
@@ -2672,13 +2812,16 @@ def api_update_instrument_status():
     if new_status not in valid_statuses:
         return jsonify({'success': False, 'message': f'Invalid status. Must be one of: {valid_statuses}'}), 400
     
-    # Validate instrument exists
-    if instrument_id not in instrument_status_store:
-        return jsonify({'success': False, 'message': f'Instrument {instrument_id} not found'}), 404
-    
-    # Update the centralized status store
-    old_status = instrument_status_store[instrument_id]
-    instrument_status_store[instrument_id] = new_status
+    with catalog_transaction() as draft:
+        # Validate instrument exists
+        if not draft.has_instrument(instrument_id):
+            return jsonify({'success': False, 'message': f'Instrument {instrument_id} not found'}), 404
+        
+        # Update the centralized status store
+        old_status = draft.set_instrument_status(instrument_id, new_status)
+        persist('set_instrument_status', instrument_id, new_status)
+        repair_schedule(draft, lambda scheduler: scheduler.update_instrument_status(instrument_id, new_status))
+    notify('instrument_status', instrument_id=instrument_id, old_status=old_status, new_status=new_status)
     
     return jsonify({
         'success': True, 
@@ -2709,10 +2852,6 @@ def api_admin_add_instrument():
     if category not in valid_categories:
         return jsonify({'success': False, 'message': f'Invalid category. Must be one of: {valid_categories}'}), 400
     
-    # Check if instrument ID already exists
-    if instrument_id in instrument_status_store:
-        return jsonify({'success': False, 'message': f'Instrument ID {instrument_id} already exists'}), 400
-    
     # Set default values for optional fields
     new_instrument = {
         'id': instrument_id,
@@ -2733,38 +2872,27 @@ def api_admin_add_instrument():
         'next_calibration': data.get('next_calibration', '2024-02-01')
     }
     
-    # Add to instrument status store
-    instrument_status_store[instrument_id] = new_instrument['status']
-    
-    # Add to added instruments list (in production, this would be saved to database)
-    global added_instruments
-    if 'added_instruments' not in globals():
-        added_instruments = []
-    added_instruments.append(new_instrument)
-    
-    # Auto-create method-instrument compatibility entries for all existing methods
-    # that match the instrument category
-    for method in added_methods + [
-        {'id': 'HPLC-001', 'category': 'HPLC'},
-        {'id': 'HPLC-002', 'category': 'HPLC'},
-        {'id': 'GC-001', 'category': 'GC'},
-        {'id': 'MS-001', 'category': 'MS'},
-        {'id': 'ICP-001', 'category': 'ICP'}
-    ]:
-        if method['category'] == category:
-            # Add compatibility entry for this method and new instrument
-            compatibility_entry = {
-                'method_id': method['id'],
-                'method_name': method.get('name', f"{method['category']} Method"),
-                'instrument_category': category,
-                'instrument_id': instrument_id,
-                'instrument_name': name,
-                'instrument_status': new_instrument['status'],
-                'is_compatible': True,  # Default to compatible for same category
-                'is_available': new_instrument['status'] == 'active'
-            }
-            added_method_instrument_matrix.append(compatibility_entry)
-    
+    # The instrument and its matrix entries are published together
+    with catalog_transaction() as draft:
+        # Check if instrument ID already exists
+        if draft.has_instrument(instrument_id):
+            return jsonify({'success': False, 'message': f'Instrument ID {instrument_id} already exists'}), 400
+        
+        draft.add_instrument(new_instrument)
+        
+        # Auto-create method-instrument compatibility entries for all existing methods
+        # that match the instrument category
+        compatible_methods = []
+        for method_category in [category] + [alias for alias, target in CATEGORY_ALIASES.items() if target == category]:
+            for method in draft.methods_in_category(method_category):
+                # Default to compatible for same category
+                draft.set_compatibility(method['id'], instrument_id, True)
+                compatible_methods.append(method['id'])
+        persist('add_instrument', new_instrument, compatible_methods)
+    notify('catalog_changed', stores=['instruments', 'matrix'], action='instrument_added', id=instrument_id)
+    
+    invalidate_schedule()
+
     return jsonify({
         'success': True,
         'message': f'Instrument {instrument_id} added successfully',
@@ -2795,109 +2923,407 @@ def api_admin_update_instrument():
     if category not in valid_categories:
         return jsonify({'success': False, 'message': f'Invalid category. Must be one of: {valid_categories}'}), 400
     
-    # Check if instrument exists in added instruments first
-    global added_instruments
-    if 'added_instruments' not in globals():
-        added_instruments = []
-    
-    instrument_index = None
-    for i, instrument in enumerate(added_instruments):
-        if instrument['id'] == instrument_id:
-            instrument_index = i
-            break
+    with catalog_transaction() as draft:
+        instrument = draft.get_instrument(instrument_id)
+        if instrument is None:
+            return jsonify({
+                'success': False, 
+                'message': f'Instrument {instrument_id} not found'
+            }), 404
     
-    if instrument_index is not None:
-        # Update custom instrument
-        added_instruments[instrument_index].update({
+        updated_instrument = draft.update_instrument(instrument_id, {
             'name': name,
             'category': category,
             'location': location,
-            'status': data.get('status', added_instruments[instrument_index]['status']),
-            'max_batch_size': int(data.get('max_batch_size', added_instruments[instrument_index]['max_batch_size'])),
-            'avg_batch_size': int(data.get('avg_batch_size', added_instruments[instrument_index]['avg_batch_size'])),
-            'run_time_per_sample_min': int(data.get('run_time_per_sample_min', added_instruments[instrument_index]['run_time_per_sample_min'])),
-            'failure_rate_percent': float(data.get('failure_rate_percent', added_instruments[instrument_index]['failure_rate_percent'])),
-            'setup_time_hours': float(data.get('setup_time_hours', added_instruments[instrument_index]['setup_time_hours'])),
-            'cleanup_time_hours': float(data.get('cleanup_time_hours', added_instruments[instrument_index]['cleanup_time_hours'])),
-            'throughput_samples_per_day': int(data.get('throughput_samples_per_day', added_instruments[instrument_index]['throughput_samples_per_day'])),
-            'efficiency_factor': float(data.get('efficiency_factor', added_instruments[instrument_index]['efficiency_factor'])),
-            'maintenance_schedule': data.get('maintenance_schedule', added_instruments[instrument_index]['maintenance_schedule']),
-            'last_calibration': data.get('last_calibration', added_instruments[instrument_index]['last_calibration']),
-            'next_calibration': data.get('next_calibration', added_instruments[instrument_index]['next_calibration'])
+            'status': data.get('status', instrument['status']),
+            'max_batch_size': int(data.get('max_batch_size', instrument['max_batch_size'])),
+            'avg_batch_size': int(data.get('avg_batch_size', instrument['avg_batch_size'])),
+            'run_time_per_sample_min': int(data.get('run_time_per_sample_min', instrument['run_time_per_sample_min'])),
+            'failure_rate_percent': float(data.get('failure_rate_percent', instrument['failure_rate_percent'])),
+            'setup_time_hours': float(data.get('setup_time_hours', instrument['setup_time_hours'])),
+            'cleanup_time_hours': float(data.get('cleanup_time_hours', instrument['cleanup_time_hours'])),
+            'throughput_samples_per_day': int(data.get('throughput_samples_per_day', instrument['throughput_samples_per_day'])),
+            'efficiency_factor': float(data.get('efficiency_factor', instrument['efficiency_factor'])),
+            'maintenance_schedule': data.get('maintenance_schedule', instrument['maintenance_schedule']),
+            'last_calibration': data.get('last_calibration', instrument['last_calibration']),
+            'next_calibration': data.get('next_calibration', instrument['next_calibration'])
         })
-        
-        # Update instrument status store
-        instrument_status_store[instrument_id] = added_instruments[instrument_index]['status']
-        
-        return jsonify({
-            'success': True,
-            'message': f'Instrument {instrument_id} updated successfully',
-            'instrument': added_instruments[instrument_index]
-        })
-    else:
-        # Check if it's a base instrument - allow editing but store changes separately
-        base_instrument_ids = {'HPLC-01', 'HPLC-02', 'HPLC-03', 'GC-01', 'GC-02', 'GC-03', 'MS-01', 'MS-02', 'ICP-01', 'ICP-02', 'ICP-03'}
-        if instrument_id in base_instrument_ids:
-            # Store base instrument edits separately
-            global base_instrument_edits
-            if 'base_instrument_edits' not in globals():
-                base_instrument_edits = {}
-            
-            # Get the original base instrument data
-            base_instruments = [
-                {'id': 'HPLC-01', 'name': 'Agilent 1260 HPLC', 'category': 'HPLC', 'location': 'Lab A-101', 'status': 'active', 'max_batch_size': 96, 'avg_batch_size': 77, 'run_time_per_sample_min': 10, 'failure_rate_percent': 2.5, 'setup_time_hours': 1.0, 'cleanup_time_hours': 0.5, 'throughput_samples_per_day': 192, 'efficiency_factor': 1.0, 'maintenance_schedule': 'Weekly', 'last_calibration': '2024-01-15', 'next_calibration': '2024-02-15'},
-                {'id': 'HPLC-02', 'name': 'Waters Alliance HPLC', 'category': 'HPLC', 'location': 'Lab A-102', 'status': 'active', 'max_batch_size': 96, 'avg_batch_size': 77, 'run_time_per_sample_min': 12, 'failure_rate_percent': 3.0, 'setup_time_hours': 1.5, 'cleanup_time_hours': 0.5, 'throughput_samples_per_day': 160, 'efficiency_factor': 0.9, 'maintenance_schedule': 'Weekly', 'last_calibration': '2024-01-20', 'next_calibration': '2024-02-20'},
-                {'id': 'HPLC-03', 'name': 'Shimadzu LC-20AD HPLC', 'category': 'HPLC', 'location': 'Lab A-103', 'status': 'maintenance', 'max_batch_size': 48, 'avg_batch_size': 38, 'run_time_per_sample_min': 15, 'failure_rate_percent': 4.5, 'setup_time_hours': 2.0, 'cleanup_time_hours': 1.0, 'throughput_samples_per_day': 96, 'efficiency_factor': 0.8, 'maintenance_schedule': 'Bi-weekly', 'last_calibration': '2024-01-10', 'next_calibration': '2024-02-10'},
-                {'id': 'GC-01', 'name': 'Agilent 7890B GC', 'category': 'GC', 'location': 'Lab B-201', 'status': 'active', 'max_batch_size': 48, 'avg_batch_size': 38, 'run_time_per_sample_min': 25, 'failure_rate_percent': 1.8, 'setup_time_hours': 0.5, 'cleanup_time_hours': 0.25, 'throughput_samples_per_day': 96, 'efficiency_factor': 1.0, 'maintenance_schedule': 'Bi-weekly', 'last_calibration': '2024-01-18', 'next_calibration': '2024-02-18'},
-                {'id': 'GC-02', 'name': 'Shimadzu GC-2010 Plus', 'category': 'GC', 'location': 'Lab B-202', 'status': 'active', 'max_batch_size': 36, 'avg_batch_size': 29, 'run_time_per_sample_min': 30, 'failure_rate_percent': 2.2, 'setup_time_hours': 0.75, 'cleanup_time_hours': 0.5, 'throughput_samples_per_day': 72, 'efficiency_factor': 0.95, 'maintenance_schedule': 'Bi-weekly', 'last_calibration': '2024-01-22', 'next_calibration': '2024-02-22'},
-                {'id': 'GC-03', 'name': 'PerkinElmer Clarus 590 GC', 'category': 'GC', 'location': 'Lab B-203', 'status': 'inactive', 'max_batch_size': 24, 'avg_batch_size': 19, 'run_time_per_sample_min': 35, 'failure_rate_percent': 3.8, 'setup_time_hours': 1.0, 'cleanup_time_hours': 0.75, 'throughput_samples_per_day': 48, 'efficiency_factor': 0.85, 'maintenance_schedule': 'Monthly', 'last_calibration': '2024-01-05', 'next_calibration': '2024-02-05'},
-                {'id': 'MS-01', 'name': 'Thermo Q Exactive MS', 'category': 'LC-MS', 'location': 'Lab C-301', 'status': 'active', 'max_batch_size': 24, 'avg_batch_size': 19, 'run_time_per_sample_min': 45, 'failure_rate_percent': 4.2, 'setup_time_hours': 2.0, 'cleanup_time_hours': 1.0, 'throughput_samples_per_day': 48, 'efficiency_factor': 1.0, 'maintenance_schedule': 'Monthly', 'last_calibration': '2024-01-25', 'next_calibration': '2024-02-25'},
-                {'id': 'MS-02', 'name': 'Waters Xevo TQ-XS MS', 'category': 'LC-MS', 'location': 'Lab C-302', 'status': 'active', 'max_batch_size': 32, 'avg_batch_size': 26, 'run_time_per_sample_min': 35, 'failure_rate_percent': 3.5, 'setup_time_hours': 1.5, 'cleanup_time_hours': 0.75, 'throughput_samples_per_day': 64, 'efficiency_factor': 0.95, 'maintenance_schedule': 'Monthly', 'last_calibration': '2024-01-28', 'next_calibration': '2024-02-28'},
-                {'id': 'ICP-01', 'name': 'PerkinElmer NexION ICP-MS', 'category': 'ICP', 'location': 'Lab D-401', 'status': 'active', 'max_batch_size': 72, 'avg_batch_size': 58, 'run_time_per_sample_min': 15, 'failure_rate_percent': 1.5, 'setup_time_hours': 1.0, 'cleanup_time_hours': 0.5, 'throughput_samples_per_day': 144, 'efficiency_factor': 1.0, 'maintenance_schedule': 'Bi-weekly', 'last_calibration': '2024-01-30', 'next_calibration': '2024-02-29'},
-                {'id': 'ICP-02', 'name': 'Agilent 7900 ICP-MS', 'category': 'ICP', 'location': 'Lab D-402', 'status': 'active', 'max_batch_size': 96, 'avg_batch_size': 77, 'run_time_per_sample_min': 12, 'failure_rate_percent': 1.2, 'setup_time_hours': 0.75, 'cleanup_time_hours': 0.25, 'throughput_samples_per_day': 192, 'efficiency_factor': 1.1, 'maintenance_schedule': 'Bi-weekly', 'last_calibration': '2024-02-01', 'next_calibration': '2024-03-01'},
-                {'id': 'ICP-03', 'name': 'Thermo iCAP RQ ICP-MS', 'category': 'ICP', 'location': 'Lab D-403', 'status': 'maintenance', 'max_batch_size': 48, 'avg_batch_size': 38, 'run_time_per_sample_min': 20, 'failure_rate_percent': 2.8, 'setup_time_hours': 2.0, 'cleanup_time_hours': 1.0, 'throughput_samples_per_day': 72, 'efficiency_factor': 0.8, 'maintenance_schedule': 'Monthly', 'last_calibration': '2024-01-15', 'next_calibration': '2024-02-15'}
-            ]
-            
-            # Find the base instrument
-            base_instrument = next((inst for inst in base_instruments if inst['id'] == instrument_id), None)
-            if not base_instrument:
-                return jsonify({
-                    'success': False, 
-                    'message': f'Base instrument {instrument_id} not found'
-                }), 404
-            
-            # Store the edits for this base instrument
-            base_instrument_edits[instrument_id] = {
-                'name': name,
-                'category': category,
-                'location': location,
-                'status': data.get('status', base_instrument['status']),
-                'max_batch_size': int(data.get('max_batch_size', base_instrument['max_batch_size'])),
-                'avg_batch_size': int(data.get('avg_batch_size', base_instrument['avg_batch_size'])),
-                'run_time_per_sample_min': int(data.get('run_time_per_sample_min', base_instrument['run_time_per_sample_min'])),
-                'failure_rate_percent': float(data.get('failure_rate_percent', base_instrument['failure_rate_percent'])),
-                'setup_time_hours': float(data.get('setup_time_hours', base_instrument['setup_time_hours'])),
-                'cleanup_time_hours': float(data.get('cleanup_time_hours', base_instrument['cleanup_time_hours'])),
-                'throughput_samples_per_day': int(data.get('throughput_samples_per_day', base_instrument['throughput_samples_per_day'])),
-                'efficiency_factor': float(data.get('efficiency_factor', base_instrument['efficiency_factor'])),
-                'maintenance_schedule': data.get('maintenance_schedule', base_instrument['maintenance_schedule']),
-                'last_calibration': data.get('last_calibration', base_instrument['last_calibration']),
-                'next_calibration': data.get('next_calibration', base_instrument['next_calibration'])
-            }
-            
-            # Update instrument status store
-            instrument_status_store[instrument_id] = base_instrument_edits[instrument_id]['status']
-            
-            return jsonify({
-                'success': True,
-                'message': f'Base instrument {instrument_id} updated successfully',
-                'instrument': base_instrument_edits[instrument_id]
-            })
-        else:
-            return jsonify({
-                'success': False, 
-                'message': f'Instrument {instrument_id} not found'
-            }), 404
+        persist('update_instrument', updated_instrument)
+    notify('catalog_changed', stores=['instruments'], action='instrument_updated', id=instrument_id)
+    
+    invalidate_schedule()
+    
+    return jsonify({
+        'success': True,
+        'message': f'Instrument {instrument_id} updated successfully',
+        'instrument': updated_instrument
+    })
+
+# ============================================================================
+# AVAILABILITY ENDPOINTS
+# ============================================================================
+
+AVAILABILITY_RESOURCE_TYPES = ('Instrument', 'Personnel')
+# Longest window /api/availability/earliest searches for
+MAX_SLOT_DURATION_HOURS = 24 * 366
+
+# Index over the database bookings and the table fingerprint it was built from
+availability_index = None
+availability_key = None
+
+def get_availability_index():
+    """Availability index over the database bookings, or over the solved schedule without a database"""
+    global availability_index, availability_key
+    if repository is None:
+        # Rebuilt per call; the in-memory schedule is repaired in place and is small
+        scheduler = solved_schedule()
+        with schedule_lock:
+            return schedule_availability_index(scheduler)
+    from availability import availability_version, load_availability_index
+    key = availability_version()
+    if key != availability_key:
+        availability_index = load_availability_index()
+        availability_key = key
+    return availability_index
+
+def availability_resource(index, resource):
+    intervals = index.resources[resource]
+    return {'resource_type': resource[0], 'id': resource[1], 'name': intervals.name, 'category': intervals.category}
+
+def availability_booking(booking):
+    start, end, (kind, booking_id) = booking
+    return {'kind': kind, 'id': booking_id, 'start': start.isoformat(), 'end': end.isoformat()}
+
+def parse_availability_args(*time_args):
+    """Read resource_type, category and ISO time arguments; returns (values, error response)"""
+    resource_type = request.args.get('resource_type', 'Instrument')
+    if resource_type not in AVAILABILITY_RESOURCE_TYPES:
+        return None, (jsonify({'success': False, 'message': f'resource_type must be one of: {AVAILABILITY_RESOURCE_TYPES}'}), 400)
+    values = [resource_type, request.args.get('category') or None]
+    for name in time_args:
+        if not request.args.get(name):
+            return None, (jsonify({'success': False, 'message': f'{name} is required'}), 400)
+        # Bookings are naive local time, so offsets are converted rather than compared
+        moment = parse_time(request.args[name])
+        if moment is None:
+            return None, (jsonify({'success': False, 'message': f'{name} must be an ISO datetime'}), 400)
+        values.append(moment)
+    return values, None
+
+@app.route('/api/availability/free')
+def api_availability_free():
+    """Which resources of a category are free for the whole window [start, end)"""
+    values, error = parse_availability_args('start', 'end')
+    if error:
+        return error
+    resource_type, category, start, end = values
+    if end <= start:
+        return jsonify({'success': False, 'message': 'end must be after start'}), 400
+    
+    index = get_availability_index()
+    free, busy = index.free_resources(resource_type, start, end, category)
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'free': [availability_resource(index, resource) for resource in free],
+        'busy': [dict(availability_resource(index, resource), bookings=[availability_booking(b) for b in bookings])
+                 for resource, bookings in busy.items()]
+    })
+
+@app.route('/api/availability/earliest')
+def api_availability_earliest():
+    """Earliest window of duration_hours free on any resource of a category"""
+    values, error = parse_availability_args()
+    if error:
+        return error
+    resource_type, category = values
+    invalid_duration = f'duration_hours must be a positive number of at most {MAX_SLOT_DURATION_HOURS}'
+    try:
+        duration = timedelta(hours=float(request.args.get('duration_hours', 1)))
+    except (ValueError, OverflowError):
+        return jsonify({'success': False, 'message': invalid_duration}), 400
+    if not timedelta(0) < duration <= timedelta(hours=MAX_SLOT_DURATION_HOURS):
+        return jsonify({'success': False, 'message': invalid_duration}), 400
+    after = parse_time(request.args['after']) if request.args.get('after') else datetime.now()
+    if after is None:
+        return jsonify({'success': False, 'message': 'after must be an ISO datetime'}), 400
+    
+    index = get_availability_index()
+    try:
+        slot = index.earliest_slot(resource_type, duration, after, category)
+    except OverflowError:
+        return jsonify({'success': False, 'message': 'No window before the end of the calendar'}), 404
+    if slot is None:
+        return jsonify({'success': False, 'message': 'No matching resources'}), 404
+    start, resource = slot
+    return jsonify({
+        'start': start.isoformat(),
+        'end': (start + duration).isoformat(),
+        'resource': availability_resource(index, resource)
+    })
+
+@app.route('/api/availability/conflicts')
+def api_availability_conflicts():
+    """Double-booked resources: every pair of overlapping bookings"""
+    resource_type = request.args.get('resource_type')
+    if resource_type is not None and resource_type not in AVAILABILITY_RESOURCE_TYPES:
+        return jsonify({'success': False, 'message': f'resource_type must be one of: {AVAILABILITY_RESOURCE_TYPES}'}), 400
+    index = get_availability_index()
+    conflicts = [
+        dict(availability_resource(index, resource), bookings=[availability_booking(first), availability_booking(second)])
+        for resource, first, second in index.conflicts(resource_type)
+    ]
+    return jsonify({'total': len(conflicts), 'conflicts': conflicts})
+
+# ============================================================================
+# SIMULATION ENDPOINTS
+# ============================================================================
+
+# Numeric what-if parameters: name -> (type, default, minimum, maximum)
+SIMULATION_PARAMETERS = {
+    'replications': (int, 1000, 1, Config.SIMULATION_MAX_REPLICATIONS),
+    'horizon_days': (int, CAPACITY_GAP_HORIZON_DAYS, 1, MAX_CAPACITY_GAP_HORIZON_DAYS),
+    # Hours a day instruments run; autosamplers run overnight
+    'operating_hours': (float, 24.0, 1.0, 24.0),
+    'run_time_cv': (float, 0.15, 0.0, 2.0),
+    'demand_scale': (float, 1.0, 0.0, 100.0),
+    'arrivals_per_day': (float, None, 0.0, 1000.0),
+    'seed': (int, None, 0, 2 ** 63 - 1)
+}
+
+def parse_simulation_request(data):
+    """Validate a simulation request body; returns (values, error message)"""
+    values = {}
+    for name, (kind, default, minimum, maximum) in SIMULATION_PARAMETERS.items():
+        value = data.get(name)
+        if value is None:
+            values[name] = default
+            continue
+        try:
+            value = kind(value)
+        except (TypeError, ValueError):
+            return None, f'{name} must be a number'
+        if not minimum <= value <= maximum:
+            return None, f'{name} must be between {minimum} and {maximum}'
+        values[name] = value
+    values['start'] = parse_date(data['start']) if data.get('start') else None
+    if data.get('start') and values['start'] is None:
+        return None, 'start must be a YYYY-MM-DD date'
+    values['offline_instruments'] = data.get('offline_instruments') or []
+    if not isinstance(values['offline_instruments'], list):
+        return None, 'offline_instruments must be a list of instrument ids'
+    return values, None
+
+@app.route('/api/simulation/run', methods=['POST'])
+def api_simulation_run():
+    """Monte Carlo what-if run over the capacity horizon
+
+    Each replication samples run-time variance, instrument failures from
+    failure_rate_percent and new demand arriving at arrivals_per_day
+    (default: the rate of the open demand already in the horizon), then
+    the turnaround and utilization distributions are summarized per
+    category. offline_instruments and demand_scale adjust the lab for
+    what-if questions; the same seed reproduces a run.
+    """
+    values, error = parse_simulation_request(request.get_json(silent=True) or {})
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
+    
+    items = get_demand_items()
+    start = values['start'] or earliest_open_demand_date(items)
+    horizon_days = values['horizon_days']
+    calendar = WorkCalendar.from_holiday_calendar(get_holiday_calendar(), start, days=horizon_days)
+    working_days = calendar.working_days_between(start, start + timedelta(days=horizon_days))
+    catalog = get_catalog()
+    categories, inputs = simulation_inputs(
+        items, catalog.records('methods'), catalog.records('instruments'), calendar, horizon_days,
+        values['demand_scale'], values['offline_instruments'])
+    arrivals_per_day = values['arrivals_per_day']
+    if arrivals_per_day is None:
+        arrivals_per_day = len(inputs['item_samples']) / max(working_days, 1)
+    
+    params = {
+        'working_days': working_days,
+        'operating_hours': values['operating_hours'],
+        'horizon_hours': max(working_days, 1) * values['operating_hours'],
+        'arrivals_per_day': arrivals_per_day,
+        'run_time_cv': values['run_time_cv']
+    }
+    started = datetime.now()
+    result = run_simulation(categories, inputs, params, values['replications'], values['seed'],
+                            Config.SIMULATION_WORKERS or None)
+    return jsonify(dict(
+        result,
+        success=True,
+        horizon={'start': start.isoformat(), 'days': horizon_days, 'working_days': working_days},
+        parameters=dict(params, demand_scale=values['demand_scale'], offline_instruments=values['offline_instruments']),
+        elapsed_seconds=round((datetime.now() - started).total_seconds(), 2)
+    ))
+
+# ============================================================================
+# SCENARIO ENDPOINTS
+# ============================================================================
+
+def scenario_detail(scenario):
+    return dict(scenario.summary(), changes=scenario.changes, conflicts=scenario.conflicts)
+
+@app.route('/api/scenarios', methods=['GET'])
+def api_scenarios():
+    """List what-if scenarios; pass scenario=<name> to any read endpoint to see the lab through one"""
+    return jsonify(scenario_store.records())
+
+@app.route('/api/scenarios', methods=['POST'])
+def api_create_scenario():
+    """Create a scenario from a name, an optional description and a list of changes"""
+    data = request.get_json(silent=True) or {}
+    name = str(data.get('name') or '').strip()
+    if not name:
+        return jsonify({'success': False, 'message': 'name is required'}), 400
+    changes = data.get('changes') or []
+    if not isinstance(changes, list):
+        return jsonify({'success': False, 'message': 'changes must be a list'}), 400
+    try:
+        scenario = scenario_store.create(name, live_catalog(), data.get('description', ''), changes)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    notify('scenario_changed', name=name, changes=len(scenario.changes))
+    return jsonify({'success': True, 'scenario': scenario_detail(scenario)}), 201
+
+@app.route('/api/scenarios/<name>', methods=['GET'])
+def api_scenario(name):
+    """A scenario with its changes and any that no longer apply to the live data"""
+    scenario_store.catalog(name, live_catalog())
+    return jsonify(scenario_detail(scenario_store.get(name)))
+
+@app.route('/api/scenarios/<name>/changes', methods=['POST'])
+def api_add_scenario_changes(name):
+    """Append changes to a scenario; none are kept if any fails to apply"""
+    changes = (request.get_json(silent=True) or {}).get('changes')
+    if not isinstance(changes, list) or not changes:
+        return jsonify({'success': False, 'message': 'changes must be a non-empty list'}), 400
+    try:
+        scenario = scenario_store.add_changes(name, live_catalog(), changes)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    notify('scenario_changed', name=name, changes=len(scenario.changes))
+    return jsonify({'success': True, 'scenario': scenario_detail(scenario)})
+
+@app.route('/api/scenarios/<name>', methods=['DELETE'])
+def api_delete_scenario(name):
+    scenario_store.delete(name)
+    notify('scenario_changed', name=name, deleted=True)
+    return jsonify({'success': True, 'message': f'Scenario {name} deleted'})
+
+# ============================================================================
+# BATCHED API ENDPOINTS
+# ============================================================================
+
+# Views LabCapacityApp.init renders on page load, keyed exactly as app.js requests them
+BOOTSTRAP_VIEWS = [
+    'admin/methods',
+    'eln/instruments/status',
+    'eln/personnel/availability',
+    'capacity/realtime',
+    'dashboard',
+    'charts/styles',
+    'personnel/utilization?format=columnar',
+    'instruments/status',
+    'capacity/timeline?format=columnar',
+    'personnel',
+    'instruments',
+    'schedule/gantt',
+    'assignments/today',
+    'demand/forecast?fields=date,method_name,sample_count,client,project,priority,status,assay_breakdown&format=columnar',
+    'demand/queue?limit=50',
+    'demand/by-instrument',
+    'demand/capacity-gap',
+    'capacity/overview',
+    {'path': 'scheduling/optimize', 'method': 'POST', 'body': {'mode': 'incremental'}},
+    'utilization/trend?format=columnar',
+    'projects'
+]
+MAX_BATCH_REQUESTS = 50
+# Endpoints that cannot be dispatched inside a batch: the batch views themselves and the event stream
+BATCH_ENDPOINTS = ('api_bootstrap', 'api_batch', 'api_events')
+
+def dispatch_view(path, method='GET', body=None):
+    """Run an API view in-process; returns (status code, JSON body)
+
+    The view runs inside the current request, so shared() intermediates
+    and the catalog sync done for the outer request carry over.
+    """
+    with app.test_request_context('/api/' + path.lstrip('/'), method=method, json=body):
+        try:
+            rule, view_args = request.url_rule, request.view_args
+            if rule is None or rule.endpoint in BATCH_ENDPOINTS:
+                return 404, {'success': False, 'message': f'No API view at {path}'}
+            response = app.make_response(app.view_functions[rule.endpoint](**view_args))
+        except UnknownScenario as e:
+            return 404, {'success': False, 'message': f'Unknown scenario {e.args[0]}'}
+        except Exception as e:
+            app.logger.exception('Batched view %s failed', path)
+            return 500, {'success': False, 'message': str(e)}
+        return response.status_code, response.get_json(silent=True)
+
+def batch_key(entry):
+    """Key of a batch entry's response: its id if it has one, else its path"""
+    return entry if isinstance(entry, str) else entry.get('id') or entry['path']
+
+def run_batch(entries):
+    """Dispatch batch entries (a path, or {path, method, body, id}) keyed by batch_key"""
+    responses = {}
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'path': entry}
+        status, body = dispatch_view(entry['path'], entry.get('method', 'GET').upper(), entry.get('body'))
+        responses[batch_key(entry)] = {'status': status, 'body': body}
+    return responses
+
+@app.route('/api/bootstrap')
+def api_bootstrap():
+    """Every view the dashboard renders on load, computed in one request"""
+    return jsonify({'responses': run_batch(BOOTSTRAP_VIEWS)})
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """Run several API requests in one round trip"""
+    data = request.get_json(silent=True) or {}
+    entries = data.get('requests')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'success': False, 'message': 'requests must be a non-empty list'}), 400
+    if len(entries) > MAX_BATCH_REQUESTS:
+        return jsonify({'success': False, 'message': f'At most {MAX_BATCH_REQUESTS} requests per batch'}), 400
+    for entry in entries:
+        if not isinstance(entry, str) and not (isinstance(entry, dict) and isinstance(entry.get('path'), str)):
+            return jsonify({'success': False, 'message': 'Each request must be a path or an object with a path'}), 400
+        if isinstance(entry, dict) and entry.get('method', 'GET').upper() not in ('GET', 'POST'):
+            return jsonify({'success': False, 'message': 'Batched requests must be GET or POST'}), 400
+        if isinstance(entry, dict) and not isinstance(entry.get('id', ''), str):
+            return jsonify({'success': False, 'message': 'Request ids must be strings'}), 400
+    # Responses are keyed by id or path, so a repeated key would lose all but the last response
+    keys = [batch_key(entry) for entry in entries]
+    duplicates = sorted({key for key in keys if keys.count(key) > 1})
+    if duplicates:
+        return jsonify({'success': False, 'message': f"Duplicate requests {', '.join(duplicates)}; give repeated paths distinct ids"}), 400
+    return jsonify({'responses': run_batch(entries)})
+
+# ============================================================================
+# PUSH NOTIFICATIONS
+# ============================================================================
+
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events stream of status, demand and catalog changes"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Last-Event-ID must be an integer'}), 400
+    response = Response(stream_with_context(event_broker.stream(last_event_id)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=8051)
@@ -0,0 +1,248 @@
+"""
+Lab Capacity Model - Demand Forecasting
+Per-method seasonal (Holt-Winters) models of daily sample demand, fitted off the request path
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from simulation import pool_context
+
+logger = logging.getLogger(__name__)
+
+# Weekly seasonality: lab demand follows the working week
+SEASON_LENGTH = 7
+# Methods with less history than this get a seasonal-mean model instead
+MIN_HISTORY_DAYS = 2 * SEASON_LENGTH
+
+# Smoothing parameters searched per fit (level, trend, season)
+ALPHAS = np.linspace(0.05, 0.95, 10)
+BETAS = np.array([0.0, 0.01, 0.03, 0.1, 0.2])
+GAMMAS = np.array([0.0, 0.05, 0.1, 0.2, 0.3, 0.5])
+
+
+def fit_holt_winters(y, season=SEASON_LENGTH):
+    """Fit additive Holt-Winters (ETS A,A,A) to a daily series by grid search
+
+    Every (alpha, beta, gamma) in the grid runs through the series at once
+    as a vector, so a fit is one pass over the days rather than one per
+    parameter set. The set with the smallest one-step-ahead squared error
+    wins. Returns the parameters and the final level, trend and seasonal
+    states, seasonal[k] being the effect of day index k modulo season.
+    """
+    alpha, beta, gamma = (grid.ravel() for grid in np.meshgrid(ALPHAS, BETAS, GAMMAS, indexing='ij'))
+    # Usual admissible region: beta <= alpha, gamma <= 1 - alpha
+    valid = (beta <= alpha) & (gamma <= 1 - alpha)
+    alpha, beta, gamma = alpha[valid], beta[valid], gamma[valid]
+
+    first, second = y[:season].mean(), y[season:2 * season].mean()
+    level = np.full(len(alpha), first)
+    trend = np.full(len(alpha), (second - first) / season)
+    seasonal = np.tile(y[:season] - first, (len(alpha), 1))
+    sse = np.zeros(len(alpha))
+    for t, observed in enumerate(y):
+        k = t % season
+        error = observed - (level + trend + seasonal[:, k])
+        sse += error * error
+        level = level + trend + alpha * error
+        trend = trend + beta * error
+        seasonal[:, k] += gamma * error
+
+    best = int(np.argmin(sse))
+    return {
+        'kind': 'holt_winters',
+        'alpha': float(alpha[best]),
+        'beta': float(beta[best]),
+        'gamma': float(gamma[best]),
+        'level': float(level[best]),
+        'trend': float(trend[best]),
+        'seasonal': seasonal[best].tolist(),
+        'rmse': float(np.sqrt(sse[best] / len(y)))
+    }
+
+
+def seasonal_mean_model(method_id, start, y):
+    """Mean per day of the season; cheap enough to serve before the first fit completes"""
+    y = np.asarray(y, dtype=float)
+    seasonal = [float(y[k::SEASON_LENGTH].mean()) if len(y[k::SEASON_LENGTH]) else 0.0 for k in range(SEASON_LENGTH)]
+    return {'kind': 'seasonal_mean', 'level': 0.0, 'trend': 0.0, 'seasonal': seasonal,
+            'method_id': method_id, 'start': start, 'observations': len(y)}
+
+
+def fit_method(method_id, start, y):
+    """Fit one method's daily series starting at start (YYYY-MM-DD); runs in a worker process"""
+    y = np.asarray(y, dtype=float)
+    if len(y) < MIN_HISTORY_DAYS:
+        # Too short to separate trend from season
+        return seasonal_mean_model(method_id, start, y)
+    model = fit_holt_winters(y)
+    model.update(method_id=method_id, start=start, observations=len(y))
+    return model
+
+
+def baseline_models(history):
+    """Seasonal-mean models for every method of a history frame"""
+    start = history.index[0].strftime('%Y-%m-%d') if len(history) else None
+    return {method_id: seasonal_mean_model(method_id, start, history[method_id].to_numpy(dtype=float))
+            for method_id in history.columns}
+
+
+def model_forecast(model, start, days):
+    """Daily forecasts for the days from start, never below zero"""
+    history_start = datetime.strptime(model['start'], '%Y-%m-%d').date()
+    offsets = (start - history_start).days + np.arange(days)
+    # Steps ahead of the last observation
+    ahead = offsets - (model['observations'] - 1)
+    seasonal = np.asarray(model['seasonal'])[offsets % SEASON_LENGTH]
+    return np.maximum(model['level'] + np.maximum(ahead, 1) * model['trend'] + seasonal, 0.0)
+
+
+class ForecastEngine:
+    """Fitted demand models, refitted in the background when the history changes
+
+    fit_async hands the per-method fits to a process pool from a
+    background thread and returns at once; requests keep being served
+    from the current models until the new set is swapped in under the
+    lock, which bumps version and drops the cached predictions. Fitted
+    models are written to path, so a restarted server predicts straight
+    away from the last fit.
+    """
+
+    def __init__(self, path=None, workers=2):
+        self.path = path
+        self.workers = workers
+        self.models = {}
+        self.version = 0
+        self.fitted_at = None
+        self.error = None
+        self.fitted_key = None
+        self.pending = None
+        self.thread = None
+        self.predictions = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+            self.models = saved['models']
+            self.version = saved['version']
+            self.fitted_at = saved.get('fitted_at')
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning('Could not load forecast models from %s: %s', self.path, e)
+
+    def save(self):
+        if not self.path:
+            return
+        # Per process, as every server worker saves its own fits
+        temporary = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'version': self.version, 'fitted_at': self.fitted_at, 'models': self.models}, f)
+        os.replace(temporary, self.path)
+
+    def needs_fit(self, key):
+        with self.lock:
+            return key != self.fitted_key and (self.pending is None or key != self.pending[0])
+
+    def fit_async(self, key, history):
+        """Queue a fit of history (a date x method frame of daily samples); never waits for it"""
+        with self.lock:
+            self.pending = (key, history)
+            if self.thread is not None:
+                # The running fit picks the newest history up when it finishes
+                return
+            self.thread = threading.Thread(target=self._fit_pending, name='forecast-fit', daemon=True)
+            self.thread.start()
+
+    def _fit_pending(self):
+        while True:
+            with self.lock:
+                if self.pending is None:
+                    self.thread = None
+                    return
+                key, history = self.pending
+            try:
+                models = self.fit(history)
+            except Exception as e:
+                logger.exception('Forecast fit failed')
+                with self.lock:
+                    self.error = str(e) or type(e).__name__
+                    # Not retried until the history changes; the previous models stay in service
+                    self.fitted_key = key
+                    if self.pending[0] == key:
+                        self.pending = None
+                continue
+            with self.lock:
+                self.models = models
+                self.version += 1
+                self.fitted_at = datetime.now().isoformat(timespec='seconds')
+                self.fitted_key = key
+                self.error = None
+                self.predictions = {}
+                if self.pending[0] == key:
+                    self.pending = None
+                try:
+                    self.save()
+                except OSError as e:
+                    logger.warning('Could not save forecast models to %s: %s', self.path, e)
+
+    def fit(self, history):
+        start = history.index[0].strftime('%Y-%m-%d') if len(history) else None
+        tasks = [(method_id, start, history[method_id].to_numpy(dtype=float)) for method_id in history.columns]
+        if self.workers <= 1 or len(tasks) <= 1:
+            return {task[0]: fit_method(*task) for task in tasks}
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)),
+                                 mp_context=pool_context()) as pool:
+            futures = {task[0]: pool.submit(fit_method, *task) for task in tasks}
+            return {method_id: future.result() for method_id, future in futures.items()}
+
+    def predict(self, start, days, baseline=None):
+        """(methods, days x methods array of forecast samples), cached per model version
+
+        Until the first fit lands, predictions come from baseline(), a
+        callable returning stand-in models, rather than waiting.
+        """
+        with self.lock:
+            key = (self.version, start, days)
+            if key not in self.predictions:
+                models = self.models or (baseline() if baseline else {})
+                methods = list(models)
+                counts = np.column_stack([model_forecast(models[method_id], start, days) for method_id in methods]) \
+                    if methods else np.zeros((days, 0))
+                self.predictions[key] = (methods, counts)
+            return self.predictions[key]
+
+    def status(self):
+        with self.lock:
+            return {
+                'version': self.version,
+                'fitted_at': self.fitted_at,
+                'fitting': self.thread is not None,
+                'error': self.error,
+                'models': {
+                    method_id: {field: model.get(field) for field in
+                                ('kind', 'alpha', 'beta', 'gamma', 'rmse', 'observations', 'start')}
+                    for method_id, model in self.models.items()
+                }
+            }
+
+
+def daily_history(frame, end, days):
+    """Daily samples per method over the days before end, from a (date, method, sample_count) frame"""
+    dates = pd.date_range(end=pd.Timestamp(end) - timedelta(days=1), periods=days, freq='D')
+    if frame.empty:
+        return pd.DataFrame(index=dates)
+    frame = frame.assign(date=pd.to_datetime(frame['date'].astype(str), errors='coerce'),
+                         method=frame['method'].astype(str))
+    totals = frame.groupby(['date', 'method'])['sample_count'].sum().unstack(fill_value=0)
+    return totals.reindex(dates, fill_value=0)
@@ -0,0 +1,39 @@
+"""
+Lab Capacity Model - Production Server
+gunicorn settings for the Flask API: one worker process per CPU, all sharing the database store
+
+    gunicorn -c gunicorn.conf.py
+"""
+
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Workers only see each other's changes through the database store
+os.environ['STORE_BACKEND'] = 'database'
+if not os.getenv('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///lab_capacity.db'
+os.environ['PREFORK_SERVER'] = 'True'
+
+from config import Config
+
+wsgi_app = 'flask_app:app'
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS or multiprocessing.cpu_count()
+# Threaded workers, so open /api/events streams do not each hold a whole process
+worker_class = 'gthread'
+threads = Config.WEB_THREADS
+# The app is imported once in the master, which creates and seeds the tables
+# before any worker starts, and the workers share its memory copy-on-write
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Connections opened by the master must not be shared with the children
+    from database import engine
+    engine.dispose(close=False)
+
+    import flask_app
+    flask_app.start_background_threads()
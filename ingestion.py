@@ -0,0 +1,224 @@
+"""
+Lab Capacity Model - ELN/LIMS Ingestion
+Background asyncio worker that polls the ELN/LIMS status feeds into an in-memory status store
+"""
+
+import asyncio
+from datetime import datetime
+import logging
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Instrument and personnel fields kept from the ELN payload, with their types
+INSTRUMENT_FIELDS = {
+    'instrument_id': str, 'instrument_name': str, 'type': str, 'location': str, 'status': str,
+    'current_sample_batch': str, 'current_method': str, 'operator': str,
+    'started_at': datetime, 'estimated_completion': datetime, 'maintenance_until': datetime,
+    'next_available': datetime, 'samples_remaining': int, 'total_samples_in_batch': int,
+    'queue_position': int, 'queued_batches': list
+}
+PERSONNEL_FIELDS = {
+    'person_id': str, 'name': str, 'role': str, 'status': str, 'current_activity': str,
+    'available_from': datetime, 'shift_end': datetime, 'qualified_methods': list, 'overtime_approved': bool
+}
+
+# ELN status vocabulary -> the statuses the dashboard understands
+INSTRUMENT_STATUS_ALIASES = {
+    'idle': 'available', 'ready': 'available', 'in_use': 'running', 'busy': 'running',
+    'down': 'maintenance', 'out_of_service': 'maintenance', 'waiting': 'queued'
+}
+PERSONNEL_STATUS_ALIASES = {
+    'free': 'available', 'engaged': 'busy', 'leave': 'on_leave', 'absent': 'on_leave'
+}
+
+# Feed name -> (ELN path, id field, fields, status aliases)
+FEEDS = {
+    'instruments': ('/api/v1/instruments/status', 'instrument_id', INSTRUMENT_FIELDS, INSTRUMENT_STATUS_ALIASES),
+    'personnel': ('/api/v1/personnel/availability', 'person_id', PERSONNEL_FIELDS, PERSONNEL_STATUS_ALIASES)
+}
+
+# HTTP statuses worth retrying; other 4xx mean the request itself is wrong
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _coerce(value, kind):
+    if value is None or kind is list:
+        return value
+    if kind is datetime:
+        try:
+            return datetime.fromisoformat(str(value).replace('Z', '+00:00')).isoformat(timespec='seconds')
+        except ValueError:
+            return None
+    return kind(value)
+
+
+def normalize_record(raw, id_field, fields, aliases):
+    """Map one ELN record onto the status store shape; returns None if it cannot be used"""
+    if not isinstance(raw, dict) or not raw.get(id_field):
+        return None
+    record = {}
+    for field, kind in fields.items():
+        if field in raw:
+            try:
+                record[field] = _coerce(raw[field], kind)
+            except (TypeError, ValueError):
+                record[field] = None
+    status = str(record.get('status') or 'unknown').strip().lower().replace(' ', '_')
+    record['status'] = aliases.get(status, status)
+    return record
+
+
+def normalize_feed(name, payload):
+    """Normalize an ELN feed response, accepting a bare list or an {'items': [...]} envelope"""
+    _, id_field, fields, aliases = FEEDS[name]
+    items = payload.get('items', []) if isinstance(payload, dict) else payload
+    records = [normalize_record(item, id_field, fields, aliases) for item in items or []]
+    return [record for record in records if record is not None]
+
+
+class StatusStore:
+    """Latest ELN records per feed, keyed by id
+
+    The ingestion worker swaps a whole feed in at once under the lock, so
+    request threads only ever copy a consistent snapshot and never wait on
+    the network. on_change(feed, changed, removed) is called with the delta
+    after each swap that altered something.
+    """
+
+    def __init__(self, on_change=None):
+        self.on_change = on_change
+        self.records = {name: {} for name in FEEDS}
+        self.refreshed_at = dict.fromkeys(FEEDS)
+        self.errors = dict.fromkeys(FEEDS)
+        self.lock = threading.Lock()
+
+    def replace(self, name, records, notify=True):
+        id_field = FEEDS[name][1]
+        new = {record[id_field]: record for record in records}
+        with self.lock:
+            old = self.records[name]
+            changed = [record for record_id, record in new.items() if old.get(record_id) != record]
+            removed = [record_id for record_id in old if record_id not in new]
+            self.records[name] = new
+            self.refreshed_at[name] = datetime.now().isoformat(timespec='seconds')
+            self.errors[name] = None
+        if notify and self.on_change and (changed or removed):
+            self.on_change(name, changed, removed)
+        return changed, removed
+
+    def restore(self, name, records, refreshed_at, error):
+        """Take a feed as another process last ingested it; notifies like replace"""
+        changed, removed = self.replace(name, records)
+        with self.lock:
+            self.refreshed_at[name] = refreshed_at
+            self.errors[name] = error
+        return changed, removed
+
+    def record_error(self, name, message):
+        with self.lock:
+            self.errors[name] = message
+
+    def snapshot(self, name):
+        with self.lock:
+            return list(self.records[name].values())
+
+    def health(self):
+        with self.lock:
+            return {name: {'refreshed_at': self.refreshed_at[name], 'error': self.errors[name],
+                           'records': len(self.records[name])} for name in FEEDS}
+
+
+class IngestionWorker:
+    """Poll every ELN feed concurrently on its own event loop thread
+
+    One aiohttp session (and so one keep-alive connection pool) is shared by
+    all feeds for the life of the worker. Each request has a timeout and is
+    retried with jittered exponential backoff on network errors and
+    retryable statuses; when a whole poll fails the interval backs off too,
+    up to max_interval, and the store keeps serving the last good data.
+    """
+
+    def __init__(self, base_url, store, interval=15, timeout=5, max_connections=10,
+                 retries=3, backoff=0.5, max_interval=300, token=None):
+        self.base_url = base_url.rstrip('/')
+        self.store = store
+        self.interval = interval
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.token = token
+        self.failures = 0
+        self.loop = None
+        self.stopping = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(),), name='eln-ingestion', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def next_delay(self):
+        if not self.failures:
+            return self.interval
+        return min(self.max_interval, self.interval * 2 ** self.failures)
+
+    async def run(self):
+        import aiohttp
+
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else None
+        connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector, headers=headers,
+                                         timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            while not self.stopping.is_set():
+                ok = await self.poll_once(session)
+                self.failures = 0 if ok else self.failures + 1
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), self.next_delay())
+                except asyncio.TimeoutError:
+                    pass
+
+    async def poll_once(self, session):
+        """Fetch all feeds concurrently; returns True if every feed refreshed"""
+        results = await asyncio.gather(*(self.ingest(session, name) for name in FEEDS))
+        return all(results)
+
+    async def ingest(self, session, name):
+        try:
+            payload = await self.fetch(session, FEEDS[name][0])
+            self.store.replace(name, normalize_feed(name, payload))
+            return True
+        except Exception as e:
+            logger.warning('ELN feed %s failed: %s', name, e)
+            self.store.record_error(name, str(e) or type(e).__name__)
+            return False
+
+    async def fetch(self, session, path):
+        import aiohttp
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.get(self.base_url + path) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.retries:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history, status=response.status)
+                    response.raise_for_status()
+                    return await response.json()
+            except aiohttp.ClientResponseError as e:
+                if e.status not in RETRY_STATUSES or attempt == self.retries:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.0))
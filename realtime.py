@@ -0,0 +1,282 @@
+"""
+Lab Capacity Model - Real-time Capacity
+Per-category availability derived from the live ELN instrument and personnel feeds
+"""
+
+from datetime import datetime, timedelta
+import re
+import threading
+
+EPOCH = datetime(1970, 1, 1)
+
+# Admin statuses that take an instrument out of service whatever the ELN reports
+BLOCKED_STATUSES = ('maintenance', 'inactive', 'repair')
+
+
+def parse_time(value):
+    """ISO timestamp -> naive local datetime, or None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def to_seconds(moment):
+    return (moment - EPOCH).total_seconds()
+
+
+def from_seconds(seconds):
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def category_key(category):
+    """Compare categories loosely: 'LC-MS', 'lcms' and 'LC MS' are the same team"""
+    return re.sub(r'[^a-z0-9]', '', str(category).lower())
+
+
+class IndexedHeap:
+    """Binary min-heap of key -> priority with O(log n) update and removal by key
+
+    position maps each key to its slot so a changed next-free time is
+    sifted in place rather than pushed as a duplicate. total is the running
+    sum of priorities, used to average waits without walking the heap.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.position = {}
+        self.total = 0.0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, key):
+        return key in self.position
+
+    def peek(self):
+        return self.heap[0][0] if self.heap else None
+
+    def set(self, key, priority):
+        index = self.position.get(key)
+        if index is None:
+            self.heap.append([priority, key])
+            self.position[key] = len(self.heap) - 1
+            self.total += priority
+            self._sift_up(len(self.heap) - 1)
+            return
+        old = self.heap[index][0]
+        self.heap[index][0] = priority
+        self.total += priority - old
+        if priority < old:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
+
+    def remove(self, key):
+        index = self.position.pop(key, None)
+        if index is None:
+            return
+        priority = self.heap[index][0]
+        self.total -= priority
+        last = self.heap.pop()
+        if index < len(self.heap):
+            self.heap[index] = last
+            self.position[last[1]] = index
+            self._sift_up(index)
+            self._sift_down(self.position[last[1]])
+
+    def at_most(self, limit):
+        """Priorities <= limit, visiting only those entries and their direct children"""
+        stack = [0] if self.heap and self.heap[0][0] <= limit else []
+        while stack:
+            index = stack.pop()
+            yield self.heap[index][0]
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(self.heap) and self.heap[child][0] <= limit:
+                    stack.append(child)
+
+    def _swap(self, i, j):
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.position[self.heap[i][1]] = i
+        self.position[self.heap[j][1]] = j
+
+    def _sift_up(self, index):
+        while index:
+            parent = (index - 1) // 2
+            if self.heap[parent][0] <= self.heap[index][0]:
+                break
+            self._swap(index, parent)
+            index = parent
+
+    def _sift_down(self, index):
+        size = len(self.heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and self.heap[child][0] < self.heap[smallest][0]:
+                    smallest = child
+            if smallest == index:
+                return
+            self._swap(index, smallest)
+            index = smallest
+
+
+def instrument_free_time(record):
+    """When an ELN instrument record says the instrument can take its next batch"""
+    for field in ('next_available', 'maintenance_until', 'estimated_completion'):
+        moment = parse_time(record.get(field))
+        if moment is not None:
+            return moment
+    # Idle with no timestamp: free since forever
+    return EPOCH if record.get('status') == 'available' else None
+
+
+class RealtimeCapacity:
+    """Per-category capacity kept current from ELN status deltas
+
+    Each category holds an IndexedHeap of instrument next-free times and
+    one of qualified-operator free times, so a status change costs
+    O(log n) and the earliest slot is a peek. Operators are matched to
+    categories through their qualified methods; a category no operator
+    in the feed qualifies for is treated as staffed.
+    """
+
+    def __init__(self, method_category=None):
+        self.method_category = method_category
+        self.categories = {}
+        self.instrument_heaps = {}
+        self.operator_heaps = {}
+        self.instruments = {}
+        self.operators = {}
+        self.totals = {}
+        self.queued = {}
+        self.blocked = set()
+        self.lock = threading.Lock()
+
+    # Feed updates
+
+    def load(self, instruments, personnel):
+        with self.lock:
+            for instrument_id in list(self.instruments):
+                self._remove_instrument(instrument_id)
+            for person_id in list(self.operators):
+                self._remove_operator(person_id)
+        self.apply('instruments', instruments, [])
+        self.apply('personnel', personnel, [])
+
+    def apply(self, feed, changed, removed):
+        """Apply one StatusStore delta"""
+        with self.lock:
+            if feed == 'instruments':
+                for instrument_id in removed:
+                    self._remove_instrument(instrument_id)
+                for record in changed:
+                    self._update_instrument(record)
+            elif feed == 'personnel':
+                for person_id in removed:
+                    self._remove_operator(person_id)
+                for record in changed:
+                    self._update_operator(record)
+
+    def set_blocked(self, instrument_ids):
+        """Replace the set of instruments the admin console has taken out of service"""
+        with self.lock:
+            instrument_ids = set(instrument_ids)
+            toggled = self.blocked ^ instrument_ids
+            self.blocked = instrument_ids
+            for instrument_id in toggled:
+                if instrument_id in self.instruments:
+                    self._place_instrument(instrument_id)
+
+    def _update_instrument(self, record):
+        instrument_id = record['instrument_id']
+        self._remove_instrument(instrument_id)
+        key = category_key(record.get('type') or 'unknown')
+        self.categories.setdefault(key, record.get('type') or 'unknown')
+        queued = max(record.get('queue_position') or 0, len(record.get('queued_batches') or []))
+        free = instrument_free_time(record)
+        self.instruments[instrument_id] = (key, None if free is None else to_seconds(free), queued)
+        self.totals[key] = self.totals.get(key, 0) + 1
+        self.queued[key] = self.queued.get(key, 0) + queued
+        self._place_instrument(instrument_id)
+
+    def _place_instrument(self, instrument_id):
+        key, free, _ = self.instruments[instrument_id]
+        heap = self.instrument_heaps.setdefault(key, IndexedHeap())
+        if free is None or instrument_id in self.blocked:
+            heap.remove(instrument_id)
+        else:
+            heap.set(instrument_id, free)
+
+    def _remove_instrument(self, instrument_id):
+        entry = self.instruments.pop(instrument_id, None)
+        if entry is None:
+            return
+        key, _, queued = entry
+        self.instrument_heaps[key].remove(instrument_id)
+        self.totals[key] -= 1
+        self.queued[key] -= queued
+
+    def _operator_categories(self, record):
+        keys = set()
+        for method_id in record.get('qualified_methods') or []:
+            category = self.method_category(method_id) if self.method_category else None
+            # ELN method slugs lead with the technique, e.g. 'lcms-impurity'
+            keys.add(category_key(category or str(method_id).split('-')[0]))
+        return keys
+
+    def _update_operator(self, record):
+        person_id = record['person_id']
+        self._remove_operator(person_id)
+        free = parse_time(record.get('available_from'))
+        if free is None and record.get('status') != 'available':
+            return
+        free = to_seconds(free or EPOCH)
+        keys = self._operator_categories(record)
+        for key in keys:
+            self.operator_heaps.setdefault(key, IndexedHeap()).set(person_id, free)
+        self.operators[person_id] = keys
+
+    def _remove_operator(self, person_id):
+        for key in self.operators.pop(person_id, ()):
+            self.operator_heaps[key].remove(person_id)
+
+    # Queries
+
+    def category_capacity(self, key, now):
+        now_s = to_seconds(now)
+        end_of_day = to_seconds(datetime.combine(now.date(), datetime.max.time()))
+        instruments = self.instrument_heaps.get(key) or IndexedHeap()
+        operators = self.operator_heaps.get(key)
+        operator_free = operators.peek() if operators else None
+        # A run can start once both an instrument and an operator are free
+        start = max(now_s, operator_free if operator_free is not None else now_s)
+        earliest = instruments.peek()
+
+        ready = list(instruments.at_most(start))
+        scheduled = len(instruments)
+        # Wait per instrument is max(free, start) - now, summed without a full walk
+        waiting_sum = instruments.total - sum(ready) - (scheduled - len(ready)) * start
+        total_wait = waiting_sum + scheduled * (start - now_s)
+
+        return {
+            'total_instruments': self.totals.get(key, 0),
+            'available_now': sum(1 for _ in instruments.at_most(now_s)),
+            'available_today': sum(1 for _ in instruments.at_most(end_of_day)),
+            'operators_available_now': sum(1 for _ in operators.at_most(now_s)) if operators else 0,
+            'earliest_slot': from_seconds(max(start, earliest)).isoformat(timespec='seconds') if earliest is not None else None,
+            'queue_depth': self.queued.get(key, 0),
+            'avg_wait_time_hours': round(total_wait / scheduled / 3600, 1) if scheduled else None
+        }
+
+    def snapshot(self, now=None):
+        """Capacity for every category with instruments, keyed by the ELN category name"""
+        now = now or datetime.now()
+        with self.lock:
+            return {self.categories[key]: self.category_capacity(key, now)
+                    for key, total in self.totals.items() if total}
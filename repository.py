@@ -0,0 +1,394 @@
+"""
+Lab Capacity Model - Catalog Repository
+Persists the catalog and sample demand to the SQLAlchemy models in database.py
+"""
+
+from datetime import datetime
+import json
+
+from sqlalchemy import select, insert, update, delete, func
+
+from catalog import Catalog
+from config import Config
+from database import (
+    Base, engine, SessionLocal, Instrument, Method, MethodInstrumentCompatibility,
+    OperatorSkill, DemandItem, StoreVersion, FeedSnapshot, ScenarioDefinition, upgrade_schema
+)
+from scenarios import UnknownScenario
+
+# store_version row counting the changes to each kind of shared state
+VERSION_ROWS = {'catalog': 1, 'status': 2, 'scenarios': 3}
+
+# Instrument record fields stored one-to-one on the instruments table
+INSTRUMENT_FIELDS = [
+    'location', 'status', 'max_batch_size', 'avg_batch_size', 'run_time_per_sample_min',
+    'failure_rate_percent', 'setup_time_hours', 'cleanup_time_hours', 'throughput_samples_per_day',
+    'efficiency_factor', 'maintenance_schedule', 'last_calibration', 'next_calibration'
+]
+
+SKILL_FIELDS = [
+    'operator_id', 'operator_name', 'method_id', 'method_name', 'proficiency_level',
+    'certification_date', 'last_training', 'can_train_others', 'max_batch_size'
+]
+
+
+def _parse_datetime(value):
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def method_row(method, profile=None, is_base=False):
+    return {
+        'method_id': method['id'],
+        'name': method['name'],
+        'description': method['description'],
+        'category': method['category'],
+        'lead_time_days': method['lead_time_days'],
+        'is_active': bool(method['is_active']),
+        'is_base': is_base,
+        'profile': json.dumps(profile) if profile is not None else None
+    }
+
+
+def instrument_row(instrument):
+    row = {
+        'asset_tag': instrument['id'],
+        'name': instrument['name'],
+        'instrument_type': instrument['category']
+    }
+    for field in INSTRUMENT_FIELDS:
+        row[field] = instrument.get(field)
+    return row
+
+
+def skill_row(skill):
+    return {field: skill[field] for field in SKILL_FIELDS}
+
+
+def demand_row(item):
+    return {
+        'demand_id': item['id'],
+        'start_date': _parse_datetime(item['date']),
+        'method_id': item['method'],
+        'method_name': item['method_name'],
+        'sample_count': item['sample_count'],
+        'priority': item['priority'],
+        'status': item['status'],
+        'client': item['client'],
+        'project': item['project'],
+        'requirements': item['requirements'],
+        'assay_breakdown': json.dumps(item['assay_breakdown']),
+        'created_at': _parse_datetime(item['created_at'])
+    }
+
+
+class CatalogRepository:
+    """Database-backed store for the catalog
+
+    Every write runs in one transaction that also bumps its store_version
+    row (VERSION_ROWS), so workers sharing the database can tell with one
+    cheap query whether their in-memory catalog, ELN feeds or scenarios
+    are stale. Write transactions take the database's write lock when they
+    begin, so concurrent writers from several workers queue rather than
+    interleave. Bulk writes use executemany inserts flushed in chunks of
+    DB_BATCH_SIZE rows.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size=None):
+        self.Session = session_factory
+        self.batch_size = batch_size or Config.DB_BATCH_SIZE
+
+    def create_schema(self):
+        # Under the write lock, so workers starting together do not race to create the tables
+        Base.metadata.create_all(bind=engine.execution_options(write=True))
+        upgrade_schema(engine.execution_options(write=True))
+
+    def _bulk_insert(self, session, model, rows):
+        for chunk in _chunks(rows, self.batch_size):
+            session.execute(insert(model), chunk)
+            session.flush()
+
+    def _begin_write(self, session):
+        # Takes the write lock now (BEGIN IMMEDIATE on SQLite) rather than at the first write
+        session.connection(execution_options={'write': True})
+
+    def _bump_version(self, session, counter='catalog'):
+        row = VERSION_ROWS[counter]
+        result = session.execute(update(StoreVersion).where(StoreVersion.id == row).values(version=StoreVersion.version + 1))
+        if result.rowcount == 0:
+            session.execute(insert(StoreVersion), [{'id': row, 'version': 1}])
+        return session.scalar(select(StoreVersion.version).where(StoreVersion.id == row))
+
+    def _write(self, operation, *args, counter='catalog'):
+        """Run a write and the version bump in one transaction; returns the new version"""
+        with self.Session() as session:
+            with session.begin():
+                self._begin_write(session)
+                operation(session, *args)
+                return self._bump_version(session, counter)
+
+    def data_version(self):
+        with self.Session() as session:
+            return session.scalar(select(StoreVersion.version).where(StoreVersion.id == VERSION_ROWS['catalog']))
+
+    def versions(self):
+        """Current version of each kind of shared state, None for ones never written"""
+        with self.Session() as session:
+            rows = dict(session.execute(select(StoreVersion.id, StoreVersion.version)).all())
+        return {counter: rows.get(row) for counter, row in VERSION_ROWS.items()}
+
+    # Seeding and loading
+
+    def seed(self, catalog):
+        """Populate empty tables from an in-memory catalog; returns True if rows were written"""
+        with self.Session() as session:
+            with session.begin():
+                # Workers seeding at the same time queue here; only the first finds the tables empty
+                self._begin_write(session)
+                if session.scalar(select(func.count()).select_from(StoreVersion).where(
+                        StoreVersion.id == VERSION_ROWS['catalog'])):
+                    return False
+                self._bulk_insert(session, Method, [
+                    method_row(method, catalog.method_profiles.get(method_id), catalog.is_base_method(method_id))
+                    for method_id, method in catalog.methods.items()
+                ])
+                self._bulk_insert(session, Instrument, [
+                    instrument_row(instrument) for instrument in catalog.instruments.values()
+                ])
+                self._bulk_insert(session, MethodInstrumentCompatibility, [
+                    {'method_id': method_id, 'instrument_id': instrument_id, 'is_compatible': is_compatible}
+                    for (method_id, instrument_id), is_compatible in catalog.matrix.items()
+                ])
+                self._bulk_insert(session, OperatorSkill, [skill_row(skill) for skill in catalog.skills.values()])
+                self._bulk_insert(session, DemandItem, [demand_row(item) for item in catalog.demand.values()])
+                session.execute(insert(StoreVersion), [{'id': VERSION_ROWS['catalog'], 'version': 1}])
+                return True
+
+    def load_catalog(self):
+        """Build a fresh Catalog from the tables; returns (catalog, version)"""
+        base_methods, custom_methods, profiles = [], [], []
+        with self.Session() as session:
+            version = session.scalar(select(StoreVersion.version).where(StoreVersion.id == 1))
+            method_rows = session.execute(select(
+                Method.method_id, Method.name, Method.description, Method.category,
+                Method.lead_time_days, Method.is_active, Method.is_base, Method.profile
+            ).order_by(Method.id))
+            for method_id, name, description, category, lead_time_days, is_active, is_base, profile in method_rows:
+                method = {
+                    'id': method_id,
+                    'name': name,
+                    'description': description,
+                    'category': category,
+                    'lead_time_days': lead_time_days,
+                    'is_active': is_active
+                }
+                (base_methods if is_base else custom_methods).append(method)
+                if profile:
+                    profiles.append(json.loads(profile))
+
+            instrument_columns = [getattr(Instrument, field) for field in INSTRUMENT_FIELDS]
+            instruments = []
+            # Rows without capacity settings are asset-register entries, not catalog instruments
+            instrument_rows = session.execute(select(
+                Instrument.asset_tag, Instrument.name, Instrument.instrument_type, *instrument_columns
+            ).where(Instrument.max_batch_size.is_not(None)).order_by(Instrument.id))
+            for asset_tag, name, instrument_type, *values in instrument_rows:
+                instrument = {'id': asset_tag, 'name': name, 'category': instrument_type}
+                instrument.update(zip(INSTRUMENT_FIELDS, values))
+                instruments.append(instrument)
+
+            matrix = session.execute(select(
+                MethodInstrumentCompatibility.method_id,
+                MethodInstrumentCompatibility.instrument_id,
+                MethodInstrumentCompatibility.is_compatible
+            ).order_by(MethodInstrumentCompatibility.id)).all()
+
+            skill_columns = [getattr(OperatorSkill, field) for field in SKILL_FIELDS]
+            skills = [dict(zip(SKILL_FIELDS, row))
+                      for row in session.execute(select(*skill_columns).order_by(OperatorSkill.id))]
+
+            demand = []
+            demand_rows = session.execute(select(
+                DemandItem.demand_id, DemandItem.start_date, DemandItem.method_id, DemandItem.method_name,
+                DemandItem.sample_count, DemandItem.priority, DemandItem.status, DemandItem.client,
+                DemandItem.project, DemandItem.requirements, DemandItem.assay_breakdown, DemandItem.created_at
+            ).order_by(DemandItem.id))
+            for (demand_id, start_date, method_id, method_name, sample_count, priority, status, client,
+                 project, requirements, assay_breakdown, created_at) in demand_rows:
+                demand.append({
+                    'id': demand_id,
+                    'date': start_date.strftime('%Y-%m-%d') if start_date else None,
+                    'method': method_id,
+                    'method_name': method_name,
+                    'sample_count': sample_count,
+                    'priority': priority,
+                    'status': status,
+                    'client': client,
+                    'project': project,
+                    'requirements': requirements,
+                    'assay_breakdown': json.loads(assay_breakdown) if assay_breakdown else [],
+                    'created_at': created_at.isoformat() if created_at else None
+                })
+
+        catalog = Catalog()
+        catalog.load(methods=base_methods, method_profiles=profiles, base=True)
+        catalog.load(methods=custom_methods, instruments=instruments, matrix=matrix, skills=skills, demand=demand)
+        return catalog, version
+
+    # Write-through operations
+
+    def add_method(self, method, compatible_instrument_ids, skill):
+        def operation(session):
+            session.execute(insert(Method), [method_row(method)])
+            self._bulk_insert(session, MethodInstrumentCompatibility, [
+                {'method_id': method['id'], 'instrument_id': instrument_id, 'is_compatible': True}
+                for instrument_id in compatible_instrument_ids
+            ])
+            session.execute(insert(OperatorSkill), [skill_row(skill)])
+        return self._write(operation)
+
+    def update_method(self, method, profile=None):
+        def operation(session):
+            values = method_row(method, profile)
+            del values['method_id'], values['is_base']
+            if profile is None:
+                del values['profile']
+            session.execute(update(Method).where(Method.method_id == method['id']).values(**values))
+        return self._write(operation)
+
+    def delete_method(self, method_id):
+        def operation(session):
+            session.execute(delete(DemandItem).where(DemandItem.method_id == method_id))
+            session.execute(delete(MethodInstrumentCompatibility).where(MethodInstrumentCompatibility.method_id == method_id))
+            session.execute(delete(OperatorSkill).where(OperatorSkill.method_id == method_id))
+            session.execute(delete(Method).where(Method.method_id == method_id))
+        return self._write(operation)
+
+    def add_instrument(self, instrument, compatible_method_ids):
+        def operation(session):
+            session.execute(insert(Instrument), [instrument_row(instrument)])
+            self._bulk_insert(session, MethodInstrumentCompatibility, [
+                {'method_id': method_id, 'instrument_id': instrument['id'], 'is_compatible': True}
+                for method_id in compatible_method_ids
+            ])
+        return self._write(operation)
+
+    def update_instrument(self, instrument):
+        def operation(session):
+            values = instrument_row(instrument)
+            del values['asset_tag']
+            session.execute(update(Instrument).where(Instrument.asset_tag == instrument['id']).values(**values))
+        return self._write(operation)
+
+    def set_instrument_status(self, instrument_id, status):
+        def operation(session):
+            session.execute(update(Instrument).where(Instrument.asset_tag == instrument_id).values(status=status))
+        return self._write(operation)
+
+    def set_compatibility(self, method_id, instrument_id, is_compatible):
+        def operation(session):
+            result = session.execute(update(MethodInstrumentCompatibility).where(
+                MethodInstrumentCompatibility.method_id == method_id,
+                MethodInstrumentCompatibility.instrument_id == instrument_id
+            ).values(is_compatible=bool(is_compatible)))
+            if result.rowcount == 0:
+                session.execute(insert(MethodInstrumentCompatibility), [{
+                    'method_id': method_id, 'instrument_id': instrument_id, 'is_compatible': bool(is_compatible)
+                }])
+        return self._write(operation)
+
+    def add_demand(self, item):
+        def operation(session):
+            session.execute(insert(DemandItem), [demand_row(item)])
+        return self._write(operation)
+
+    # ELN feeds
+
+    def save_feed(self, name, records, refreshed_at):
+        def operation(session):
+            values = {'records': json.dumps(records), 'refreshed_at': refreshed_at, 'error': None}
+            result = session.execute(update(FeedSnapshot).where(FeedSnapshot.feed == name).values(**values))
+            if result.rowcount == 0:
+                session.execute(insert(FeedSnapshot), [dict(values, feed=name)])
+        return self._write(operation, counter='status')
+
+    def save_feed_error(self, name, message):
+        def operation(session):
+            result = session.execute(update(FeedSnapshot).where(FeedSnapshot.feed == name).values(error=message))
+            if result.rowcount == 0:
+                session.execute(insert(FeedSnapshot), [{'feed': name, 'records': '[]', 'error': message}])
+        return self._write(operation, counter='status')
+
+    def load_feeds(self):
+        """Feed name -> (records, refreshed_at, error)"""
+        with self.Session() as session:
+            rows = session.execute(select(
+                FeedSnapshot.feed, FeedSnapshot.records, FeedSnapshot.refreshed_at, FeedSnapshot.error
+            )).all()
+        return {feed: (json.loads(records or '[]'), refreshed_at, error)
+                for feed, records, refreshed_at, error in rows}
+
+    # Scenarios
+
+    def create_scenario(self, name, description, created_at, changes):
+        def operation(session):
+            if session.scalar(select(ScenarioDefinition.id).where(ScenarioDefinition.name == name)) is not None:
+                raise ValueError(f'Scenario {name} already exists')
+            session.execute(insert(ScenarioDefinition), [{
+                'name': name, 'description': description, 'created_at': created_at, 'changes': json.dumps(changes)
+            }])
+        return self._write(operation, counter='scenarios')
+
+    def add_scenario_changes(self, name, changes):
+        """Append changes to a scenario; returns its whole list of changes as saved"""
+        saved = []
+
+        def operation(session):
+            current = session.scalar(select(ScenarioDefinition.changes).where(ScenarioDefinition.name == name))
+            if current is None:
+                raise UnknownScenario(name)
+            # Read under the write lock, so changes other workers appended are kept
+            saved.extend(json.loads(current) + list(changes))
+            session.execute(update(ScenarioDefinition).where(ScenarioDefinition.name == name)
+                            .values(changes=json.dumps(saved)))
+        self._write(operation, counter='scenarios')
+        return saved
+
+    def delete_scenario(self, name):
+        def operation(session):
+            session.execute(delete(ScenarioDefinition).where(ScenarioDefinition.name == name))
+        return self._write(operation, counter='scenarios')
+
+    def load_scenarios(self):
+        with self.Session() as session:
+            rows = session.execute(select(
+                ScenarioDefinition.name, ScenarioDefinition.description,
+                ScenarioDefinition.created_at, ScenarioDefinition.changes
+            ).order_by(ScenarioDefinition.id)).all()
+        return [{'name': name, 'description': description or '', 'created_at': created_at,
+                 'changes': json.loads(changes or '[]')}
+                for name, description, created_at, changes in rows]
+
+
+class FeedPublisher:
+    """Stands in for the StatusStore an ingestion worker fills, saving each feed to the database
+
+    The one worker that polls the ELN writes through this; every worker,
+    that one included, then loads the feeds into its own StatusStore.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    def replace(self, name, records):
+        self.repository.save_feed(name, records, datetime.now().isoformat(timespec='seconds'))
+
+    def record_error(self, name, message):
+        self.repository.save_feed_error(name, message)
@@ -0,0 +1,51 @@
+"""
+Lab Capacity Model - Response Cache
+Serialized JSON responses keyed on the versions of the stores they were built from
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+
+# Distinct (endpoint, query, store versions) entries kept before the oldest is evicted
+DEFAULT_MAX_ENTRIES = 256
+
+
+class ResponseCache:
+    """LRU map of cache key -> (body bytes, ETag)
+
+    Keys include the change counters of every store a view reads, so an
+    admin edit makes the old entries unreachable without any explicit purge;
+    they age out of the LRU. The ETag is a digest of the body, so workers
+    holding the same data hand out the same tag.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body):
+        etag = hashlib.sha1(body).hexdigest()
+        with self.lock:
+            self.entries[key] = (body, etag)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return body, etag
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
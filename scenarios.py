@@ -0,0 +1,264 @@
+"""
+Lab Capacity Model - Scenarios
+Named what-if scenarios kept as copy-on-write overlays of the live catalog and demand
+"""
+
+from datetime import datetime
+import threading
+
+from catalog import STORES
+from domain import CATEGORY_ALIASES
+
+# Scenario change op -> required fields of the change
+OPERATIONS = {
+    'add_instrument': ('instrument',),
+    'update_instrument': ('instrument_id', 'changes'),
+    'set_instrument_status': ('instrument_id', 'status'),
+    'remove_instrument': ('instrument_id',),
+    'update_method': ('method_id', 'changes'),
+    'remove_method': ('method_id',),
+    'set_compatibility': ('method_id', 'instrument_id', 'is_compatible'),
+    'add_skill': ('operator_name', 'method_id'),
+    'remove_skill': ('operator_name', 'method_id'),
+    'add_demand': ('item',),
+    'remove_demand': ('demand_id',)
+}
+
+
+class UnknownScenario(KeyError):
+    """No scenario by that name"""
+
+
+def _add_instrument(catalog, change):
+    """Add an instrument, optionally copying the profile of the instrument named in like"""
+    like = change.get('like')
+    if like is not None and not catalog.has_instrument(like):
+        raise ValueError(f'Unknown instrument {like}')
+    instrument = dict(catalog.get_instrument(like) or {}, status='active', **change['instrument'])
+    if not instrument.get('id') or not instrument.get('category'):
+        raise ValueError('instrument needs an id and a category')
+    if catalog.has_instrument(instrument['id']):
+        raise ValueError(f"Instrument {instrument['id']} already exists")
+    catalog.add_instrument(instrument)
+    # Compatible with every method the category runs, as in the admin console
+    category = instrument['category']
+    for method_category in [category] + [alias for alias, target in CATEGORY_ALIASES.items() if target == category]:
+        for method in catalog.methods_in_category(method_category):
+            catalog.set_compatibility(method['id'], instrument['id'], True)
+
+
+def _operator_id(catalog, operator_name):
+    skills = catalog.skills_for_operator(operator_name)
+    if not skills:
+        raise ValueError(f'Unknown operator {operator_name}')
+    return skills[0]['operator_id']
+
+
+def _add_skill(catalog, change):
+    """Cross-train an existing operator on a method"""
+    method = catalog.get_method(change['method_id'])
+    if method is None:
+        raise ValueError(f"Unknown method {change['method_id']}")
+    catalog.add_skill({
+        'operator_id': _operator_id(catalog, change['operator_name']),
+        'operator_name': change['operator_name'],
+        'method_id': method['id'],
+        'method_name': method['name'],
+        'proficiency_level': change.get('proficiency_level', 'Beginner'),
+        'certification_date': 'N/A',
+        'last_training': 'N/A',
+        'can_train_others': False,
+        'max_batch_size': int(change.get('max_batch_size', 24))
+    })
+
+
+def _add_demand(catalog, change):
+    item = dict({'status': 'pending', 'priority': 'medium'}, **change['item'])
+    for field in ('id', 'method', 'sample_count'):
+        if item.get(field) is None:
+            raise ValueError(f'item needs {field}')
+    method = catalog.get_method(item['method'])
+    if method is None:
+        raise ValueError(f"Unknown method {item['method']}")
+    item.setdefault('method_name', method['name'])
+    catalog.add_demand(item)
+
+
+def apply_change(catalog, change):
+    """Apply one scenario change to a catalog; raises ValueError if it does not apply"""
+    if not isinstance(change, dict) or change.get('op') not in OPERATIONS:
+        raise ValueError(f"Each change needs an op, one of: {', '.join(OPERATIONS)}")
+    op = change['op']
+    missing = [field for field in OPERATIONS[op] if change.get(field) is None]
+    if missing:
+        raise ValueError(f"{op} needs {', '.join(missing)}")
+    try:
+        if op == 'add_instrument':
+            _add_instrument(catalog, change)
+        elif op == 'update_instrument':
+            catalog.update_instrument(change['instrument_id'], change['changes'])
+        elif op == 'set_instrument_status':
+            catalog.set_instrument_status(change['instrument_id'], change['status'])
+        elif op == 'remove_instrument':
+            catalog.remove_instrument(change['instrument_id'])
+        elif op == 'update_method':
+            catalog.update_method(change['method_id'], change['changes'])
+        elif op == 'remove_method':
+            if not catalog.has_method(change['method_id']):
+                raise KeyError(change['method_id'])
+            catalog.remove_method(change['method_id'])
+        elif op == 'set_compatibility':
+            if not catalog.has_method(change['method_id']) or not catalog.has_instrument(change['instrument_id']):
+                raise KeyError(f"{change['method_id']} / {change['instrument_id']}")
+            catalog.set_compatibility(change['method_id'], change['instrument_id'], bool(change['is_compatible']))
+        elif op == 'add_skill':
+            _add_skill(catalog, change)
+        elif op == 'remove_skill':
+            catalog.remove_skill(_operator_id(catalog, change['operator_name']), change['method_id'])
+        elif op == 'add_demand':
+            _add_demand(catalog, change)
+        elif op == 'remove_demand':
+            if not catalog.has_demand(change['demand_id']):
+                raise KeyError(change['demand_id'])
+            catalog.remove_demand(change['demand_id'])
+    except KeyError as e:
+        raise ValueError(f'{op}: unknown id {e.args[0]}')
+    except (TypeError, AttributeError):
+        raise ValueError(f'{op}: malformed change')
+
+
+class Scenario:
+    """A named list of changes and the forked catalog they were last replayed onto"""
+
+    def __init__(self, name, description=''):
+        self.name = name
+        self.description = description
+        self.created_at = datetime.now().isoformat(timespec='seconds')
+        self.changes = []
+        # Changes that no longer apply to the live data, with the reason
+        self.conflicts = []
+        self.catalog = None
+        self.base_key = None
+        # Schedule solved over this scenario's demand, reset with the catalog
+        self.schedule = None
+        # Demand forecast models fitted on this scenario's history, made on first use
+        self.forecast_engine = None
+
+    def summary(self):
+        return {
+            'name': self.name,
+            'description': self.description,
+            'created_at': self.created_at,
+            'changes': len(self.changes),
+            'conflicts': len(self.conflicts)
+        }
+
+
+def replay(base, changes):
+    """Fork base and apply changes; returns (catalog, conflicts)"""
+    catalog = base.fork()
+    conflicts = []
+    for position, change in enumerate(changes):
+        try:
+            apply_change(catalog, change)
+        except ValueError as e:
+            conflicts.append({'change': position, 'message': str(e)})
+    return catalog, conflicts
+
+
+class ScenarioStore:
+    """Named scenarios over the live catalog
+
+    A scenario is a list of changes replayed onto Catalog.fork(), which
+    shares every record and index with the live catalog and copies only
+    what a change writes, so each scenario costs its own edits rather than
+    a catalog. The fork is replayed again whenever the live catalog moves,
+    so a scenario always reads as the current data plus its changes.
+    Scenarios are kept in process memory, and written through to
+    repository when one is given so that other workers can sync() them.
+    """
+
+    def __init__(self, repository=None):
+        self.repository = repository
+        self.scenarios = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        scenario = self.scenarios.get(name)
+        if scenario is None:
+            raise UnknownScenario(name)
+        return scenario
+
+    def records(self):
+        with self.lock:
+            return [scenario.summary() for scenario in self.scenarios.values()]
+
+    def create(self, name, base, description='', changes=()):
+        """Create a scenario; raises ValueError if the name is taken or a change does not apply"""
+        with self.lock:
+            if name in self.scenarios:
+                raise ValueError(f'Scenario {name} already exists')
+            scenario = Scenario(name, description)
+            self._check(scenario, base, changes)
+            if self.repository is not None:
+                self.repository.create_scenario(name, description, scenario.created_at, list(changes))
+            self._set_changes(scenario, base, list(changes))
+            self.scenarios[name] = scenario
+            return scenario
+
+    def add_changes(self, name, base, changes):
+        with self.lock:
+            scenario = self.get(name)
+            self._check(scenario, base, changes)
+            if self.repository is not None:
+                # Changes another worker appended meanwhile come back with ours
+                self._set_changes(scenario, base, self.repository.add_scenario_changes(name, changes))
+            else:
+                self._set_changes(scenario, base, scenario.changes + list(changes))
+            return scenario
+
+    def delete(self, name):
+        with self.lock:
+            self.get(name)
+            if self.repository is not None:
+                self.repository.delete_scenario(name)
+            del self.scenarios[name]
+
+    def sync(self, definitions):
+        """Take the scenarios as saved by every worker, keeping the forks of those that did not change"""
+        with self.lock:
+            scenarios = {}
+            for definition in definitions:
+                scenario = self.scenarios.get(definition['name'])
+                if scenario is None or scenario.changes != definition['changes']:
+                    scenario = Scenario(definition['name'], definition['description'])
+                    scenario.created_at = definition['created_at']
+                    scenario.changes = definition['changes']
+                scenarios[scenario.name] = scenario
+            self.scenarios = scenarios
+
+    def catalog(self, name, base):
+        """The scenario's catalog over base, replayed if base changed since the last call"""
+        with self.lock:
+            scenario = self.get(name)
+            self._refresh(scenario, base)
+            return scenario.catalog
+
+    def _refresh(self, scenario, base):
+        key = base.store_versions(STORES)
+        if scenario.catalog is None or scenario.base_key != key:
+            scenario.catalog, scenario.conflicts = replay(base, scenario.changes)
+            scenario.base_key = key
+            scenario.schedule = None
+
+    def _check(self, scenario, base, changes):
+        # New changes must apply on top of the current fork; nothing is kept if one fails
+        self._refresh(scenario, base)
+        trial, _ = replay(scenario.catalog, ())
+        for change in changes:
+            apply_change(trial, change)
+
+    def _set_changes(self, scenario, base, changes):
+        scenario.changes = changes
+        scenario.catalog = None
+        self._refresh(scenario, base)
@@ -0,0 +1,405 @@
+"""
+Lab Capacity Model - Batch Scheduler
+Assigns sample batches to compatible instruments and qualified operators
+"""
+
+from datetime import datetime, timedelta, date
+
+import numpy as np
+
+from domain import DEFAULT_BATCH_SIZE
+from workcalendar import (
+    WorkCalendar, SHIFT_PATTERNS, parse_date, operator_leave_dates
+)
+
+# Scheduling rules
+PRIORITY_RANK = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+SCHEDULABLE_INSTRUMENT_STATUSES = {'active'}
+UNQUALIFIED_PROFICIENCY = {'pending training'}
+DEFAULT_RUN_TIME_MIN = 10
+BOTTLENECK_UTILIZATION = 85.0
+
+# Days of working calendar ahead of the origin that batches can be placed in
+MAX_CALENDAR_SEARCH_DAYS = 3660
+
+
+class BatchScheduler:
+    """Greedy list scheduler over instrument and operator timelines
+
+    Times are tracked internally as float hours from the horizon origin so the
+    inner loop stays free of datetime arithmetic. Requests are ordered by
+    priority then due date, split into batches of the method batch size and
+    each batch is placed at the earliest start where a compatible active
+    instrument and a qualified operator are both free within a working shift.
+    Instruments run unattended once loaded, so operators are only held for
+    the batch setup time.
+
+    The solved schedule is kept on the instance so it can be repaired in place:
+    new requests are appended to the existing timelines, removed methods free
+    their batches, and an instrument leaving service only moves the batches
+    that were booked on it.
+
+    Methods, matrix entries, instruments and skills are domain records
+    (see domain.py); sample requests are plain dicts.
+    """
+
+    def __init__(self, methods, matrix, instruments, operator_skills,
+                 calendar=None, operator_holidays=None, start=None, operator_shifts=None):
+        self.origin = (start or datetime.now()).replace(second=0, microsecond=0)
+        self.origin_day = datetime.combine(self.origin.date(), datetime.min.time())
+        self.origin_offset = (self.origin - self.origin_day).total_seconds() / 3600.0
+
+        self.methods = {m.id: m for m in methods}
+        self.instruments = {i.id: i for i in instruments}
+        self.instrument_status = {i.id: i.status for i in instruments}
+
+        # Compatible instruments per method, regardless of current status
+        self.method_instruments = {}
+        for entry in matrix:
+            if not entry.is_compatible or entry.instrument_id not in self.instruments:
+                continue
+            instruments_for_method = self.method_instruments.setdefault(entry.method_id, [])
+            if entry.instrument_id not in instruments_for_method:
+                instruments_for_method.append(entry.instrument_id)
+
+        # Qualified operators per method with their batch size limits
+        self.method_operators = {}
+        for skill in operator_skills:
+            if skill.proficiency_level.lower() in UNQUALIFIED_PROFICIENCY:
+                continue
+            self.method_operators.setdefault(skill.method_id, []).append((skill.operator_name, skill.max_batch_size))
+
+        # Working days and shifts from the origin day; each operator gets a copy minus their leave
+        self.calendar = WorkCalendar.from_holiday_calendar(calendar, self.origin_day.date(), MAX_CALENDAR_SEARCH_DAYS)
+        self.leave_dates = operator_leave_dates(operator_holidays)
+        self.operator_shifts = operator_shifts or {}
+        self._operator_calendars = {}
+
+        # Resource timelines
+        self.instrument_free = {instrument_id: self.origin_offset for instrument_id in self.instruments}
+        self.instrument_busy = {instrument_id: 0.0 for instrument_id in self.instruments}
+        self.instrument_batches = {instrument_id: [] for instrument_id in self.instruments}
+        self.operator_free = {}
+        self.operator_busy = {}
+        self.operator_batches = {}
+
+        # Solved state
+        self.requests = {}
+        self.request_batches = {}
+        self.batches = {}
+        self.batch_counters = {}
+        self.unscheduled = {}
+
+    # Calendar helpers
+
+    def _operator_calendar(self, operator):
+        calendar = self._operator_calendars.get(operator)
+        if calendar is None:
+            shift_pattern = self.operator_shifts.get(operator)
+            calendar = self.calendar.for_operator(
+                self.leave_dates.get(operator, ()), shift_pattern if shift_pattern in SHIFT_PATTERNS else None)
+            self._operator_calendars[operator] = calendar
+        return calendar
+
+    def _next_shift_time(self, t, operator):
+        """Earliest time >= t inside the operator's shift on a working day they are in"""
+        return self._operator_calendar(operator).next_working_hour(t)
+
+    def _to_datetime(self, t):
+        return self.origin_day + timedelta(minutes=round(t * 60))
+
+    def _to_hours(self, value):
+        return (value - self.origin_day).total_seconds() / 3600.0
+
+    def _now(self):
+        return max(self.origin_offset, self._to_hours(datetime.now()))
+
+    # Batch construction
+
+    def _batch_size(self, method):
+        return method.batch_size or DEFAULT_BATCH_SIZE
+
+    def _batch_hours(self, method, instrument, samples):
+        run_time = method.run_time_per_sample or instrument.run_time_per_sample_min or DEFAULT_RUN_TIME_MIN
+        efficiency = instrument.efficiency_factor or 1.0
+        setup, cleanup = instrument.setup_time_hours, instrument.cleanup_time_hours
+        return setup, setup + samples * run_time / 60.0 / efficiency + cleanup
+
+    def _due_date(self, sample_request):
+        """required_by_date if given, else start_date plus the method's lead time in working days"""
+        due = parse_date(sample_request.get('required_by_date'))
+        start = parse_date(sample_request.get('start_date'))
+        method = self.methods.get(sample_request.get('method'))
+        if due or start is None or method is None:
+            return due
+        lead_time = int(method.lead_time_days or 0)
+        if start >= self.calendar.start:
+            due = self.calendar.add_working_days(start, lead_time)
+        # Work that started before the calendar (or ends past it) counts weekdays only
+        return due or np.busday_offset(start, lead_time, roll='forward').astype(date)
+
+    def _sort_key(self, sample_request, index=0):
+        due = self._due_date(sample_request) or date.max
+        rank = PRIORITY_RANK.get(str(sample_request.get('priority', 'medium')).lower(), 2)
+        return rank, due, index
+
+    def _active_instruments(self, method_id):
+        return [instrument_id for instrument_id in self.method_instruments.get(method_id, [])
+                if self.instrument_status.get(instrument_id) in SCHEDULABLE_INSTRUMENT_STATUSES]
+
+    def _place_batch(self, method_id, samples, release):
+        """Find the earliest (start, instrument, operator) for one batch"""
+        best = None
+        candidates = sorted(self._active_instruments(method_id), key=self.instrument_free.get)
+        operators = [name for name, max_batch in self.method_operators.get(method_id, [])
+                     if max_batch <= 0 or max_batch >= samples]
+        operators.sort(key=lambda name: self.operator_free.get(name, self.origin_offset))
+
+        for instrument_id in candidates:
+            ready = max(self.instrument_free[instrument_id], release)
+            if best is not None and ready >= best[0]:
+                break
+            for operator in operators:
+                operator_ready = max(ready, self.operator_free.get(operator, self.origin_offset))
+                if best is not None and operator_ready >= best[0]:
+                    break
+                start = self._next_shift_time(operator_ready, operator)
+                if start is not None and (best is None or start < best[0]):
+                    best = (start, instrument_id, operator)
+        return best
+
+    def _book(self, batch_id, request_id, method_id, samples, placement):
+        start, instrument_id, operator = placement
+        operator_hours, batch_hours = self._batch_hours(self.methods[method_id], self.instruments[instrument_id], samples)
+        end = start + batch_hours
+
+        self.instrument_free[instrument_id] = max(self.instrument_free[instrument_id], end)
+        self.instrument_busy[instrument_id] += batch_hours
+        self.instrument_batches[instrument_id].append(batch_id)
+        self.operator_free[operator] = max(self.operator_free.get(operator, self.origin_offset), start + operator_hours)
+        self.operator_busy[operator] = self.operator_busy.get(operator, 0.0) + operator_hours
+        self.operator_batches.setdefault(operator, []).append(batch_id)
+
+        self.batches[batch_id] = {
+            'request_id': request_id,
+            'batch_id': batch_id,
+            'method': method_id,
+            'samples': samples,
+            'instrument': instrument_id,
+            'operator': operator,
+            'start': start,
+            'end': end,
+            'operator_hours': operator_hours
+        }
+        self.request_batches.setdefault(request_id, []).append(batch_id)
+
+    def _unbook(self, batch_id):
+        batch = self.batches.pop(batch_id)
+        instrument_id, operator = batch['instrument'], batch['operator']
+
+        self.instrument_batches[instrument_id].remove(batch_id)
+        self.instrument_busy[instrument_id] -= batch['end'] - batch['start']
+        self.instrument_free[instrument_id] = max(
+            (self.batches[b]['end'] for b in self.instrument_batches[instrument_id]), default=self.origin_offset)
+
+        self.operator_batches[operator].remove(batch_id)
+        self.operator_busy[operator] -= batch['operator_hours']
+        self.operator_free[operator] = max(
+            (self.batches[b]['start'] + self.batches[b]['operator_hours'] for b in self.operator_batches[operator]),
+            default=self.origin_offset)
+
+        self.request_batches[batch['request_id']].remove(batch_id)
+        return batch
+
+    def _mark_unscheduled(self, request_id, method_id, reason):
+        self.unscheduled[request_id] = {'request_id': request_id, 'method': method_id, 'reason': reason}
+
+    def _unplaceable_reason(self, method_id, samples=None):
+        """Why no batch of the method can be placed: no instrument, no operator at all, or none for this size"""
+        if not self._active_instruments(method_id):
+            return 'No compatible active instrument'
+        if not self.method_operators.get(method_id):
+            return 'No qualified operator'
+        if samples is not None:
+            return f'No operator qualified for {samples}-sample batch'
+        return None
+
+    def _schedule_samples(self, request_id, sample_count, release):
+        """Book batches for sample_count samples of a request after release"""
+        sample_request = self.requests[request_id]
+        method_id = sample_request.get('method')
+
+        if method_id not in self.methods:
+            self._mark_unscheduled(request_id, method_id, 'Unknown method')
+            return
+        reason = self._unplaceable_reason(method_id)
+        if reason:
+            self._mark_unscheduled(request_id, method_id, reason)
+            return
+
+        earliest = parse_date(sample_request.get('earliest_start'))
+        if earliest:
+            release = max(release, self._to_hours(datetime.combine(earliest, datetime.min.time())))
+
+        batch_size = self._batch_size(self.methods[method_id])
+        remaining = sample_count
+        while remaining > 0:
+            samples = min(batch_size, remaining)
+            placement = self._place_batch(method_id, samples, release)
+            if placement is None:
+                self._mark_unscheduled(request_id, method_id, self._unplaceable_reason(method_id, samples))
+                return
+            batch_num = self.batch_counters.get(request_id, 0) + 1
+            self.batch_counters[request_id] = batch_num
+            self._book(f'{request_id}-B{batch_num}', request_id, method_id, samples, placement)
+            remaining -= samples
+
+    # Full solve and incremental repair
+
+    def schedule(self, sample_requests):
+        """Schedule every batch of every request and summarize the result"""
+        self.add_requests(sample_requests, release=self.origin_offset)
+        return self.summary()
+
+    def add_requests(self, sample_requests, release=None):
+        """Append new requests to the existing timelines without moving booked batches"""
+        release = self._now() if release is None else release
+        indexed = [(self._sort_key(r, i), r) for i, r in enumerate(sample_requests)]
+        for _, sample_request in sorted(indexed, key=lambda item: item[0]):
+            request_id = sample_request.get('id') or f'REQ-{len(self.requests) + 1}'
+            if request_id in self.requests:
+                self.remove_requests([request_id])
+            self.requests[request_id] = sample_request
+            self._schedule_samples(request_id, int(sample_request.get('sample_count', 0) or 0), release)
+
+    def remove_requests(self, request_ids):
+        """Drop requests and release the time their batches held"""
+        for request_id in request_ids:
+            for batch_id in list(self.request_batches.get(request_id, [])):
+                self._unbook(batch_id)
+            self.request_batches.pop(request_id, None)
+            self.batch_counters.pop(request_id, None)
+            self.requests.pop(request_id, None)
+            self.unscheduled.pop(request_id, None)
+
+    def remove_method(self, method_id):
+        """Drop a deleted method and every request that used it"""
+        self.remove_requests([request_id for request_id, sample_request in self.requests.items()
+                              if sample_request.get('method') == method_id])
+        self.methods.pop(method_id, None)
+        self.method_instruments.pop(method_id, None)
+        self.method_operators.pop(method_id, None)
+
+    def update_instrument_status(self, instrument_id, status):
+        """Apply an instrument status change, moving only the batches it affects"""
+        if instrument_id not in self.instruments:
+            return
+        was_active = self.instrument_status.get(instrument_id) in SCHEDULABLE_INSTRUMENT_STATUSES
+        self.instrument_status[instrument_id] = status
+        is_active = status in SCHEDULABLE_INSTRUMENT_STATUSES
+
+        if was_active and not is_active:
+            # Batches already running stay put; anything not yet started moves
+            now = self._now()
+            displaced = [self.batches[b] for b in self.instrument_batches[instrument_id]
+                         if self.batches[b]['start'] >= now]
+            for batch in displaced:
+                self._unbook(batch['batch_id'])
+            for batch in sorted(displaced, key=lambda b: (self._sort_key(self.requests[b['request_id']]), b['start'])):
+                self._rebook(batch, now)
+        elif is_active and not was_active:
+            # Retry requests that were waiting on an instrument for this method
+            now = self._now()
+            self.instrument_free[instrument_id] = max(self.instrument_free[instrument_id], now)
+            waiting = [request_id for request_id, entry in self.unscheduled.items()
+                       if instrument_id in self.method_instruments.get(entry['method'], [])]
+            for request_id in sorted(waiting, key=lambda r: self._sort_key(self.requests[r])):
+                del self.unscheduled[request_id]
+                booked = sum(self.batches[b]['samples'] for b in self.request_batches.get(request_id, []))
+                remaining = int(self.requests[request_id].get('sample_count', 0) or 0) - booked
+                self._schedule_samples(request_id, remaining, now)
+
+    def _rebook(self, batch, release):
+        placement = self._place_batch(batch['method'], batch['samples'], release)
+        if placement is None:
+            self._mark_unscheduled(batch['request_id'], batch['method'],
+                                   self._unplaceable_reason(batch['method'], batch['samples']))
+            return
+        self._book(batch['batch_id'], batch['request_id'], batch['method'], batch['samples'], placement)
+
+    # Reporting
+
+    def _batch_record(self, batch):
+        sample_request = self.requests[batch['request_id']]
+        due = self._due_date(sample_request)
+        end_time = self._to_datetime(batch['end'])
+        return {
+            'request_id': batch['request_id'],
+            'batch_id': batch['batch_id'],
+            'operator': batch['operator'],
+            'instrument': batch['instrument'],
+            'method': batch['method'],
+            'samples_in_batch': batch['samples'],
+            'start_time': self._to_datetime(batch['start']).isoformat(),
+            'end_time': end_time.isoformat(),
+            'priority': sample_request.get('priority', 'medium'),
+            'status': 'scheduled',
+            'late': bool(due and end_time.date() > due)
+        }
+
+    def _utilization_by_category(self, horizon_end):
+        span = max(horizon_end - self.origin_offset, 1e-9)
+        used = {}
+        for instrument_id, busy in self.instrument_busy.items():
+            if busy <= 0:
+                continue
+            category = self.instruments[instrument_id].category or 'Other'
+            total_busy, count = used.get(category, (0.0, 0))
+            used[category] = (total_busy + busy, count + 1)
+        return {category: round(100.0 * busy / (count * span), 1) for category, (busy, count) in used.items()}
+
+    def summary(self):
+        """Summarize the current schedule in the optimize endpoint's response shape"""
+        optimized_schedule = [self._batch_record(batch) for batch in
+                              sorted(self.batches.values(), key=lambda b: (b['start'], b['batch_id']))]
+        unscheduled = list(self.unscheduled.values())
+
+        used_instruments = [i for i, batches in self.instrument_batches.items() if batches]
+        horizon_end = max((self.instrument_free[i] for i in used_instruments), default=self.origin_offset)
+        span = horizon_end - self.origin_offset
+        busy_hours = sum(self.instrument_busy[i] for i in used_instruments)
+        efficiency = round(100.0 * busy_hours / (len(used_instruments) * span), 1) if span > 0 else 0.0
+
+        category_utilization = self._utilization_by_category(horizon_end)
+        bottlenecks = [f'{category} capacity' for category, util in
+                       sorted(category_utilization.items(), key=lambda item: -item[1])
+                       if util >= BOTTLENECK_UTILIZATION]
+        loaded_operators = {name: busy for name, busy in self.operator_busy.items() if self.operator_batches.get(name)}
+        busiest_operator = max(loaded_operators.items(), key=lambda item: item[1], default=None)
+        if busiest_operator and len(loaded_operators) > 1:
+            bottlenecks.append(f'{busiest_operator[0]} availability')
+
+        recommendations = []
+        for bottleneck in bottlenecks:
+            if bottleneck.endswith('capacity'):
+                recommendations.append(f"Consider overtime or additional instruments for {bottleneck.rsplit(' ', 1)[0]} methods")
+        if busiest_operator and len(loaded_operators) > 1:
+            recommendations.append(f'Cross-train additional personnel to offload {busiest_operator[0]}')
+        for method_id in sorted({item['method'] for item in unscheduled if item['reason'] == 'No qualified operator'}):
+            recommendations.append(f'Train an operator on {method_id}')
+        for method_id in sorted({item['method'] for item in unscheduled
+                                 if item['reason'] == 'No compatible active instrument'}):
+            recommendations.append(f'Return a compatible instrument for {method_id} to service')
+        late_batches = sum(1 for batch in optimized_schedule if batch['late'])
+
+        return {
+            'optimized_schedule': optimized_schedule,
+            'total_batches': len(optimized_schedule),
+            'schedule_efficiency': efficiency,
+            'late_batches': late_batches,
+            'horizon_end': self._to_datetime(horizon_end).isoformat(),
+            'instrument_utilization': category_utilization,
+            'unscheduled': unscheduled,
+            'bottlenecks': bottlenecks,
+            'recommendations': recommendations
+        }
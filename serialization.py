@@ -0,0 +1,189 @@
+"""
+Lab Capacity Model - Serialization
+JSON encoding straight to bytes (orjson when installed) and gzip/brotli response compression
+"""
+
+from collections import OrderedDict
+import gzip
+import json
+import threading
+
+from flask.json.provider import DefaultJSONProvider
+import numpy as np
+import pandas as pd
+
+# Optional accelerators; the stdlib paths below produce the same documents
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as they are
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+# Quality 11 is for static assets; 5 compresses about as well as gzip -9 at gzip -6 speed
+BROTLI_QUALITY = 5
+# Encoded bodies of ETagged responses kept so cache hits are not compressed again
+MAX_ENCODED_ENTRIES = 256
+
+
+def frame_json(frame):
+    """A DataFrame as a JSON list of records, written by pandas without building the dicts"""
+    return frame.to_json(orient='records', date_format='iso', double_precision=15).encode()
+
+
+def _default(obj):
+    """Values neither encoder handles natively"""
+    if isinstance(obj, pd.DataFrame):
+        if orjson is not None and hasattr(orjson, 'Fragment'):
+            return orjson.Fragment(frame_json(obj))
+        return obj.to_dict('records')
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    # Dates, decimals, UUIDs and dataclasses as Flask's own encoder writes them
+    return DefaultJSONProvider.default(obj)
+
+
+def _key(key):
+    """A dict key as the string JSON writes it, so keys of mixed types can be sorted"""
+    if isinstance(key, str):
+        return key
+    return json.dumps(key) if isinstance(key, (bool, int, float)) or key is None else str(key)
+
+
+def _plain(obj):
+    """obj as orjson would read it: string keys, and NaN and infinities as None"""
+    if isinstance(obj, float):
+        return obj if np.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {_key(key): _plain(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(value) for value in obj]
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray, np.generic)):
+        return _plain(_default(obj))
+    return obj
+
+
+def encode(obj, sort_keys=False, indent=False):
+    """Serialize obj to JSON bytes
+
+    A DataFrame at the top level goes straight through pandas' encoder.
+    Otherwise orjson writes the document when it is installed, taking
+    numpy arrays and scalars as they are; dates still go through
+    _default so both paths write them the way jsonify always has.
+    Documents orjson refuses, such as integers past 64 bits, fall back
+    to the stdlib encoder. Where it would write NaN, which is not JSON,
+    or fail to sort keys of mixed types, the document is first put in the
+    form orjson reads it in.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return frame_json(obj)
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except (orjson.JSONEncodeError, TypeError):
+            pass
+    options = {'sort_keys': sort_keys, 'indent': 2 if indent else None,
+               'separators': None if indent else (',', ':'), 'allow_nan': False}
+    try:
+        return json.dumps(obj, default=_default, **options).encode()
+    except (ValueError, TypeError):
+        # Rare enough that a second pass beats checking every float and key up front
+        return json.dumps(_plain(obj), default=_default, **options).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that renders jsonify() output with encode()
+
+    Views keep calling jsonify; they may now hand it a DataFrame or numpy
+    values directly instead of converting them to records first.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return encode(obj, self.sort_keys, kwargs.get('indent') is not None).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(encode(obj, self.sort_keys, indent) + b'\n', mimetype=self.mimetype)
+
+
+def choose_encoding(accept_encodings):
+    """Best content coding the client accepts: br, then gzip, else None"""
+    if brotli is not None and 'br' in accept_encodings:
+        return 'br'
+    if 'gzip' in accept_encodings:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class ResponseCompressor:
+    """Compresses JSON responses for clients that accept it
+
+    Responses with an ETag come from the response cache, so their encoded
+    bodies are kept by (ETag, coding) and a repeat hit costs a dict lookup
+    instead of another compression. Compressed responses carry the ETag as
+    a weak one, since the bytes differ by coding but the document does not.
+    """
+
+    def __init__(self, min_bytes=COMPRESS_MIN_BYTES, max_entries=MAX_ENCODED_ENTRIES):
+        self.min_bytes = min_bytes
+        self.max_entries = max_entries
+        self.encoded = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __call__(self, response, accept_encodings):
+        if (response.status_code != 200 or response.mimetype != 'application/json'
+                or response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(accept_encodings)
+        if encoding is None or (response.content_length or 0) < self.min_bytes:
+            return response
+
+        etag, _ = response.get_etag()
+        body = self._encoded(etag, encoding) if etag else None
+        if body is None:
+            body = compress(response.get_data(), encoding)
+            if etag:
+                self._keep(etag, encoding, body)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _encoded(self, etag, encoding):
+        with self.lock:
+            body = self.encoded.get((etag, encoding))
+            if body is not None:
+                self.encoded.move_to_end((etag, encoding))
+            return body
+
+    def _keep(self, etag, encoding, body):
+        with self.lock:
+            self.encoded[(etag, encoding)] = body
+            while len(self.encoded) > self.max_entries:
+                self.encoded.popitem(last=False)
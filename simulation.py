@@ -0,0 +1,259 @@
+"""
+Lab Capacity Model - Monte Carlo Simulation
+Stochastic replications of the lab for what-if capacity questions, run across a process pool
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from capacity_gap import demand_frame, instrument_frame, method_costs
+
+# Per category, per replication
+METRICS = ('mean_turnaround_days', 'p90_turnaround_days', 'utilization', 'completed', 'backlog')
+PERCENTILES = (5, 50, 95)
+
+# Below this many replications the pool costs more than it saves
+MIN_PARALLEL_REPLICATIONS = 200
+# Replications handed to a worker per task
+CHUNK_REPLICATIONS = 250
+# A batch is given up on after this many failed runs
+MAX_ATTEMPTS = 10
+
+# Pools are made from a threaded server, and a forked child can inherit a
+# lock another thread held mid-update. Workers only need module-level
+# functions and the shared arrays, so they start from a clean forkserver
+# (spawn where there is none) that has imported the numeric modules once
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+FORKSERVER_PRELOAD = ['__main__', 'simulation', 'forecasting']
+
+# Shared arrays of the pool's current run, attached once per worker process
+_worker_block = None
+_worker_arrays = None
+
+
+def pool_context():
+    """Multiprocessing context the worker pools are started from"""
+    context = multiprocessing.get_context(START_METHOD)
+    if START_METHOD == 'forkserver':
+        context.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return context
+
+
+def share_arrays(arrays):
+    """Copy named arrays into one shared memory block; returns (block, layout, views)"""
+    layout, offset = {}, 0
+    for key, array in arrays.items():
+        array = np.asarray(array)
+        offset = -(-offset // 8) * 8
+        layout[key] = (offset, array.shape, array.dtype.str)
+        offset += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    views = _views(block, layout)
+    for key, array in arrays.items():
+        views[key][...] = array
+    return block, layout, views
+
+
+def attach_arrays(name, layout):
+    block = shared_memory.SharedMemory(name=name)
+    return block, _views(block, layout)
+
+
+def _views(block, layout):
+    return {key: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+            for key, (offset, shape, dtype) in layout.items()}
+
+
+def _attach_worker(name, layout):
+    global _worker_block, _worker_arrays
+    _worker_block, _worker_arrays = attach_arrays(name, layout)
+
+
+def _simulate_chunk(first, count, seed, params):
+    simulate_range(_worker_arrays, first, count, seed, params)
+    return count
+
+
+def simulation_inputs(items, methods, instruments, calendar, days, demand_scale=1.0, offline=()):
+    """Arrays describing the lab for run_simulation, plus the category names they index
+
+    items, methods and instruments are domain records (see domain.py).
+    Item arrivals are in operating hours from calendar.start: an item due
+    on a working day arrives at the start of it, one already overdue at 0.
+    """
+    costs = method_costs(methods, instruments)
+    demand = demand_frame(items, costs)
+    frame = instrument_frame(instruments)
+    frame = frame[frame['in_service'] & ~frame['id'].isin(list(offline))]
+    categories = list(dict.fromkeys(list(frame['category']) + list(demand['category'])))
+
+    offsets = ((demand['date'] - pd.Timestamp(calendar.start)).dt.days).fillna(0).to_numpy().astype(np.int64)
+    demand = demand[offsets < days]
+    offsets = np.clip(offsets[offsets < days], 0, days)
+    cost = costs.loc[demand['method']]
+    return categories, {
+        'instrument_category': pd.Categorical(frame['category'], categories=categories).codes.astype(np.int64),
+        'instrument_efficiency': frame['efficiency'].to_numpy(dtype=np.float64),
+        'instrument_overhead': (frame['setup'] + frame['cleanup']).to_numpy(dtype=np.float64),
+        'instrument_failure': np.clip(frame['failure_rate'].to_numpy(dtype=np.float64) / 100.0, 0.0, 0.99),
+        'item_category': pd.Categorical(demand['category'], categories=categories).codes.astype(np.int64),
+        'item_samples': np.maximum(1, np.round(demand['samples'].to_numpy() * demand_scale)).astype(np.int64),
+        'item_batch_size': cost['batch_size'].clip(lower=1).to_numpy(dtype=np.int64),
+        'item_run_hours': cost['run_hours'].to_numpy(dtype=np.float64),
+        'item_working_day': calendar.cumulative[offsets].astype(np.float64)
+    }
+
+
+def simulate_range(arrays, first, count, seed, params):
+    """Run replications first .. first + count - 1 into arrays['results']
+
+    Each replication draws from its own generator seeded by (seed, index),
+    so results do not depend on how the range is split across workers.
+    """
+    for replication in range(first, first + count):
+        rng = np.random.default_rng([seed, replication])
+        arrays['results'][replication] = simulate_replication(arrays, rng, params)
+
+
+def simulate_replication(arrays, rng, params):
+    """One stochastic run of the horizon; returns a (categories, METRICS) matrix
+
+    New demand arrives as a Poisson process, each arrival a copy of a
+    current item. Items split into batches queued first come first served
+    on the earliest-free instrument of their category. Run time per batch
+    is lognormal around the method run time; each run fails with the
+    instrument's failure rate and is repeated until it succeeds.
+    """
+    horizon = params['horizon_hours']
+    operating_hours = params['operating_hours']
+    categories = params['categories']
+
+    base = len(arrays['item_samples'])
+    arrivals = rng.poisson(params['arrivals_per_day'] * params['working_days']) if base else 0
+    source = np.concatenate((np.arange(base), rng.integers(0, base, arrivals))) if base else np.arange(0)
+    arrival = np.concatenate((arrays['item_working_day'] * operating_hours, rng.uniform(0, horizon, arrivals)))
+    item_category = arrays['item_category'][source]
+    samples = arrays['item_samples'][source]
+    batch_size = arrays['item_batch_size'][source]
+
+    batches = -(-samples // batch_size)
+    batch_item = np.repeat(np.arange(len(source)), batches)
+    position = np.arange(len(batch_item)) - np.repeat(np.cumsum(batches) - batches, batches)
+    batch_samples = np.minimum(batch_size[batch_item], samples[batch_item] - position * batch_size[batch_item])
+    sigma = math.sqrt(math.log1p(params['run_time_cv'] ** 2))
+    run_hours = (batch_samples * arrays['item_run_hours'][source][batch_item]
+                 * rng.lognormal(-sigma ** 2 / 2, sigma, len(batch_item)))
+    # In (0, 1] so the geometric draw below never takes log(0)
+    luck = 1.0 - rng.random(len(batch_item))
+
+    order = np.lexsort((batch_item, arrival[batch_item]))
+    efficiency = arrays['instrument_efficiency'].tolist()
+    overhead = arrays['instrument_overhead'].tolist()
+    failure = arrays['instrument_failure'].tolist()
+    free = {}
+    for instrument, category in enumerate(arrays['instrument_category'].tolist()):
+        free.setdefault(category, []).append((0.0, instrument))
+    busy = np.zeros(len(efficiency))
+    batch_end = np.full(len(batch_item), np.inf)
+    batch_arrival = arrival[batch_item].tolist()
+    batch_category = item_category[batch_item].tolist()
+    run_hours = run_hours.tolist()
+    luck = luck.tolist()
+    for batch in order.tolist():
+        heap = free.get(batch_category[batch])
+        if not heap:
+            continue
+        ready, instrument = heap[0]
+        start = max(ready, batch_arrival[batch])
+        p = failure[instrument]
+        attempts = min(MAX_ATTEMPTS, int(math.log(luck[batch]) / math.log(p)) + 1) if p > 0 else 1
+        end = start + (run_hours[batch] / efficiency[instrument] + overhead[instrument]) * attempts
+        heapq.heapreplace(heap, (end, instrument))
+        busy[instrument] += max(0.0, min(end, horizon) - min(start, horizon))
+        batch_end[batch] = end
+
+    item_end = np.full(len(source), -np.inf)
+    np.maximum.at(item_end, batch_item, batch_end)
+    done = item_end <= horizon
+    turnaround = (item_end - np.maximum(arrival, 0.0)) / operating_hours
+
+    result = np.full((categories, len(METRICS)), np.nan)
+    result[:, 3] = np.bincount(item_category[done], minlength=categories)
+    result[:, 4] = np.bincount(item_category[~done], minlength=categories)
+    instruments = np.bincount(arrays['instrument_category'], minlength=categories)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result[:, 2] = np.bincount(arrays['instrument_category'], weights=busy, minlength=categories) / (instruments * horizon)
+    for category in np.unique(item_category[done]):
+        times = turnaround[done & (item_category == category)]
+        result[category, 0] = times.mean()
+        result[category, 1] = np.percentile(times, 90)
+    return result
+
+
+def run_simulation(categories, inputs, params, replications, seed=None, workers=None):
+    """Run replications of the lab and summarize each metric's distribution per category
+
+    Inputs and the results array live in one shared memory block, so
+    workers read the lab and write their rows in place; only chunk
+    bounds cross the process boundary.
+    """
+    if seed is None:
+        # Fresh entropy, kept below 2**63 so the echoed seed can be sent back to rerun
+        seed = int(np.random.SeedSequence().generate_state(1, np.uint64)[0] >> 1)
+    params = dict(params, categories=len(categories))
+    arrays = dict(inputs, results=np.zeros((replications, len(categories), len(METRICS))))
+    workers = min(workers or os.cpu_count() or 1, -(-replications // CHUNK_REPLICATIONS))
+
+    if workers <= 1 or replications < MIN_PARALLEL_REPLICATIONS:
+        simulate_range(arrays, 0, replications, seed, params)
+        results = arrays['results']
+    else:
+        block, layout, views = share_arrays(arrays)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                                     initializer=_attach_worker, initargs=(block.name, layout)) as pool:
+                chunks = [pool.submit(_simulate_chunk, first, min(CHUNK_REPLICATIONS, replications - first), seed, params)
+                          for first in range(0, replications, CHUNK_REPLICATIONS)]
+                for chunk in chunks:
+                    chunk.result()
+            results = views['results'].copy()
+        finally:
+            del views
+            block.close()
+            block.unlink()
+
+    return {'seed': seed, 'replications': replications, 'workers': workers,
+            'categories': summarize_results(categories, results)}
+
+
+def summarize_results(categories, results):
+    """Mean, standard deviation and percentiles over replications of every metric"""
+    summary = {}
+    with warnings.catch_warnings():
+        # Categories that never complete an item have all-NaN turnaround
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(results, axis=0)
+        std = np.nanstd(results, axis=0)
+        percentiles = np.nanpercentile(results, PERCENTILES, axis=0)
+    for row, category in enumerate(categories):
+        summary[category] = {
+            metric: {
+                'mean': _round(mean[row, column]),
+                'std': _round(std[row, column]),
+                **{f'p{level}': _round(percentiles[index, row, column]) for index, level in enumerate(PERCENTILES)}
+            }
+            for column, metric in enumerate(METRICS)
+        }
+    return summary
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 3)
@@ -1,6 +1,52 @@
 // Lab Capacity Model - JavaScript Frontend
 // Handles all UI interactions and API calls
 
+// Typed array constructors for the column dtypes of ?format=columnar chart payloads
+const COLUMN_TYPES = {
+    uint8: Uint8Array,
+    int8: Int8Array,
+    uint16: Uint16Array,
+    int16: Int16Array,
+    int32: Int32Array,
+    float64: Float64Array
+};
+
+function decodeColumn(column) {
+    // Base64 little-endian bytes; scaled columns carry decimals as integers
+    const bytes = Uint8Array.from(atob(column.data), char => char.charCodeAt(0));
+    const values = new COLUMN_TYPES[column.dtype](bytes.buffer);
+    const scale = column.scale || 1;
+    return scale === 1 ? Array.from(values) : Array.from(values, value => value / scale);
+}
+
+function decodeChartLabels(labels) {
+    if (Array.isArray(labels)) return labels;
+    // A run of consecutive days from start, then any labels listed in more
+    const start = Date.parse(`${labels.start}T00:00:00Z`);
+    const days = Array.from({length: labels.days},
+        (_, offset) => new Date(start + offset * 86400000).toISOString().slice(0, 10));
+    return days.concat(labels.more || []);
+}
+
+function decodeColumnarChart(payload, styles) {
+    // Rebuild the Chart.js {labels, datasets} the chartjs format would have sent
+    const {format, style: styleName, labels, values, series, point_colors: pointColors, ...rest} = payload;
+    const style = styles[styleName];
+    const data = decodeColumn(values);
+    const [count, points] = values.shape;
+    const datasets = [];
+    for (let index = 0; index < count; index++) {
+        const base = style.datasets ? style.datasets[index] : style.cycle[index % style.cycle.length];
+        const dataset = {...base, data: data.slice(index * points, (index + 1) * points)};
+        if (series) dataset.label = series[index];
+        datasets.push(dataset);
+    }
+    if (pointColors) {
+        datasets[0].backgroundColor = decodeColumn(pointColors).map(code => style.point_colors[code]);
+    }
+    return {...rest, labels: decodeChartLabels(labels), datasets};
+}
+
 class LabCapacityApp {
     constructor() {
         this.currentTab = 'dashboard';
@@ -8,6 +54,14 @@ class LabCapacityApp {
         this.methods = [];
         this.realtimeCapacity = {};
         this.updateInterval = null;
+        this.demandPageSize = 50;
+        this.demandRowsLoaded = 0;
+        this.demandQueueCursor = null;
+        this.demandStatusFilter = '';
+        this.prefetched = new Map();
+        this.chartStyles = null;
+        this.events = null;
+        this.eventsConnected = false;
         this.init();
     }
 
@@ -15,6 +69,23 @@ class LabCapacityApp {
         // Set up initial date
         document.getElementById('schedule-date').valueAsDate = new Date();
         
+        // Demand queue view toggles filter on the server
+        const demandViews = {demandAll: '', demandPending: 'pending', demandScheduled: 'scheduled'};
+        Object.entries(demandViews).forEach(([id, status]) => {
+            const toggle = document.getElementById(id);
+            if (toggle) {
+                toggle.addEventListener('change', () => {
+                    this.demandStatusFilter = status;
+                    this.demandRowsLoaded = 0;
+                    this.loadDemandQueue();
+                });
+            }
+        });
+        
+        // One round trip for every view rendered on load; the loaders below
+        // pick their data out of it instead of fetching
+        await this.prefetch('bootstrap');
+        
         // Load method data for demand form first
         await this.loadMethods();
         this.loadRealtimeData();
@@ -27,10 +98,14 @@ class LabCapacityApp {
         this.loadOptimization();
         this.loadReports();
         
+        // Changes are pushed over /api/events; polling stays as the fallback
+        this.connectEvents();
+        
         // Set up auto-refresh
         this.updateInterval = setInterval(() => {
             this.refreshCurrentTab();
-            this.loadRealtimeData(); // Refresh real-time data more frequently
+            // Real-time data arrives as events while the stream is open
+            if (!this.eventsConnected) this.loadRealtimeData();
         }, 30000); // 30 seconds
         
         console.log('Lab Capacity Model initialized');
@@ -82,7 +157,39 @@ class LabCapacityApp {
     }
 
     // API calls
+    async prefetch(endpoint, options) {
+        try {
+            const response = await fetch(`/api/${endpoint}`, options);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const data = await response.json();
+            Object.entries(data.responses).forEach(([path, result]) => {
+                if (result.status === 200) this.prefetched.set(path, result.body);
+            });
+        } catch (error) {
+            console.error(`Prefetch failed for ${endpoint}:`, error);
+        }
+    }
+
+    batch(endpoints) {
+        return this.prefetch('batch', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({requests: endpoints})
+        });
+    }
+
+    takePrefetched(endpoint) {
+        // Prefetched data is used once; later refreshes go back to the API
+        const data = this.prefetched.get(endpoint);
+        this.prefetched.delete(endpoint);
+        return data;
+    }
+
     async apiCall(endpoint) {
+        const prefetched = this.takePrefetched(endpoint);
+        if (prefetched !== undefined) return prefetched;
         try {
             const response = await fetch(`/api/${endpoint}`);
             if (!response.ok) {
@@ -95,6 +202,24 @@ class LabCapacityApp {
         }
     }
 
+    async chartData(endpoint) {
+        // Chart series come columnar and are styled from the manifest, fetched once per page
+        if (!this.chartStyles) {
+            this.chartStyles = this.apiCall('charts/styles');
+        }
+        const separator = endpoint.includes('?') ? '&' : '?';
+        const [data, styles] = await Promise.all([
+            this.apiCall(`${endpoint}${separator}format=columnar`),
+            this.chartStyles
+        ]);
+        if (!styles) {
+            // Try the manifest again on the next chart
+            this.chartStyles = null;
+            return null;
+        }
+        return data ? decodeColumnarChart(data, styles) : null;
+    }
+
     // Dashboard functions
     async loadDashboard() {
         const data = await this.apiCall('dashboard');
@@ -127,7 +252,7 @@ class LabCapacityApp {
     }
 
     async loadPersonnelChart() {
-        const data = await this.apiCall('personnel/utilization');
+        const data = await this.chartData('personnel/utilization');
         if (!data) return;
 
         const ctx = document.getElementById('personnelChart').getContext('2d');
@@ -322,7 +447,7 @@ class LabCapacityApp {
     }
 
     async loadTimelineChart() {
-        const data = await this.apiCall('capacity/timeline');
+        const data = await this.chartData('capacity/timeline');
         if (!data) return;
 
         const ctx = document.getElementById('timelineChart').getContext('2d');
@@ -630,7 +755,8 @@ class LabCapacityApp {
     }
 
     async loadDemandChart() {
-        const data = await this.apiCall('demand/forecast');
+        // Only the fields the tooltips show
+        const data = await this.chartData('demand/forecast?fields=date,method_name,sample_count,client,project,priority,status,assay_breakdown');
         if (!data) return;
 
         const ctx = document.getElementById('demandChart').getContext('2d');
@@ -826,13 +952,25 @@ class LabCapacityApp {
         }
     }
 
-    async loadDemandQueue() {
-        // Get demand queue data with proper method/assay structure
-        const data = await this.apiCall('demand/queue');
-        if (!data) return;
+    async loadDemandQueue(append = false) {
+        // Get one page of the demand queue; refreshes re-fetch as many rows as are on screen
+        const params = new URLSearchParams({
+            limit: append ? this.demandPageSize : Math.min(Math.max(this.demandPageSize, this.demandRowsLoaded), 500)
+        });
+        if (this.demandStatusFilter) params.set('status', this.demandStatusFilter);
+        if (append && this.demandQueueCursor) params.set('cursor', this.demandQueueCursor);
+        
+        const page = await this.apiCall(`demand/queue?${params}`);
+        if (!page) return;
+        const data = page.items;
 
         const tbody = document.querySelector('#demand-queue-table tbody');
-        tbody.innerHTML = '';
+        if (append) {
+            tbody.querySelectorAll('.demand-load-more').forEach(row => row.remove());
+        } else {
+            tbody.innerHTML = '';
+            this.demandRowsLoaded = 0;
+        }
 
         data.forEach(item => {
             const row = document.createElement('tr');
@@ -886,26 +1024,30 @@ class LabCapacityApp {
             
             tbody.appendChild(row);
         });
+        this.demandRowsLoaded += data.length;
+        this.demandQueueCursor = page.next_cursor;
+
+        if (page.next_cursor) {
+            const moreRow = document.createElement('tr');
+            moreRow.className = 'demand-load-more';
+            moreRow.innerHTML = `
+                <td colspan="9" class="text-center">
+                    <button class="btn btn-sm btn-outline-secondary">
+                        Load more (${this.demandRowsLoaded} of ${page.total})
+                    </button>
+                </td>
+            `;
+            moreRow.querySelector('button').addEventListener('click', () => this.loadDemandQueue(true));
+            tbody.appendChild(moreRow);
+        }
 
-        // Update batch planning metrics based on assay breakdowns
-        const totalSamples = data.reduce((sum, item) => sum + item.sample_count, 0);
-        const totalBatches = data.reduce((sum, item) => {
-            return sum + (item.assay_breakdown ? item.assay_breakdown.reduce((batchSum, assay) => batchSum + assay.batches, 0) : 0);
-        }, 0);
-        const avgBatchSize = totalBatches > 0 ? Math.round(totalSamples / totalBatches) : 0;
-        const totalHours = data.reduce((sum, item) => {
-            // Estimate based on assay complexity
-            const assayHours = item.assay_breakdown ? item.assay_breakdown.reduce((hourSum, assay) => {
-                const timePerBatch = assay.category === 'LC-MS' ? 6 : assay.category === 'SEC' ? 8 : 4;
-                return hourSum + (assay.batches * timePerBatch);
-            }, 0) : item.sample_count * 2;
-            return sum + assayHours;
-        }, 0);
-
-        document.getElementById('total-samples').textContent = totalSamples.toLocaleString();
-        document.getElementById('total-batches').textContent = totalBatches.toLocaleString();
-        document.getElementById('avg-batch-size').textContent = avgBatchSize;
-        document.getElementById('total-hours').textContent = totalHours.toLocaleString();
+        // Batch planning metrics cover every matching request, not just the rows on screen
+        if (page.summary) {
+            document.getElementById('total-samples').textContent = page.summary.total_samples.toLocaleString();
+            document.getElementById('total-batches').textContent = page.summary.total_batches.toLocaleString();
+            document.getElementById('avg-batch-size').textContent = page.summary.avg_batch_size;
+            document.getElementById('total-hours').textContent = page.summary.total_hours.toLocaleString();
+        }
     }
 
     async loadDemandByInstrument() {
@@ -1107,21 +1249,19 @@ class LabCapacityApp {
     }
 
     async loadOptimizedSchedule() {
-        // For now, use current demand queue for optimization
-        const demandData = await this.apiCall('demand/queue');
-        if (!demandData) return;
-
-        // Call optimization API
+        // The server schedules its own demand queue and repairs the last
+        // solved schedule on edits, so there is no need to post the queue
         const optimizationRequest = {
-            sample_requests: demandData.map(demand => ({
-                id: demand.id,
-                method: demand.method || 'hplc-potency',
-                sample_count: demand.sample_count,
-                priority: demand.priority,
-                required_by_date: demand.start_date
-            }))
+            mode: 'incremental'
         };
 
+        const prefetched = this.takePrefetched('scheduling/optimize');
+        if (prefetched !== undefined) {
+            this.displayOptimizedSchedule(prefetched);
+            this.displayOptimizationInsights(prefetched);
+            return;
+        }
+
         try {
             const response = await fetch('/api/scheduling/optimize', {
                 method: 'POST',
@@ -1253,7 +1393,7 @@ class LabCapacityApp {
     }
 
     async loadTrendChart() {
-        const data = await this.apiCall('utilization/trend');
+        const data = await this.chartData('utilization/trend');
         if (!data) return;
 
         const ctx = document.getElementById('trendChart').getContext('2d');
@@ -1864,8 +2004,95 @@ class LabCapacityApp {
         }
     }
 
+    // Push notifications
+    connectEvents() {
+        if (!window.EventSource) return;
+        // EventSource reconnects by itself and resumes from the last event id it saw
+        this.events = new EventSource('/api/events');
+        this.events.onopen = () => {
+            // Catch up on anything that changed while the stream was down
+            if (this.eventsConnected === null) this.loadRealtimeData();
+            this.eventsConnected = true;
+        };
+        this.events.onerror = () => {
+            if (this.eventsConnected) this.eventsConnected = null;
+        };
+        this.events.addEventListener('instrument_status', event => this.onInstrumentStatus(JSON.parse(event.data)));
+        this.events.addEventListener('demand_added', event => this.onDemandAdded(JSON.parse(event.data)));
+        this.events.addEventListener('catalog_changed', event => this.onCatalogChanged(JSON.parse(event.data)));
+        this.events.addEventListener('eln_instruments', event => {
+            this.instrumentStatus = this.applyDelta(this.instrumentStatus, 'instrument_id', JSON.parse(event.data));
+            this.refreshRealtimeCapacity();
+        });
+        this.events.addEventListener('eln_personnel', event => {
+            this.personnelAvailability = this.applyDelta(this.personnelAvailability, 'person_id', JSON.parse(event.data));
+            this.refreshRealtimeCapacity();
+        });
+    }
+
+    async refreshRealtimeCapacity() {
+        // Capacity is derived server-side from the same feeds, so it is refetched rather than patched
+        const capacityData = await this.apiCall('capacity/realtime');
+        if (capacityData) this.realtimeCapacity = capacityData;
+        if (this.realtimeMethod) this.loadRealtimeStatusForMethod(this.realtimeMethod);
+    }
+
+    applyDelta(records, idField, delta) {
+        // Merge changed records by id and drop removed ones, keeping list order
+        const changed = new Map(delta.changed.map(record => [record[idField], record]));
+        const removed = new Set(delta.removed);
+        const merged = (records || [])
+            .filter(record => !removed.has(record[idField]))
+            .map(record => {
+                const update = changed.get(record[idField]);
+                changed.delete(record[idField]);
+                return update || record;
+            });
+        return merged.concat([...changed.values()]);
+    }
+
+    onInstrumentStatus(change) {
+        // Patch the cached lists in place instead of refetching them
+        const instrument = (this.instruments || []).find(inst => inst.id === change.instrument_id);
+        if (instrument) {
+            instrument.status = change.new_status;
+            this.renderInstrumentsAdmin(this.instruments);
+        }
+        const live = (this.instrumentStatus || []).find(inst => inst.instrument_id === change.instrument_id);
+        if (live) {
+            live.status = change.new_status === 'active' ? 'available' : change.new_status;
+        }
+        this.refreshRealtimeCapacity();
+        if (this.currentTab === 'dashboard') this.loadDashboard();
+    }
+
+    onDemandAdded(change) {
+        if (this.currentTab === 'demand') {
+            this.loadDemandChart();
+            this.demandRowsLoaded = 0;
+            this.loadDemandQueue();
+        } else if (this.currentTab === 'optimization') {
+            this.loadOptimizedSchedule();
+        }
+    }
+
+    onCatalogChanged(change) {
+        const stores = new Set(change.stores);
+        if (stores.has('methods') || stores.has('matrix')) this.loadMethods();
+        if (document.getElementById('admin-tab').style.display !== 'none') {
+            if (stores.has('matrix') || stores.has('methods')) this.loadMethodInstrumentMatrix();
+            if (stores.has('skills')) this.loadOperatorSkills();
+            if (stores.has('instruments')) this.loadInstrumentsAdmin();
+        }
+        if (stores.has('demand')) this.onDemandAdded(change);
+    }
+
     // Real-time data management
     async loadRealtimeData() {
+        const endpoints = ['eln/instruments/status', 'eln/personnel/availability', 'capacity/realtime'];
+        if (!endpoints.every(endpoint => this.prefetched.has(endpoint))) {
+            await this.batch(endpoints);
+        }
         const instrumentData = await this.apiCall('eln/instruments/status');
         const personnelData = await this.apiCall('eln/personnel/availability');
         const capacityData = await this.apiCall('capacity/realtime');
@@ -1876,6 +2103,7 @@ class LabCapacityApp {
     }
 
     loadRealtimeStatusForMethod(method) {
+        this.realtimeMethod = method;
         if (!this.realtimeCapacity || !method) {
             document.getElementById('realtimeStatus').style.display = 'none';
             return;
@@ -1892,8 +2120,9 @@ class LabCapacityApp {
         // Update real-time status display
         document.getElementById('availableNow').textContent = `${capacity.available_now}/${capacity.total_instruments}`;
         document.getElementById('queueDepth').textContent = capacity.queue_depth;
-        document.getElementById('earliestSlot').textContent = this.formatDateTime(capacity.earliest_slot);
-        document.getElementById('avgWaitTime').textContent = capacity.avg_wait_time_hours;
+        // Both are null when no instrument in the category has a known free time
+        document.getElementById('earliestSlot').textContent = capacity.earliest_slot ? this.formatDateTime(capacity.earliest_slot) : 'N/A';
+        document.getElementById('avgWaitTime').textContent = capacity.avg_wait_time_hours ?? 'N/A';
 
         // Show detailed instrument status
         this.updateInstrumentDetails(instrumentType);
@@ -1948,7 +2177,7 @@ class LabCapacityApp {
     }
 
     // Enhanced start date calculation with real-time data
-    calculateStartDate() {
+    async calculateStartDate() {
         const requiredByDate = document.getElementById('demandRequiredByDate').value;
         const methodId = document.getElementById('demandMethod').value;
 
@@ -1973,13 +2202,11 @@ class LabCapacityApp {
             adjustedLeadTime += queueWaitDays;
         }
 
-        // Calculate start date by subtracting adjusted lead time from required by date
-        const requiredDate = new Date(requiredByDate);
-        const startDate = new Date(requiredDate);
-        startDate.setDate(requiredDate.getDate() - adjustedLeadTime);
-
-        // Format date for input field (YYYY-MM-DD)
-        const formattedStartDate = startDate.toISOString().split('T')[0];
+        // Count the adjusted lead time back in lab working days (weekends, holidays and shutdowns skipped)
+        const offset = await this.apiCall(`calendar/add-working-days?date=${requiredByDate}&working_days=${-adjustedLeadTime}`);
+        if (!offset) return;
+        const formattedStartDate = offset.result;
+        const startDate = new Date(`${formattedStartDate}T00:00:00`);
         document.getElementById('demandStartDate').value = formattedStartDate;
 
         // Check if start date is in the past
@@ -2136,7 +2363,10 @@ class LabCapacityApp {
 
         // Store instruments in the app object for access by other functions
         this.instruments = data;
+        this.renderInstrumentsAdmin(data);
+    }
 
+    renderInstrumentsAdmin(data) {
         const tbody = document.querySelector('#instruments-admin-table tbody');
         tbody.innerHTML = '';
         
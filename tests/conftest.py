@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# database.py builds its engine at import; the default SQL Server URL needs pyodbc
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
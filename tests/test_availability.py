@@ -0,0 +1,50 @@
+import random
+from datetime import datetime, timedelta
+
+from availability import LONG_BOOKING, ResourceIntervals
+
+BASE = datetime(2024, 1, 1)
+
+
+def brute_overlapping(bookings, start, end):
+    return sorted(booking for booking in bookings if booking[0] < end and booking[1] > start)
+
+
+def test_long_booking_does_not_widen_the_search():
+    intervals = ResourceIntervals()
+    intervals.insert(BASE, BASE + timedelta(hours=2), 'short')
+    intervals.insert(BASE, BASE + timedelta(days=30), 'vacation')
+    assert intervals.longest == timedelta(hours=2)
+    assert len(intervals) == 2
+    window = (BASE + timedelta(days=10), BASE + timedelta(days=10, hours=1))
+    assert intervals.overlapping(*window) == [(BASE, BASE + timedelta(days=30), 'vacation')]
+
+    assert intervals.delete(BASE, BASE + timedelta(days=30), 'vacation')
+    assert intervals.is_free(*window)
+
+
+def test_matches_brute_force_with_long_and_short_bookings():
+    rng = random.Random(11)
+    bookings = []
+    for key in range(300):
+        start = BASE + timedelta(hours=rng.uniform(0, 24 * 60))
+        length = timedelta(days=rng.uniform(1, 20)) if rng.random() < 0.1 else timedelta(hours=rng.uniform(0.5, 8))
+        bookings.append((start, start + length, key))
+    intervals = ResourceIntervals()
+    intervals.extend(bookings[:200])
+    for booking in bookings[200:]:
+        intervals.insert(*booking)
+    for booking in bookings[::7]:
+        assert intervals.delete(*booking)
+    remaining = [booking for booking in bookings if booking not in bookings[::7]]
+
+    assert intervals.longest <= LONG_BOOKING
+    for _ in range(200):
+        start = BASE + timedelta(hours=rng.uniform(0, 24 * 60))
+        end = start + timedelta(hours=rng.uniform(0.1, 48))
+        assert intervals.overlapping(start, end) == brute_overlapping(remaining, start, end)
+
+    pairs = {(first[2], second[2]) for first, second in intervals.conflicts()}
+    expected = {(first[2], second[2]) for first in remaining for second in remaining
+                if first < second and second[0] < first[1]}
+    assert pairs == expected
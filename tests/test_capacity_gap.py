@@ -0,0 +1,49 @@
+from datetime import date
+
+import pytest
+
+from capacity_gap import MAX_INSTRUMENT_HOURS_PER_DAY, capacity_gap, daily_capacity_hours
+from domain import Instrument, Method
+from workcalendar import WorkCalendar
+
+
+def hplc(**fields):
+    # 60 samples a day at 30 minutes each is rated past a whole day
+    fields = dict({'category': 'HPLC', 'throughput_samples_per_day': 60, 'run_time_per_sample_min': 30,
+                   'avg_batch_size': 10}, **fields)
+    return Instrument('HPLC-1', **fields)
+
+
+def capacity(instrument):
+    return daily_capacity_hours([instrument])['HPLC']
+
+
+def test_rated_hours_are_capped_at_a_day():
+    assert capacity(hplc()) == MAX_INSTRUMENT_HOURS_PER_DAY
+    assert capacity(hplc(throughput_samples_per_day=20)) == pytest.approx(10.0)
+
+
+@pytest.mark.parametrize('fields', [{'failure_rate_percent': 10}, {'efficiency_factor': 0.8}])
+def test_derating_reduces_capped_capacity(fields):
+    assert capacity(hplc(**fields)) < capacity(hplc())
+    assert capacity(hplc(throughput_samples_per_day=20, **fields)) < capacity(hplc(throughput_samples_per_day=20))
+
+
+def test_failure_rate_and_efficiency_scale_capacity():
+    assert capacity(hplc(failure_rate_percent=25, efficiency_factor=0.5)) == pytest.approx(24 * 0.75 * 0.5)
+
+
+def test_out_of_service_instruments_add_nothing():
+    assert capacity(hplc(status='maintenance')) == 0.0
+
+
+def test_capacity_gap_follows_failure_rate():
+    calendar = WorkCalendar(date(2024, 1, 1), 14)
+    methods = [Method('HPLC-A', category='HPLC', run_time_per_sample=30)]
+
+    def total_capacity(instrument):
+        _, _, _, capacity_matrix = capacity_gap([], methods, [instrument], calendar, 14)
+        return capacity_matrix.sum()
+
+    assert total_capacity(hplc()) == pytest.approx(24.0 * 10)
+    assert total_capacity(hplc(failure_rate_percent=50)) == pytest.approx(12.0 * 10)
@@ -0,0 +1,100 @@
+import pytest
+
+from catalog import Catalog
+
+
+def snapshot(catalog):
+    """Every store and index of a catalog as plain data"""
+    return {
+        name: {key: (dict(value) if isinstance(value, dict) else value) for key, value in getattr(catalog, name).items()}
+        for name in ('methods', 'instruments', 'matrix', 'skills', 'demand', 'methods_by_category',
+                     'instruments_by_category', 'matrix_by_method', 'matrix_by_instrument',
+                     'skills_by_method', 'skills_by_operator', 'demand_by_method')
+    }
+
+
+@pytest.fixture
+def catalog():
+    catalog = Catalog()
+    catalog.load(
+        methods=[{'id': 'HPLC-A', 'name': 'HPLC Assay', 'category': 'HPLC'},
+                 {'id': 'GC-A', 'name': 'GC Solvents', 'category': 'GC'}],
+        instruments=[{'id': 'HPLC-1', 'name': 'HPLC 1', 'category': 'HPLC', 'status': 'active'},
+                     {'id': 'GC-1', 'name': 'GC 1', 'category': 'GC', 'status': 'active'}],
+        matrix=[('HPLC-A', 'HPLC-1', True), ('GC-A', 'GC-1', True)],
+        skills=[{'operator_id': 'op1', 'operator_name': 'Ada', 'method_id': 'HPLC-A'}],
+        demand=[{'id': 'D1', 'method': 'HPLC-A', 'sample_count': 10, 'date': '2024-01-25'}],
+        base=True
+    )
+    return catalog
+
+
+def edit(draft):
+    draft.add_method({'id': 'HPLC-B', 'name': 'HPLC Impurities', 'category': 'HPLC'})
+    draft.set_instrument_status('HPLC-1', 'maintenance')
+    draft.set_compatibility('HPLC-B', 'HPLC-1', True)
+    draft.add_skill({'operator_id': 'op2', 'operator_name': 'Ben', 'method_id': 'HPLC-B'})
+    draft.add_demand({'id': 'D2', 'method': 'HPLC-B', 'sample_count': 5, 'date': '2024-01-26'})
+    draft.remove_method('GC-A')
+
+
+def test_fork_writes_leave_the_parent_untouched(catalog):
+    before = snapshot(catalog)
+    versions = catalog.store_versions(('methods', 'demand'))
+    draft = catalog.fork()
+    edit(draft)
+
+    assert snapshot(catalog) == before
+    assert catalog.store_versions(('methods', 'demand')) == versions
+    assert draft.get_instrument('HPLC-1')['status'] == 'maintenance'
+    assert [method['id'] for method in draft.methods_in_category('HPLC')] == ['HPLC-A', 'HPLC-B']
+    assert not draft.has_method('GC-A') and draft.compatible_instrument_ids('GC-A') == []
+    assert [item['id'] for item in draft.demand_for_method('HPLC-B')] == ['D2']
+
+
+def test_fork_reads_through_to_later_parent_changes(catalog):
+    draft = catalog.fork()
+    draft.add_demand({'id': 'D2', 'method': 'HPLC-A', 'sample_count': 5, 'date': '2024-01-26'})
+    catalog.set_instrument_status('GC-1', 'maintenance')
+
+    assert draft.get_instrument('GC-1')['status'] == 'maintenance'
+    assert not catalog.has_demand('D2')
+
+
+def test_merged_matches_the_draft_and_shares_untouched_stores(catalog):
+    before = snapshot(catalog)
+    draft = catalog.fork()
+    edit(draft)
+    merged = draft.merged()
+
+    assert snapshot(merged) == snapshot(draft)
+    assert snapshot(catalog) == before
+    assert merged.parent is None
+    # Nothing in the edit touched the operator index of Ada
+    assert merged.skills_by_operator['Ada'] is catalog.skills_by_operator['Ada']
+
+
+def test_merged_snapshot_is_isolated_from_later_drafts(catalog):
+    first = catalog.fork()
+    first.add_demand({'id': 'D2', 'method': 'HPLC-A', 'sample_count': 5, 'date': '2024-01-26'})
+    published = first.merged()
+    held = snapshot(published)
+
+    second = published.fork()
+    second.remove_demand('D2')
+    second.set_instrument_status('HPLC-1', 'retired')
+    republished = second.merged()
+
+    assert snapshot(published) == held
+    assert not republished.has_demand('D2')
+    assert published.records('demand')[-1].id == 'D2'
+
+
+def test_merged_versions_move_only_for_written_stores(catalog):
+    draft = catalog.fork()
+    draft.add_demand({'id': 'D2', 'method': 'HPLC-A', 'sample_count': 5, 'date': '2024-01-26'})
+    merged = draft.merged()
+
+    assert merged.store_versions(('methods', 'instruments')) == catalog.store_versions(('methods', 'instruments'))
+    assert merged.store_versions(('demand',)) != catalog.store_versions(('demand',))
+    assert catalog.fork().merged() is catalog
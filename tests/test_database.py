@@ -0,0 +1,27 @@
+from sqlalchemy import inspect, text
+
+from database import create_db_engine, upgrade_schema
+
+
+def test_upgrade_adds_missing_columns_and_indexes(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        # capacity_metrics and tasks as an earlier version created them
+        connection.execute(text(
+            "CREATE TABLE capacity_metrics (id INTEGER PRIMARY KEY, date DATETIME NOT NULL, "
+            "resource_type VARCHAR(20) NOT NULL, resource_id INTEGER NOT NULL, planned_hours FLOAT)"
+        ))
+        connection.execute(text("INSERT INTO capacity_metrics VALUES (1, '2024-01-01', 'Personnel', 3, 4.0)"))
+        connection.execute(text("CREATE TABLE tasks (id INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL)"))
+
+    added = upgrade_schema(engine)
+    assert {'capacity_metrics.period', 'capacity_metrics.available_hours', 'tasks.updated_at',
+            'ix_tasks_updated_at', 'ix_capacity_metrics_period'} <= set(added)
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT period, downtime_hours FROM capacity_metrics")).one() == ('day', 0)
+    columns = {column['name'] for column in inspect(engine).get_columns('tasks')}
+    assert {'updated_at', 'scheduled_start', 'assigned_personnel_id'} <= columns
+
+    # Only tables that exist are touched, and a second run has nothing to add
+    assert not inspect(engine).has_table('instruments')
+    assert upgrade_schema(engine) == []
@@ -0,0 +1,98 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from eln_stub import StubServer
+from ingestion import IngestionWorker, StatusStore, normalize_feed
+
+
+def poll(worker):
+    """Run one poll_once of worker on a fresh session"""
+    async def run():
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=worker.timeout)) as session:
+            return await worker.poll_once(session)
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def stub():
+    with StubServer() as server:
+        yield server
+
+
+def make_worker(stub, **options):
+    options = dict({'retries': 2, 'backoff': 0.001, 'timeout': 5}, **options)
+    return IngestionWorker(stub.url, StatusStore(), **options)
+
+
+def test_poll_once_maps_eln_statuses(stub):
+    worker = make_worker(stub)
+
+    assert poll(worker) is True
+    instruments = {record['instrument_id']: record for record in worker.store.snapshot('instruments')}
+    personnel = {record['person_id']: record for record in worker.store.snapshot('personnel')}
+    # IN_USE, IDLE, DOWN and WAITING on the wire
+    assert instruments['HPLC-01']['status'] == 'running'
+    assert instruments['HPLC-04']['status'] == 'available'
+    assert instruments['LCMS-05']['status'] == 'maintenance'
+    assert instruments['GC-03']['status'] == 'queued'
+    assert personnel['emma_brown']['status'] == 'on_leave'
+    assert personnel['bob_smith']['status'] == 'available'
+
+
+def test_poll_once_normalizes_fields(stub):
+    stub.feeds['instruments'] = [
+        {'instrument_id': 'HPLC-09', 'status': 'out of service', 'started_at': '2024-01-25T09:00:00Z',
+         'samples_remaining': '8', 'queue_position': 'next', 'vendor_field': 'dropped'},
+        {'instrument_name': 'No id', 'status': 'available'}
+    ]
+    worker = make_worker(stub)
+
+    assert poll(worker) is True
+    [record] = worker.store.snapshot('instruments')
+    assert record['instrument_id'] == 'HPLC-09'
+    assert record['status'] == 'maintenance'
+    assert record['started_at'] == '2024-01-25T09:00:00+00:00'
+    assert record['samples_remaining'] == 8
+    assert record['queue_position'] is None
+    assert 'vendor_field' not in record
+
+
+def test_normalize_feed_accepts_bare_list():
+    records = normalize_feed('personnel', [{'person_id': 'p1', 'status': 'Engaged', 'overtime_approved': 1}])
+    assert records == [{'person_id': 'p1', 'status': 'busy', 'overtime_approved': True}]
+
+
+def test_poll_once_retries_a_503(stub):
+    stub.state['fail_next'] = 1
+    worker = make_worker(stub, retries=2)
+
+    assert poll(worker) is True
+    # Two feeds plus the retried request
+    assert stub.state['requests'] == 3
+    assert all(health['error'] is None for health in worker.store.health().values())
+
+
+def test_poll_once_gives_up_after_retries_and_keeps_last_good_data(stub):
+    worker = make_worker(stub, retries=1)
+    assert poll(worker) is True
+    before = worker.store.snapshot('instruments')
+
+    stub.state['fail_next'] = 100
+    stub.state['requests'] = 0
+    assert poll(worker) is False
+    # Each feed is tried once and retried once
+    assert stub.state['requests'] == 4
+    health = worker.store.health()
+    assert health['instruments']['error'] and health['personnel']['error']
+    assert worker.store.snapshot('instruments') == before
+
+
+def test_poll_interval_backs_off_after_failures():
+    worker = IngestionWorker('http://eln.invalid', StatusStore(), interval=15, max_interval=300)
+    assert worker.next_delay() == 15
+    worker.failures = 2
+    assert worker.next_delay() == 60
+    worker.failures = 10
+    assert worker.next_delay() == 300
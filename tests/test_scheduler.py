@@ -0,0 +1,113 @@
+from datetime import date, datetime
+
+import pytest
+
+from domain import Compatibility, Instrument, Method, Skill
+from scheduler import BatchScheduler
+
+# A Monday far enough ahead that repairs release work at the origin, as a full solve does
+START = datetime(2030, 1, 7, 8, 0)
+
+METHODS = [
+    Method('HPLC-A', category='HPLC', batch_size=10, run_time_per_sample=30, lead_time_days=3),
+    Method('GC-A', category='GC', batch_size=8, run_time_per_sample=20, lead_time_days=2)
+]
+INSTRUMENTS = [
+    Instrument('HPLC-1', category='HPLC', setup_time_hours=0.5, cleanup_time_hours=0.25),
+    Instrument('HPLC-2', category='HPLC', setup_time_hours=0.5, cleanup_time_hours=0.25),
+    Instrument('GC-1', category='GC', setup_time_hours=0.25)
+]
+MATRIX = [
+    Compatibility('HPLC-A', 'HPLC-1'),
+    Compatibility('HPLC-A', 'HPLC-2'),
+    Compatibility('GC-A', 'GC-1')
+]
+SKILLS = [
+    Skill('op1', 'Ada', 'HPLC-A'),
+    Skill('op2', 'Ben', 'HPLC-A'),
+    Skill('op3', 'Cy', 'GC-A')
+]
+REQUESTS = [
+    {'id': 'R1', 'method': 'HPLC-A', 'sample_count': 25, 'priority': 'high', 'required_by_date': '2030-01-09'},
+    {'id': 'R2', 'method': 'GC-A', 'sample_count': 20, 'priority': 'medium', 'required_by_date': '2030-01-10'},
+    {'id': 'R3', 'method': 'HPLC-A', 'sample_count': 12, 'priority': 'medium', 'required_by_date': '2030-01-11'}
+]
+# Sorts after every request above, so appending it matches where a full solve puts it
+LOW = {'id': 'R4', 'method': 'HPLC-A', 'sample_count': 15, 'priority': 'low', 'required_by_date': '2030-01-20'}
+
+
+def make_scheduler(instruments=INSTRUMENTS):
+    return BatchScheduler(METHODS, MATRIX, instruments, SKILLS, start=START)
+
+
+def solve(sample_requests, instruments=INSTRUMENTS):
+    return make_scheduler(instruments).schedule(sample_requests)
+
+
+def without_batch_ids(summary):
+    return dict(summary, optimized_schedule=[dict(batch, batch_id=None) for batch in summary['optimized_schedule']])
+
+
+def test_adding_a_request_matches_a_full_solve():
+    scheduler = make_scheduler()
+    scheduler.schedule(REQUESTS)
+    scheduler.add_requests([LOW])
+    assert scheduler.summary() == solve(REQUESTS + [LOW])
+
+
+def test_removing_the_last_request_matches_a_full_solve():
+    scheduler = make_scheduler()
+    scheduler.schedule(REQUESTS + [LOW])
+    scheduler.remove_requests(['R4'])
+    assert scheduler.summary() == solve(REQUESTS)
+
+
+def test_removing_a_method_matches_a_full_solve_without_it():
+    scheduler = make_scheduler()
+    scheduler.schedule([REQUESTS[1], LOW])
+    scheduler.remove_method('HPLC-A')
+    repaired = scheduler.summary()
+    assert [batch['request_id'] for batch in repaired['optimized_schedule']] == ['R2'] * 3
+    assert repaired['optimized_schedule'] == solve([REQUESTS[1]])['optimized_schedule']
+
+
+def test_instrument_outage_matches_a_full_solve_without_it():
+    # Repairs leave unaffected batches where they are, so GC has its own operator here
+    scheduler = make_scheduler()
+    scheduler.schedule(REQUESTS)
+    scheduler.update_instrument_status('GC-1', 'maintenance')
+    down = [instrument if instrument.id != 'GC-1' else Instrument('GC-1', category='GC', status='maintenance')
+            for instrument in INSTRUMENTS]
+    assert scheduler.summary() == solve(REQUESTS, down)
+
+    # Back in service, the waiting request is booked again; batch ids are never reused
+    scheduler.update_instrument_status('GC-1', 'active')
+    assert without_batch_ids(scheduler.summary()) == without_batch_ids(solve(REQUESTS))
+
+
+def test_due_date_defaults_to_start_plus_lead_time():
+    scheduler = make_scheduler()
+    # Friday start, three working days of lead time: due the following Wednesday
+    assert scheduler._due_date({'method': 'HPLC-A', 'start_date': '2030-01-11'}) == date(2030, 1, 16)
+    assert scheduler._due_date({'method': 'HPLC-A', 'start_date': '2030-01-11',
+                                'required_by_date': '2030-01-12'}) == date(2030, 1, 12)
+
+
+@pytest.mark.parametrize('start_date, late', [('2030-01-07', False), ('2020-01-06', True)])
+def test_batches_are_late_only_past_the_due_date(start_date, late):
+    summary = solve([{'id': 'R1', 'method': 'GC-A', 'sample_count': 8, 'start_date': start_date}])
+    assert [batch['late'] for batch in summary['optimized_schedule']] == [late]
+
+
+def test_failed_rebook_reports_the_missing_operator():
+    instruments = INSTRUMENTS + [Instrument('GC-2', category='GC')]
+    scheduler = BatchScheduler(METHODS, MATRIX + [Compatibility('GC-A', 'GC-2')], instruments, SKILLS, start=START)
+    scheduler.schedule([REQUESTS[1]])
+    assert scheduler.instrument_batches['GC-1']
+    # The only GC operator has since left, so moving GC-1's batches to GC-2 finds no one to run them
+    scheduler.method_operators['GC-A'] = []
+    scheduler.update_instrument_status('GC-1', 'maintenance')
+
+    summary = scheduler.summary()
+    assert [item['reason'] for item in summary['unscheduled']] == ['No qualified operator']
+    assert 'Train an operator on GC-A' in summary['recommendations']
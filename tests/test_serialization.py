@@ -0,0 +1,58 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import json
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import serialization
+from serialization import encode
+
+pytest.importorskip('orjson')
+
+DOCUMENTS = {
+    'scalars': {'name': 'HPLC-01', 'count': 3, 'ratio': 0.1, 'active': True, 'missing': None},
+    'dates': {'day': date(2024, 1, 2), 'at': datetime(2024, 1, 2, 3, 4, 5),
+              'aware': datetime(2024, 1, 2, 3, tzinfo=timezone.utc)},
+    'numpy': {'int': np.int64(5), 'float': np.float32(1.5), 'bool': np.bool_(True),
+              'array': np.arange(3), 'matrix': np.array([[0.1, 0.2], [0.3, 0.4]])},
+    'pandas': {'series': pd.Series([1, 2]),
+               'frame': pd.DataFrame({'a': [1, 2], 'day': pd.to_datetime(['2024-01-01', '2024-01-02'])})},
+    'non_finite': {'nan': float('nan'), 'inf': float('inf'), 'array': np.array([0.5, np.nan]),
+                   'frame': pd.DataFrame({'a': [1.5, None]}), 'pair': (1, float('-inf'))},
+    'keys': {1: 'one', 'nested': [{'x': Decimal('1.5'), 'id': uuid.UUID(int=1)}]},
+    'list': [1, 'two', [3.0, None], {'four': 4}]
+}
+
+
+def stdlib_encode(monkeypatch, document, **options):
+    with monkeypatch.context() as patch:
+        patch.setattr(serialization, 'orjson', None)
+        return encode(document, **options)
+
+
+@pytest.mark.parametrize('name', DOCUMENTS)
+@pytest.mark.parametrize('options', [{}, {'sort_keys': True}])
+def test_orjson_and_stdlib_write_the_same_bytes(monkeypatch, name, options):
+    document = DOCUMENTS[name]
+    assert encode(document, **options) == stdlib_encode(monkeypatch, document, **options)
+
+
+@pytest.mark.parametrize('name', DOCUMENTS)
+def test_indented_output_parses_the_same(monkeypatch, name):
+    document = DOCUMENTS[name]
+    assert json.loads(encode(document, indent=True)) == json.loads(stdlib_encode(monkeypatch, document, indent=True))
+
+
+def test_output_is_strict_json():
+    # NaN is not JSON, so every path writes null
+    for document in DOCUMENTS.values():
+        json.loads(encode(document), parse_constant=pytest.fail)
+
+
+def test_integers_past_64_bits_fall_back_to_stdlib(monkeypatch):
+    document = {'seed': 2 ** 70, 'day': date(2024, 1, 2), 'nan': float('nan')}
+    assert encode(document) == stdlib_encode(monkeypatch, document)
+    assert json.loads(encode(document)) == {'seed': 2 ** 70, 'day': 'Tue, 02 Jan 2024 00:00:00 GMT', 'nan': None}
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from utilization import busy_hours_by_day
+
+
+def reference_busy_hours(resources, starts, ends, resource_count, day_count):
+    """Union of intervals per resource by plain interval merging, then cut at day boundaries"""
+    busy = np.zeros((resource_count, day_count))
+    for resource in range(resource_count):
+        intervals = sorted((s, e) for r, s, e in zip(resources, starts, ends) if r == resource and e > s)
+        merged = []
+        for start, end in intervals:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        for start, end in merged:
+            for day in range(day_count):
+                busy[resource, day] += max(0.0, min(end, (day + 1) * 24.0) - max(start, day * 24.0))
+    return busy
+
+
+@pytest.mark.parametrize('starts, ends, expected', [
+    # Overlapping, nested and touching intervals are each counted once
+    ([1, 3], [5, 8], [7, 0]),
+    ([1, 2], [10, 4], [9, 0]),
+    ([0, 2], [2, 4], [4, 0]),
+    # Across midnight, split between the two days
+    ([20, 22], [30, 26], [4, 6]),
+    # Zero-length and reversed intervals add nothing
+    ([5, 9], [5, 7], [0, 0]),
+])
+def test_one_resource(starts, ends, expected):
+    busy = busy_hours_by_day([0] * len(starts), starts, ends, 1, 2)
+    assert busy.tolist() == [expected]
+
+
+def test_overlaps_are_merged_per_resource_only():
+    busy = busy_hours_by_day([0, 1, 0, 1], [8, 8, 10, 12], [12, 12, 14, 16], 3, 1)
+    assert busy.tolist() == [[6.0], [8.0], [0.0]]
+
+
+def test_no_intervals():
+    assert busy_hours_by_day([], [], [], 2, 3).tolist() == [[0.0] * 3] * 2
+
+
+def test_matches_plain_interval_merging():
+    rng = np.random.default_rng(7)
+    resource_count, day_count, size = 5, 7, 400
+    resources = rng.integers(0, resource_count, size)
+    starts = rng.uniform(0, day_count * 24.0, size)
+    ends = np.minimum(starts + rng.exponential(6.0, size), day_count * 24.0)
+
+    busy = busy_hours_by_day(resources, starts, ends, resource_count, day_count)
+    np.testing.assert_allclose(busy, reference_busy_hours(resources, starts, ends, resource_count, day_count))
+    assert (busy <= 24.0 + 1e-9).all()
+
+
+@pytest.fixture
+def metrics_db():
+    from database import Base, engine
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+
+
+def _planned_hours(engine, day):
+    from sqlalchemy import select
+    from database import CapacityMetric
+    with engine.connect() as connection:
+        return connection.scalar(
+            select(CapacityMetric.planned_hours)
+            .where(CapacityMetric.period == 'day', CapacityMetric.resource_type == 'Personnel',
+                   CapacityMetric.resource_id == 1, CapacityMetric.date == day)
+        )
+
+
+def test_incremental_refresh_clears_the_days_a_task_moved_from(metrics_db):
+    from datetime import datetime, timedelta
+    from sqlalchemy import delete, insert, update
+    from database import Personnel, Task
+    from utilization import refresh_changed_metrics
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    old_day, new_day = today - timedelta(days=10), today - timedelta(days=3)
+    with metrics_db.begin() as connection:
+        connection.execute(insert(Personnel), [{'id': 1, 'name': 'Analyst'}])
+        connection.execute(insert(Task), [{'id': 1, 'name': 'Assay', 'assigned_personnel_id': 1,
+                                           'scheduled_start': old_day + timedelta(hours=9),
+                                           'scheduled_end': old_day + timedelta(hours=13)}])
+    assert refresh_changed_metrics() == ['full']
+    assert _planned_hours(metrics_db, old_day) == 4.0
+
+    with metrics_db.begin() as connection:
+        connection.execute(update(Task).where(Task.id == 1).values(
+            scheduled_start=new_day + timedelta(hours=9), scheduled_end=new_day + timedelta(hours=11),
+            updated_at=datetime.utcnow() + timedelta(seconds=1)
+        ))
+    assert refresh_changed_metrics() != ['full']
+    assert not _planned_hours(metrics_db, old_day)
+    assert _planned_hours(metrics_db, new_day) == 2.0
+
+    # Deletions are only seen by the periodic full refresh
+    with metrics_db.begin() as connection:
+        connection.execute(delete(Task))
+    assert refresh_changed_metrics(full_every=0) == ['full']
+    assert not _planned_hours(metrics_db, new_day)
@@ -0,0 +1,64 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from workcalendar import WorkCalendar
+
+# Monday; the standard shift runs 8-17
+MONDAY = date(2024, 1, 1)
+
+
+@pytest.fixture
+def calendar():
+    # Two weeks: ten working days, weekends closed
+    return WorkCalendar(MONDAY, 14)
+
+
+def hours(day, hour):
+    return day * 24.0 + hour
+
+
+def test_zero_hours_at_shift_start_stays_put(calendar):
+    assert calendar.add_working_hours(hours(0, 8), 0) == hours(0, 8)
+
+
+def test_full_shift_ends_at_close_not_next_morning(calendar):
+    assert calendar.add_working_hours(hours(0, 8), 9) == hours(0, 17)
+    assert calendar.add_working_hours(hours(0, 8), 9.5) == hours(1, 8.5)
+
+
+def test_start_outside_shift_rolls_to_next_shift(calendar):
+    assert calendar.add_working_hours(hours(0, 0), 1) == hours(0, 9)
+    assert calendar.add_working_hours(hours(0, 17), 1) == hours(1, 9)
+    assert calendar.add_working_hours(hours(0, 20), 1) == hours(1, 9)
+
+
+def test_work_spills_over_the_weekend(calendar):
+    # Friday 16:00 plus two hours: one on Friday, one on Monday
+    assert calendar.add_working_hours(hours(4, 16), 2) == hours(7, 9)
+    # Saturday counts from Monday's shift start
+    assert calendar.add_working_hours(hours(5, 10), 1) == hours(7, 9)
+
+
+def test_closed_dates_are_skipped():
+    calendar = WorkCalendar(MONDAY, 14, closed_dates=[MONDAY + timedelta(days=1)])
+    assert calendar.add_working_hours(hours(0, 16), 2) == hours(2, 9)
+
+
+def test_horizon_end(calendar):
+    # Filling every shift of the horizon ends at the close of the last one
+    assert calendar.add_working_hours(hours(0, 8), 10 * 9) == hours(11, 17)
+    assert calendar.add_working_hours(hours(0, 8), 10 * 9 + 0.5) is None
+
+
+def test_round_trip_with_working_hours_between(calendar):
+    start = datetime(2024, 1, 3, 15, 30)
+    for worked in (0.5, 1.5, 9, 13.25):
+        end = calendar.add_working_time(start, worked)
+        assert calendar.working_hours_between(start, end) == pytest.approx(worked)
+
+
+def test_aware_datetimes_are_read_as_local_time(calendar):
+    naive = datetime(2024, 1, 2, 10, 0)
+    aware = naive.astimezone(timezone.utc)
+    assert calendar.add_working_time(aware, 2) == calendar.add_working_time(naive, 2)
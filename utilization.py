@@ -0,0 +1,420 @@
+"""
+Lab Capacity Model - Utilization Engine
+Turns task and instrument booking intervals into per-resource daily busy hours
+and maintains the daily, weekly and monthly rollups in the capacity_metrics table
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, insert, func
+
+from database import (
+    engine, Personnel, Instrument, Task, InstrumentSchedule, PersonnelAvailability,
+    CapacityMetric, RefreshWatermark, WORK_HOURS_PER_DAY
+)
+from config import Config
+
+# Availability types that take a person off the bench
+UNAVAILABLE_TYPES = ['Vacation', 'Training', 'Meeting', 'Sick']
+
+# Metric periods; week and month rows are rolled up from the day rows
+METRIC_PERIODS = ['day', 'week', 'month']
+ROLLUP_PERIODS = ['week', 'month']
+
+# resource_id of the lab-wide total rows for each resource type
+ALL_RESOURCES = 0
+
+WATERMARK_NAME = 'capacity_metrics'
+FULL_WATERMARK_NAME = 'capacity_metrics_full'
+FULL_REFRESH_DAYS = 365
+
+METRIC_SUMS = ['available_hours', 'planned_hours', 'actual_hours', 'downtime_hours', 'overtime_hours']
+
+
+def merge_intervals(resources, starts, ends, span):
+    """Union overlapping intervals per resource
+
+    resources are integer positions 0..n-1 and starts/ends are hours from the
+    window start, already clipped to [0, span). Each resource is shifted onto
+    its own stretch of the time axis (resource * span) so one global sort and
+    running maximum handle every resource at once. Returns (starts, ends) of
+    disjoint intervals on that shifted axis, in ascending order.
+    """
+    keep = ends > starts
+    if not keep.any():
+        return np.empty(0), np.empty(0)
+    offset = resources[keep] * span
+    starts = starts[keep] + offset
+    ends = ends[keep] + offset
+
+    order = np.argsort(starts, kind='stable')
+    starts = starts[order]
+    reach = np.maximum.accumulate(ends[order])
+
+    # A new merged interval begins wherever a start clears everything before it
+    begins = np.empty(len(starts), dtype=bool)
+    begins[0] = True
+    begins[1:] = starts[1:] > reach[:-1]
+    first = np.flatnonzero(begins)
+    last = np.append(first[1:] - 1, len(starts) - 1)
+    return starts[first], reach[last]
+
+
+def busy_hours_by_day(resources, starts, ends, resource_count, day_count):
+    """Hours covered by the union of each resource's intervals on each day
+
+    Returns a (resource_count, day_count) array. Busy time up to any instant
+    is a prefix sum over the merged intervals, so each day's hours are the
+    difference of that function at the day's two boundaries.
+    """
+    busy = np.zeros((resource_count, day_count))
+    span = day_count * 24.0 + 1.0
+    merged_starts, merged_ends = merge_intervals(
+        np.asarray(resources, dtype=np.int64), np.asarray(starts, dtype=float), np.asarray(ends, dtype=float), span
+    )
+    if len(merged_starts) == 0:
+        return busy
+    lengths = merged_ends - merged_starts
+    covered_before = np.concatenate(([0.0], np.cumsum(lengths)))
+
+    boundaries = (np.arange(resource_count)[:, None] * span
+                  + np.arange(day_count + 1)[None, :] * 24.0).ravel()
+    position = np.searchsorted(merged_starts, boundaries, side='right') - 1
+    inside = np.clip(boundaries - merged_starts[np.maximum(position, 0)], 0, lengths[np.maximum(position, 0)])
+    covered = np.where(position >= 0, covered_before[np.maximum(position, 0)] + inside, 0.0)
+    return np.diff(covered.reshape(resource_count, day_count + 1), axis=1)
+
+
+def _hours_from(series, window_start):
+    """Datetime series to float hours from the window start (NaT -> NaN)"""
+    return (pd.to_datetime(series) - window_start) / pd.Timedelta(hours=1)
+
+
+def _busy_matrix(frame, key, start_column, end_column, positions, window_start, day_count):
+    """Daily busy hours for the rows of frame keyed by resource id"""
+    frame = frame[frame[key].isin(positions.index)]
+    starts = _hours_from(frame[start_column], window_start).to_numpy(dtype=float)
+    ends = _hours_from(frame[end_column], window_start).to_numpy(dtype=float)
+    valid = ~(np.isnan(starts) | np.isnan(ends))
+    horizon = day_count * 24.0
+    return busy_hours_by_day(
+        positions[frame[key]].to_numpy()[valid],
+        np.clip(starts[valid], 0, horizon),
+        np.clip(ends[valid], 0, horizon),
+        len(positions),
+        day_count
+    )
+
+
+def _read_frame(statement):
+    with engine.connect() as connection:
+        return pd.read_sql(statement, connection)
+
+
+def _metric_rows(resource_type, resource_ids, days, planned, actual, capacity, downtime):
+    """Flatten daily matrices into CapacityMetric rows, skipping idle non-working days"""
+    busy = np.where(actual > 0, actual, planned)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        utilization = np.where(capacity > 0, busy / capacity * 100, 0.0)
+        efficiency = np.where((planned > 0) & (actual > 0), planned / actual * 100, np.nan)
+    overtime = np.maximum(busy - capacity, 0)
+
+    resource_index, day_index = np.nonzero((capacity > 0) | (busy > 0))
+    columns = {
+        'period': ['day'] * len(day_index),
+        'date': [day.to_pydatetime() for day in days[day_index]],
+        'resource_type': [resource_type] * len(day_index),
+        'resource_id': np.asarray(resource_ids)[resource_index].tolist(),
+        'available_hours': capacity[resource_index, day_index].round(2).tolist(),
+        'planned_hours': planned[resource_index, day_index].round(2).tolist(),
+        'actual_hours': actual[resource_index, day_index].round(2).tolist(),
+        'utilization_rate': utilization[resource_index, day_index].round(1).tolist(),
+        'efficiency_rate': [None if np.isnan(value) else value
+                            for value in efficiency[resource_index, day_index].round(1).tolist()],
+        'downtime_hours': downtime[resource_index, day_index].round(2).tolist(),
+        'overtime_hours': overtime[resource_index, day_index].round(2).tolist()
+    }
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def compute_personnel_metrics(start, end):
+    """Daily planned/actual hours and utilization for every person"""
+    day_count = (end - start).days
+    days = pd.date_range(start, periods=day_count, freq='D')
+    people = _read_frame(select(Personnel.id, Personnel.fte_percentage).order_by(Personnel.id))
+    positions = pd.Series(np.arange(len(people)), index=people['id'])
+
+    tasks = _read_frame(
+        select(Task.assigned_personnel_id, Task.scheduled_start, Task.scheduled_end,
+               Task.estimated_duration, Task.actual_start, Task.actual_end)
+        .where(Task.assigned_personnel_id.is_not(None))
+        .where(func.coalesce(Task.actual_start, Task.scheduled_start) < end)
+        .where(func.coalesce(Task.actual_end, Task.scheduled_end, Task.actual_start, Task.scheduled_start) >= start)
+    )
+    # Open-ended bookings run for their estimate
+    estimated_end = pd.to_datetime(tasks['scheduled_start']) + pd.to_timedelta(tasks['estimated_duration'].fillna(0), unit='m')
+    tasks['scheduled_end'] = pd.to_datetime(tasks['scheduled_end']).fillna(estimated_end)
+
+    planned = _busy_matrix(tasks, 'assigned_personnel_id', 'scheduled_start', 'scheduled_end', positions, start, day_count)
+    actual = _busy_matrix(tasks, 'assigned_personnel_id', 'actual_start', 'actual_end', positions, start, day_count)
+
+    absences = _read_frame(
+        select(PersonnelAvailability.personnel_id, PersonnelAvailability.start_date, PersonnelAvailability.end_date)
+        .where(PersonnelAvailability.availability_type.in_(UNAVAILABLE_TYPES))
+        .where(PersonnelAvailability.start_date < end, PersonnelAvailability.end_date > start)
+    )
+    absent = _busy_matrix(absences, 'personnel_id', 'start_date', 'end_date', positions, start, day_count)
+
+    working_day = np.is_busday(days.values.astype('datetime64[D]'))
+    fte = people['fte_percentage'].fillna(100).to_numpy(dtype=float)[:, None] / 100
+    contracted = working_day[None, :] * WORK_HOURS_PER_DAY * fte
+    capacity = np.maximum(contracted - absent, 0)
+    downtime = np.minimum(absent, contracted)
+    return _metric_rows('Personnel', people['id'].to_numpy(), days, planned, actual, capacity, downtime)
+
+
+def compute_instrument_metrics(start, end):
+    """Daily booked/actual hours and utilization for every instrument"""
+    day_count = (end - start).days
+    days = pd.date_range(start, periods=day_count, freq='D')
+    instruments = _read_frame(select(Instrument.id).order_by(Instrument.id))
+    positions = pd.Series(np.arange(len(instruments)), index=instruments['id'])
+
+    # Bookings occupy the instrument through setup and cleanup
+    bookings = _read_frame(
+        select(InstrumentSchedule.instrument_id, InstrumentSchedule.start_time, InstrumentSchedule.end_time,
+               InstrumentSchedule.setup_time, InstrumentSchedule.cleanup_time)
+        .where(InstrumentSchedule.status != 'Cancelled')
+        .where(InstrumentSchedule.start_time < end, InstrumentSchedule.end_time >= start)
+    )
+    bookings['start_time'] = pd.to_datetime(bookings['start_time']) - pd.to_timedelta(bookings['setup_time'].fillna(0), unit='m')
+    bookings['end_time'] = pd.to_datetime(bookings['end_time']) + pd.to_timedelta(bookings['cleanup_time'].fillna(0), unit='m')
+    planned = _busy_matrix(bookings, 'instrument_id', 'start_time', 'end_time', positions, start, day_count)
+
+    runs = _read_frame(
+        select(Task.assigned_instrument_id, Task.actual_start, Task.actual_end)
+        .where(Task.assigned_instrument_id.is_not(None), Task.actual_start < end, Task.actual_end > start)
+    )
+    actual = _busy_matrix(runs, 'assigned_instrument_id', 'actual_start', 'actual_end', positions, start, day_count)
+
+    working_day = np.is_busday(days.values.astype('datetime64[D]'))
+    capacity = np.repeat(working_day[None, :] * float(WORK_HOURS_PER_DAY), len(positions), axis=0)
+    return _metric_rows('Instrument', instruments['id'].to_numpy(), days, planned, actual, capacity,
+                        np.zeros_like(capacity))
+
+
+def period_start(dates, period):
+    """First day of the day/week/month containing each date (weeks start on Monday)"""
+    dates = pd.DatetimeIndex(dates).normalize()
+    if period == 'week':
+        return dates - pd.to_timedelta(dates.weekday, unit='D')
+    if period == 'month':
+        return dates.to_period('M').to_timestamp()
+    return dates
+
+
+def _period_bounds(start, end, period):
+    """Expand [start, end) to whole periods"""
+    first = period_start([start], period)[0]
+    last = period_start([end - timedelta(days=1)], period)[0]
+    if period == 'week':
+        return first, last + pd.Timedelta(days=7)
+    return first, last + pd.DateOffset(months=1)
+
+
+def _insert_rows(connection, rows, batch_size):
+    for chunk_start in range(0, len(rows), batch_size):
+        connection.execute(insert(CapacityMetric), rows[chunk_start:chunk_start + batch_size])
+
+
+def _aggregate(frame, keys, period):
+    """Sum day rows over keys and derive the rates from the sums"""
+    totals = frame.groupby(keys, as_index=False)[METRIC_SUMS + ['busy_hours', 'planned_with_actual']].sum()
+    available = totals['available_hours'].to_numpy()
+    actual = totals['actual_hours'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        totals['utilization_rate'] = np.where(available > 0, totals['busy_hours'] / available * 100, 0.0).round(1)
+        efficiency = np.where(actual > 0, totals['planned_with_actual'] / actual * 100, np.nan).round(1)
+    totals['efficiency_rate'] = [None if np.isnan(value) else value for value in efficiency]
+    totals[METRIC_SUMS] = totals[METRIC_SUMS].round(2)
+    if 'resource_id' not in keys:
+        totals['resource_id'] = ALL_RESOURCES
+    totals['period'] = period
+    totals = totals.drop(columns=['busy_hours', 'planned_with_actual'])
+    records = totals.to_dict('records')
+    for record in records:
+        record['date'] = record['date'].to_pydatetime()
+    return records
+
+
+def _rebuild_rollups(connection, start, end, batch_size):
+    """Recompute lab-wide day totals for [start, end) and the week/month rows overlapping it"""
+    bounds = {period: _period_bounds(start, end, period) for period in ROLLUP_PERIODS}
+    read_start = min(lower for lower, upper in bounds.values())
+    read_end = max(upper for lower, upper in bounds.values())
+    days = pd.read_sql(
+        select(CapacityMetric.date, CapacityMetric.resource_type, CapacityMetric.resource_id,
+               *[getattr(CapacityMetric, column) for column in METRIC_SUMS])
+        .where(CapacityMetric.period == 'day', CapacityMetric.resource_id != ALL_RESOURCES)
+        .where(CapacityMetric.date >= read_start, CapacityMetric.date < read_end),
+        connection
+    )
+    days['date'] = pd.to_datetime(days['date'])
+    days[METRIC_SUMS] = days[METRIC_SUMS].fillna(0.0)
+    days['busy_hours'] = days['actual_hours'].where(days['actual_hours'] > 0, days['planned_hours'])
+    days['planned_with_actual'] = days['planned_hours'].where(days['actual_hours'] > 0, 0.0)
+
+    in_window = days[(days['date'] >= start) & (days['date'] < end)]
+    rows = _aggregate(in_window, ['resource_type', 'date'], 'day') if len(in_window) else []
+    for period, (lower, upper) in bounds.items():
+        connection.execute(delete(CapacityMetric).where(
+            CapacityMetric.period == period, CapacityMetric.date >= lower, CapacityMetric.date < upper
+        ))
+        if len(days):
+            bucketed = days.assign(date=period_start(days['date'], period))
+            rows += _aggregate(bucketed, ['resource_type', 'resource_id', 'date'], period)
+            rows += _aggregate(bucketed, ['resource_type', 'date'], period)
+    _insert_rows(connection, rows, batch_size)
+
+
+def refresh_capacity_metrics(start=None, end=None, batch_size=None):
+    """Recompute day rows for [start, end), replace the stored ones and refresh the rollups over them"""
+    end = end or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    start = start or end - timedelta(days=FULL_REFRESH_DAYS)
+    batch_size = batch_size or Config.DB_BATCH_SIZE
+    rows = compute_personnel_metrics(start, end) + compute_instrument_metrics(start, end)
+
+    with engine.begin() as connection:
+        connection.execute(delete(CapacityMetric).where(
+            CapacityMetric.period == 'day', CapacityMetric.date >= start, CapacityMetric.date < end
+        ))
+        _insert_rows(connection, rows, batch_size)
+        _rebuild_rollups(connection, start, end, batch_size)
+    return len(rows)
+
+
+def _span_days(starts, ends):
+    """Every day touched by the [start, end] spans; a missing end counts as the start day"""
+    starts = pd.to_datetime(starts)
+    ends = pd.to_datetime(ends).fillna(starts)
+    valid = starts.notna().to_numpy()
+    first = starts[valid].dt.normalize().to_numpy()
+    counts = ((ends[valid].dt.normalize() - starts[valid].dt.normalize()).dt.days.to_numpy() + 1).clip(1)
+    # Expand every span into its days without a Python loop
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return pd.DatetimeIndex(np.unique(np.repeat(first, counts) + offsets.astype('timedelta64[D]')))
+
+
+def _stored_busy_days(resource_type, resource_ids):
+    """Days with stored busy or absent hours for the given resources"""
+    if len(resource_ids) == 0:
+        return pd.DatetimeIndex([])
+    days = _read_frame(
+        select(CapacityMetric.date).distinct()
+        .where(CapacityMetric.period == 'day', CapacityMetric.resource_type == resource_type)
+        .where(CapacityMetric.resource_id.in_([int(resource_id) for resource_id in resource_ids]))
+        .where((CapacityMetric.planned_hours > 0) | (CapacityMetric.actual_hours > 0)
+               | (CapacityMetric.downtime_hours > 0))
+    )
+    return pd.DatetimeIndex(pd.to_datetime(days['date'])).normalize()
+
+
+def touched_days(since):
+    """Days whose metrics may have changed through tasks, bookings and absences changed after since
+
+    A changed row only shows its new span, so the days its resource already
+    has busy or absent hours stored for are recomputed too; that covers the
+    days a moved task or booking used to occupy.
+    """
+    tasks = _read_frame(
+        select(Task.assigned_personnel_id, Task.assigned_instrument_id, Task.scheduled_start, Task.scheduled_end,
+               Task.actual_start, Task.actual_end)
+        .where(Task.updated_at > since)
+    )
+    bookings = _read_frame(
+        select(InstrumentSchedule.instrument_id, InstrumentSchedule.start_time, InstrumentSchedule.end_time)
+        .where(InstrumentSchedule.updated_at > since)
+    )
+    absences = _read_frame(
+        select(PersonnelAvailability.personnel_id, PersonnelAvailability.start_date, PersonnelAvailability.end_date)
+        .where(PersonnelAvailability.updated_at > since)
+    )
+    days = _span_days(
+        pd.concat([tasks['scheduled_start'], tasks['actual_start'], bookings['start_time'], absences['start_date']]),
+        pd.concat([tasks['scheduled_end'], tasks['actual_end'], bookings['end_time'], absences['end_date']])
+    )
+    people = pd.concat([tasks['assigned_personnel_id'], absences['personnel_id']]).dropna().unique()
+    instruments = pd.concat([tasks['assigned_instrument_id'], bookings['instrument_id']]).dropna().unique()
+    return days.union(_stored_busy_days('Personnel', people)).union(_stored_busy_days('Instrument', instruments))
+
+
+def _day_runs(days):
+    """Split sorted days into contiguous [start, end) runs"""
+    if len(days) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(days.values) > np.timedelta64(1, 'D')) + 1
+    return [(run[0].to_pydatetime(), run[-1].to_pydatetime() + timedelta(days=1))
+            for run in np.split(days, breaks)]
+
+
+def _read_watermark(connection, name):
+    return connection.scalar(select(RefreshWatermark.watermark).where(RefreshWatermark.name == name))
+
+
+def refresh_changed_metrics(batch_size=None, full_every=None):
+    """Incremental refresh: recompute only days touched since the last watermark
+
+    Deleted rows, and tasks moved to another person or instrument, leave
+    nothing to find them by, so the first run, and any run once the last
+    full refresh is more than full_every seconds old, refreshes everything.
+    """
+    started_at = datetime.utcnow()
+    with engine.connect() as connection:
+        watermark = _read_watermark(connection, WATERMARK_NAME)
+        last_full = _read_watermark(connection, FULL_WATERMARK_NAME)
+    full = watermark is None or (
+        full_every is not None and (last_full is None or started_at - last_full >= timedelta(seconds=full_every))
+    )
+    if full:
+        refresh_capacity_metrics(batch_size=batch_size)
+        runs = ['full']
+    else:
+        runs = _day_runs(touched_days(watermark))
+        for run_start, run_end in runs:
+            refresh_capacity_metrics(run_start, run_end, batch_size)
+
+    names = [WATERMARK_NAME, FULL_WATERMARK_NAME] if full else [WATERMARK_NAME]
+    with engine.begin() as connection:
+        connection.execute(delete(RefreshWatermark).where(RefreshWatermark.name.in_(names)))
+        connection.execute(insert(RefreshWatermark), [{'name': name, 'watermark': started_at} for name in names])
+    return runs
+
+
+def get_utilization_trend(period='day', periods=30):
+    """Lab-wide utilization for the latest periods, one column per resource type"""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    current = period_start([today], period)[0]
+    if period == 'month':
+        cutoff = current - pd.DateOffset(months=periods - 1)
+    else:
+        cutoff = current - pd.Timedelta(days=(periods - 1) * (7 if period == 'week' else 1))
+    trend = _read_frame(
+        select(CapacityMetric.date, CapacityMetric.resource_type, CapacityMetric.utilization_rate)
+        .where(CapacityMetric.period == period, CapacityMetric.resource_id == ALL_RESOURCES)
+        .where(CapacityMetric.date >= cutoff.to_pydatetime(), CapacityMetric.date <= today)
+        .order_by(CapacityMetric.date)
+    )
+    trend['date'] = pd.to_datetime(trend['date'])
+    return trend.pivot(index='date', columns='resource_type', values='utilization_rate').reindex(
+        columns=['Personnel', 'Instrument']
+    )
+
+
+if __name__ == "__main__":
+    import sys
+    if '--full' in sys.argv:
+        print(f"Wrote {refresh_capacity_metrics()} daily capacity metric rows")
+    else:
+        print(f"Refreshed {len(refresh_changed_metrics())} day range(s)")
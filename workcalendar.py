@@ -0,0 +1,209 @@
+"""
+Lab Capacity Model - Working Calendar
+Business-day bitmap and prefix sums for O(1) working-day and working-hour arithmetic
+"""
+
+from datetime import datetime, timedelta, date
+
+import numpy as np
+
+# Shift hours (start, end) per shift pattern in the personnel records
+SHIFT_PATTERNS = {
+    'standard': (8, 17),
+    'early': (6, 15),
+    # Flexible staff may also work 9-6; plan on the earlier window
+    'flexible': (7, 16)
+}
+DEFAULT_SHIFT_PATTERN = 'standard'
+
+# Days covered by a calendar unless the caller asks for another horizon
+DEFAULT_HORIZON_DAYS = 3660
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD (or ISO datetime) string into a date"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def expand_date_range(start_value, end_value):
+    """Expand an inclusive date range; ranges that wrap the year end roll into the next year"""
+    start = parse_date(start_value)
+    end = parse_date(end_value) or start
+    if start is None:
+        return []
+    if end < start:
+        end = end.replace(year=start.year + 1)
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def lab_closed_dates(calendar):
+    """Get the set of dates the whole lab is closed from the holiday calendar"""
+    closed = set()
+    if not calendar:
+        return closed
+    if calendar.get('holiday_policy', 'no_work') == 'no_work':
+        for holiday in calendar.get('holidays', []):
+            holiday_date = parse_date(holiday.get('date'))
+            if holiday_date:
+                closed.add(holiday_date)
+    for shutdown in calendar.get('lab_shutdowns', []):
+        closed.update(expand_date_range(shutdown.get('start_date'), shutdown.get('end_date')))
+    return closed
+
+
+def operator_leave_dates(operator_holidays):
+    """Get approved leave dates keyed by operator name"""
+    leave = {}
+    for holiday in operator_holidays or []:
+        if str(holiday.get('status', 'Approved')).lower() != 'approved':
+            continue
+        dates = expand_date_range(holiday.get('start_date'), holiday.get('end_date'))
+        leave.setdefault(holiday.get('operator_name'), set()).update(dates)
+    return leave
+
+
+class WorkCalendar:
+    """Working days from start for a fixed number of days, with one shift per working day
+
+    open is a boolean bitmap of working days. cumulative[i] counts the
+    working days before day i and open_days lists working-day indexes in
+    order, so counting working days between two dates is one subtraction
+    and adding N working days is one lookup. Hour arithmetic works on the
+    same arrays: working hours before an instant are whole shifts from
+    cumulative plus the part of that day's shift already elapsed.
+
+    Hour-based methods take float hours from midnight of start, the time
+    axis the batch scheduler uses; the datetime methods wrap them.
+    """
+
+    def __init__(self, start, days=DEFAULT_HORIZON_DAYS, closed_dates=(), weekend_work=False,
+                 shift_pattern=DEFAULT_SHIFT_PATTERN, open_days=None):
+        self.start = parse_date(start)
+        self.days = days
+        self.shift_pattern = shift_pattern
+        self.shift_start, self.shift_end = SHIFT_PATTERNS.get(shift_pattern, SHIFT_PATTERNS[DEFAULT_SHIFT_PATTERN])
+        self.shift_hours = float(self.shift_end - self.shift_start)
+        if open_days is None:
+            first = np.datetime64(self.start, 'D')
+            holidays = np.array(sorted(closed_dates), dtype='datetime64[D]')
+            open_days = np.is_busday(first + np.arange(days), weekmask='1111111' if weekend_work else '1111100',
+                                     holidays=holidays)
+        self.open = open_days
+        self.cumulative = np.concatenate(([0], np.cumsum(self.open, dtype=np.int64)))
+        self.open_days = np.flatnonzero(self.open)
+
+    @classmethod
+    def from_holiday_calendar(cls, calendar, start, days=DEFAULT_HORIZON_DAYS, shift_pattern=DEFAULT_SHIFT_PATTERN):
+        """Build the lab calendar from the holiday calendar record (holidays, shutdowns, weekend policy)"""
+        weekend_work = (calendar or {}).get('weekend_policy') not in (None, 'no_work')
+        return cls(start, days, lab_closed_dates(calendar), weekend_work, shift_pattern)
+
+    def for_operator(self, leave_dates=(), shift_pattern=None):
+        """This calendar with an operator's leave days removed and their shift pattern applied"""
+        open_days = self.open.copy()
+        for leave_date in leave_dates:
+            index = (leave_date - self.start).days
+            if 0 <= index < self.days:
+                open_days[index] = False
+        return WorkCalendar(self.start, self.days, shift_pattern=shift_pattern or self.shift_pattern,
+                            open_days=open_days)
+
+    # Working days
+
+    def _index(self, day):
+        index = (parse_date(day) - self.start).days
+        if not 0 <= index <= self.days:
+            raise ValueError(f'{day} is outside the calendar ({self.start} + {self.days} days)')
+        return index
+
+    def is_working_day(self, day):
+        index = self._index(day)
+        return index < self.days and bool(self.open[index])
+
+    def working_days_between(self, start, end):
+        """Working days in [start, end); negative when end is before start"""
+        return int(self.cumulative[self._index(end)] - self.cumulative[self._index(start)])
+
+    def add_working_days(self, day, count):
+        """Move count working days from day; a non-working day first rolls forward (or back for count < 0)
+
+        Returns None when the result falls outside the calendar.
+        """
+        index = self._index(day)
+        if count >= 0:
+            # Rank of the first working day on or after day
+            rank = int(self.cumulative[index]) + count
+        else:
+            # Rank of the last working day on or before day
+            rank = int(self.cumulative[min(index + 1, self.days)]) - 1 + count
+        if not 0 <= rank < len(self.open_days):
+            return None
+        return self.start + timedelta(days=int(self.open_days[rank]))
+
+    # Working hours, as float hours from midnight of start
+
+    def working_hours_before(self, t):
+        """Shift hours worked from the calendar start up to t"""
+        day = min(max(int(t // 24), 0), self.days)
+        hours = self.cumulative[day] * self.shift_hours
+        if day < self.days and self.open[day]:
+            hours += min(max(t - day * 24 - self.shift_start, 0.0), self.shift_hours)
+        return float(hours)
+
+    def next_working_hour(self, t):
+        """Earliest time >= t inside a shift, or None past the horizon"""
+        day = max(int(t // 24), 0)
+        if day < self.days and self.open[day]:
+            hour = t - day * 24
+            if hour < self.shift_start:
+                return day * 24.0 + self.shift_start
+            if hour < self.shift_end:
+                return t
+            day += 1
+        if day >= self.days:
+            return None
+        rank = int(self.cumulative[day])
+        if rank >= len(self.open_days):
+            return None
+        return int(self.open_days[rank]) * 24.0 + self.shift_start
+
+    def add_working_hours(self, t, hours):
+        """Time at which hours of shift time after t have been worked, or None past the horizon"""
+        target = self.working_hours_before(t) + hours
+        # A target on a shift boundary ends at the close of the earlier shift
+        rank = int(np.ceil(target / self.shift_hours)) - 1 if target > 0 else 0
+        if rank >= len(self.open_days):
+            return None
+        return int(self.open_days[rank]) * 24.0 + self.shift_start + (target - rank * self.shift_hours)
+
+    # Datetime wrappers
+
+    def hours_from_start(self, moment):
+        if moment.tzinfo is not None:
+            # The calendar runs on naive local time, like the rest of the lab data
+            moment = moment.astimezone().replace(tzinfo=None)
+        return (moment - datetime.combine(self.start, datetime.min.time())).total_seconds() / 3600.0
+
+    def at_hours(self, t):
+        return datetime.combine(self.start, datetime.min.time()) + timedelta(minutes=round(t * 60))
+
+    def working_hours_between(self, start, end):
+        """Shift hours between two datetimes"""
+        return self.working_hours_before(self.hours_from_start(end)) - self.working_hours_before(self.hours_from_start(start))
+
+    def next_working_time(self, moment):
+        t = self.next_working_hour(self.hours_from_start(moment))
+        return None if t is None else self.at_hours(t)
+
+    def add_working_time(self, moment, hours):
+        t = self.add_working_hours(self.hours_from_start(moment), hours)
+        return None if t is None else self.at_hours(t)